@@ -1,11 +1,16 @@
-from django.contrib import admin
-from django.db.models import F
+from django import forms
+from django.contrib import admin, messages
 from django.shortcuts import get_object_or_404, render
 from django.urls import path, reverse
 from django.utils import timezone
 from django.utils.html import format_html
-from apps.exams.models import Category, ContentItem, MetaCategory, MetaOption, SubCategory, UploadBatch, UploadFile
-from apps.exams.views import build_zip_response
+from apps.exams.counters import record_download
+from apps.exams.models import Category, ContentItem, FileBlob, MetaCategory, MetaOption, SubCategory, UploadBatch, UploadFile
+from apps.exams.responses import as_async_streaming
+from apps.exams.search import sync_search_docs
+from apps.exams.tasks import schedule_text_extraction
+from apps.exams.views import batch_zip_response
+from apps.exams.zipcache import invalidate_archive
 
 
 @admin.action(description="Approve selected")
@@ -24,12 +29,30 @@ class ContentItemAdmin(admin.ModelAdmin):
     actions = (approve_selected, reject_selected)
 
 
+# Batches with files in these states must not be published.
+UNPUBLISHABLE_SCAN_STATUSES = (UploadFile.ScanStatus.PENDING_SCAN, UploadFile.ScanStatus.REJECTED)
+
+
 @admin.action(description="Approve selected batches")
-def approve_batches(modeladmin, request, queryset): queryset.update(status=UploadBatch.Status.APPROVED)
+def approve_batches(modeladmin, request, queryset):
+    unscanned = set(queryset.filter(files__scan_status__in=UNPUBLISHABLE_SCAN_STATUSES).values_list("pk", flat=True))
+    queryset.exclude(pk__in=unscanned).update(status=UploadBatch.Status.APPROVED)
+    sync_search_docs(queryset.values_list("pk", flat=True))
+    schedule_text_extraction(queryset.exclude(pk__in=unscanned).values_list("pk", flat=True))
+    if unscanned:
+        modeladmin.message_user(
+            request,
+            f"{len(unscanned)} Batch(es) nicht freigegeben: Dateien sind noch in Prüfung oder wurden abgelehnt.",
+            messages.WARNING,
+        )
 
 
 @admin.action(description="Reject selected batches")
-def reject_batches(modeladmin, request, queryset): queryset.update(status=UploadBatch.Status.REJECTED)
+def reject_batches(modeladmin, request, queryset):
+    queryset.update(status=UploadBatch.Status.REJECTED)
+    sync_search_docs(queryset.values_list("pk", flat=True))
+    for batch_id in queryset.exclude(zip_archive="").values_list("pk", flat=True):
+        invalidate_archive(batch_id)
 
 
 @admin.register(Category)
@@ -62,12 +85,32 @@ class MetaOptionAdmin(admin.ModelAdmin):
     ordering = ("category", "sort_order", "label")
 
 
+@admin.register(FileBlob)
+class FileBlobAdmin(admin.ModelAdmin):
+    list_display = ("sha256", "size", "ref_count", "created_at")
+    search_fields = ("sha256",)
+    readonly_fields = ("sha256", "file", "size", "ref_count", "created_at")
+    ordering = ("-created_at",)
+
+
 class UploadFileInline(admin.TabularInline):
     model = UploadFile
     extra = 0
-    fields = ("original_name", "size", "content_type", "file_link")
+    fields = ("preview", "original_name", "size", "content_type", "scan_status", "scan_error", "file_link")
     readonly_fields = fields
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("blob")
+
+    @admin.display(description="Vorschau")
+    def preview(self, obj):
+        if obj.blob is None or not obj.blob.preview:
+            return "-"
+        return format_html(
+            '<img src="{}" alt="" loading="lazy" style="max-width: 96px; max-height: 136px;">',
+            reverse("exams:upload_file_preview", args=[obj.pk]),
+        )
+
     @admin.display(description="Datei")
     def file_link(self, obj):
         if not obj.file:
@@ -75,8 +118,25 @@ class UploadFileInline(admin.TabularInline):
         return format_html('<a href="{}" download>Download</a>', obj.file.url)
 
 
+class UploadBatchAdminForm(forms.ModelForm):
+    class Meta:
+        model = UploadBatch
+        fields = "__all__"
+
+    def clean_status(self):
+        status = self.cleaned_data["status"]
+        if (
+            status == UploadBatch.Status.APPROVED
+            and self.instance.pk
+            and self.instance.files.filter(scan_status__in=UNPUBLISHABLE_SCAN_STATUSES).exists()
+        ):
+            raise forms.ValidationError("Freigabe nicht möglich: Dateien sind noch in Prüfung oder wurden abgelehnt.")
+        return status
+
+
 @admin.register(UploadBatch)
 class UploadBatchAdmin(admin.ModelAdmin):
+    form = UploadBatchAdminForm
     list_display = ("status", "type_option", "subject_option", "teacher", "year_option", "program_option", "created_at", "file_count")
     list_filter = ("status", "type_option", "subject_option", "teacher", "year_option", "program_option", "created_at")
     search_fields = ("teacher__name", "subject_option__label", "files__original_name")
@@ -134,11 +194,8 @@ class UploadBatchAdmin(admin.ModelAdmin):
 
     def download_zip(self, request, batch_id):
         batch = get_object_or_404(UploadBatch, pk=batch_id)
-        UploadBatch.objects.filter(pk=batch_id).update(download_count=F("download_count") + 1)
-        return build_zip_response(
-            batch.files.all().order_by("created_at", "id").iterator(),
-            f"batch-{batch_id}.zip",
-        )
+        record_download(UploadBatch, batch_id)
+        return as_async_streaming(request, batch_zip_response(request, batch))
 
     def zip_preview(self, request, batch_id):
         batch = get_object_or_404(UploadBatch, pk=batch_id)
@@ -0,0 +1,95 @@
+from asgiref.sync import sync_to_async
+from django.core.files.storage import FileSystemStorage
+
+ASYNC_CHUNK_SIZE = 64 * 1024
+
+_END = object()
+
+
+def _in_thread(func):
+    return sync_to_async(func, thread_sensitive=False)
+
+
+class AsyncFileReader:
+    """aiofiles-style wrapper: every blocking call on the file runs in a worker thread."""
+
+    def __init__(self, opener):
+        self._opener = opener
+        self._file = None
+
+    async def open(self):
+        self._file = await _in_thread(self._opener)()
+        return self
+
+    def open_blocking(self):
+        """The underlying file object, opened in the calling thread (for WSGI responses)."""
+        return self._opener()
+
+    async def seek(self, offset):
+        await _in_thread(self._file.seek)(offset)
+
+    async def read(self, size=-1):
+        return await _in_thread(self._file.read)(size)
+
+    async def close(self):
+        if self._file is not None:
+            await _in_thread(self._file.close)()
+            self._file = None
+
+
+def async_reader_for(storage, name):
+    """Pick the reader for ``name``: local files are opened directly, other
+    backends such as S3 go through ``storage.open``."""
+    if isinstance(storage, FileSystemStorage):
+        path = storage.path(name)
+        return AsyncFileReader(lambda: open(path, "rb"))
+    return AsyncFileReader(lambda: storage.open(name, "rb"))
+
+
+async def stat_storage_file(storage, name):
+    """Return ``(size, modified)`` for ``name`` in ``storage`` or ``None`` if it is missing.
+
+    ``modified`` is ``None`` for backends that do not report modification times.
+    """
+    def stat():
+        if not storage.exists(name):
+            return None
+        try:
+            modified = storage.get_modified_time(name)
+        except NotImplementedError:
+            modified = None
+        return storage.size(name), modified
+
+    return await _in_thread(stat)()
+
+
+async def aiter_file(reader, start=0, length=None, chunk_size=ASYNC_CHUNK_SIZE):
+    await reader.open()
+    try:
+        if start:
+            await reader.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            chunk = await reader.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+    finally:
+        await reader.close()
+
+
+async def aiter_sync(iterable):
+    """Drive a blocking iterator, e.g. a ZIP stream, on the request's sync thread.
+
+    The iterator may touch the ORM (the ZIP cache is stored when the stream
+    ends), so it runs thread-sensitive like the sync views do.
+    """
+    iterator = iter(iterable)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(iterator, _END)
+        if chunk is _END:
+            return
+        yield chunk
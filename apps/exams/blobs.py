@@ -0,0 +1,44 @@
+import hashlib
+import logging
+
+from django.db import transaction
+from django.db.models import F
+
+from apps.exams.models import FileBlob
+
+logger = logging.getLogger(__name__)
+
+
+def hash_uploaded_file(uploaded_file) -> str:
+    # Uploads parsed by the inspecting handlers were hashed on arrival.
+    precomputed = getattr(uploaded_file, "sha256", None)
+    if precomputed:
+        return precomputed
+    hasher = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    try:
+        uploaded_file.seek(0)
+    except Exception:
+        pass
+    return hasher.hexdigest()
+
+
+def release_blob(blob_id) -> None:
+    """Drop one reference and delete the stored file once nothing points at it."""
+    with transaction.atomic():
+        blob = FileBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            FileBlob.objects.filter(pk=blob.pk).update(ref_count=F("ref_count") - 1)
+            return
+        remaining = blob.upload_files.count()
+        if remaining:
+            logger.warning("Blob %s still has %s references; resyncing ref_count.", blob.sha256, remaining)
+            FileBlob.objects.filter(pk=blob.pk).update(ref_count=remaining)
+            return
+        storage = blob.file.storage
+        file_names = [name for name in (blob.file.name, blob.preview.name) if name]
+        blob.delete()
+        transaction.on_commit(lambda: [storage.delete(name) for name in file_names])
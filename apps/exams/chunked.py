@@ -0,0 +1,113 @@
+import os
+import re
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+
+from apps.exams.models import ChunkedUpload
+
+STREAM_READ_SIZE = 64 * 1024
+STALE_UPLOAD_AGE = timedelta(hours=24)
+
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+def chunk_path(upload) -> Path:
+    return Path(settings.CHUNKED_UPLOAD_DIR) / f"{upload.upload_id}.part"
+
+
+def parse_content_range(header):
+    """Return ``(start, end, total)`` for a ``Content-Range`` header; ``end`` is exclusive."""
+    match = _CONTENT_RANGE_RE.match((header or "").strip())
+    if not match:
+        return None
+    start, last = int(match.group(1)), int(match.group(2))
+    if last < start:
+        return None
+    total = None if match.group(3) == "*" else int(match.group(3))
+    return start, last + 1, total
+
+
+def merge_range(ranges, start, end):
+    merged = []
+    for range_start, range_end in sorted([*ranges, [start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def missing_ranges(ranges, size):
+    missing = []
+    cursor = 0
+    for start, end in ranges:
+        if start > cursor:
+            missing.append([cursor, start])
+        cursor = max(cursor, end)
+    if cursor < size:
+        missing.append([cursor, size])
+    return missing
+
+
+def write_chunk(upload, stream, start, length) -> int:
+    """Copy up to ``length`` bytes from ``stream`` into the part file at ``start``.
+
+    Returns the number of bytes actually written, which is less than ``length``
+    when the client disconnects mid-chunk; that prefix still counts as received.
+    """
+    path = chunk_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    written = 0
+    with os.fdopen(fd, "r+b") as part:
+        part.seek(start)
+        while written < length:
+            try:
+                data = stream.read(min(STREAM_READ_SIZE, length - written))
+            except OSError:
+                break
+            if not data:
+                break
+            part.write(data)
+            written += len(data)
+    return written
+
+
+def open_assembled(upload) -> UploadedFile:
+    return UploadedFile(
+        file=open(chunk_path(upload), "rb"),
+        name=upload.original_name,
+        content_type=upload.mime,
+        size=upload.size,
+    )
+
+
+def discard_chunks(upload) -> None:
+    try:
+        chunk_path(upload).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def purge_stale_uploads(max_age=STALE_UPLOAD_AGE) -> int:
+    """Delete open uploads and part files untouched for ``max_age``; return the row count."""
+    cutoff = timezone.now() - max_age
+    stale = ChunkedUpload.objects.filter(status=ChunkedUpload.Status.OPEN, updated_at__lt=cutoff)
+    for upload in stale.iterator():
+        discard_chunks(upload)
+    deleted, _ = stale.delete()
+    upload_dir = Path(settings.CHUNKED_UPLOAD_DIR)
+    if upload_dir.is_dir():
+        cutoff_ts = time.time() - max_age.total_seconds()
+        for part in upload_dir.glob("*.part"):
+            try:
+                if part.stat().st_mtime < cutoff_ts:
+                    part.unlink()
+            except FileNotFoundError:
+                pass
+    return deleted
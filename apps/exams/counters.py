@@ -0,0 +1,43 @@
+import logging
+
+from django.db.models import F
+
+from apps.exams.models import BatchSearchDoc, ContentItem, UploadBatch
+from apps.pages.counterbuffer import BufferedCounter, case_increment
+from apps.pages.fragments import bump_namespace
+
+logger = logging.getLogger(__name__)
+
+
+def _update_search_docs(deltas):
+    BatchSearchDoc.objects.filter(pk__in=deltas).update(download_count=F("download_count") + case_increment(deltas))
+    bump_namespace("archive")
+
+
+COUNTERS = {
+    model._meta.model_name: BufferedCounter(
+        f"download-count:{model._meta.model_name}",
+        model,
+        "download_count",
+        "DOWNLOAD_COUNT_FLUSH_INTERVAL",
+        after_write=_update_search_docs if model is UploadBatch else None,
+    )
+    for model in (ContentItem, UploadBatch)
+}
+
+
+def record_download(model, pk) -> None:
+    """Count one download of ``model`` row ``pk`` in the cache instead of updating the row.
+
+    The first download after ``DOWNLOAD_COUNT_FLUSH_INTERVAL`` seconds also
+    flushes, so counts reach the database even without Celery beat.
+    """
+    COUNTERS[model._meta.model_name].add(pk)
+
+
+def flush_download_counts() -> int:
+    """Write buffered increments with one ``CASE`` update per model; return the downloads written."""
+    written = sum(counter.flush() for counter in COUNTERS.values())
+    if written:
+        logger.info("Flushed %s buffered downloads.", written)
+    return written
@@ -0,0 +1,20 @@
+def plan_export_parts(file_rows, max_bytes, max_files):
+    """Split ordered ``(id, size)`` rows into consecutive parts under both caps.
+
+    A single file larger than ``max_bytes`` becomes a part of its own. Parts
+    only depend on the row order, so appending files never reshuffles the
+    earlier parts.
+    """
+    parts = []
+    current = None
+    for file_id, size in file_rows:
+        size = size or 0
+        if current is None or (
+            current["file_ids"]
+            and (current["size"] + size > max_bytes or len(current["file_ids"]) >= max_files)
+        ):
+            current = {"number": len(parts) + 1, "file_ids": [], "size": 0}
+            parts.append(current)
+        current["file_ids"].append(file_id)
+        current["size"] += size
+    return parts
@@ -2,6 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from apps.exams.models import ContentItem, MetaOption, UploadBatch
 from apps.exams.security import ALLOWED_EXTENSIONS, MAX_FILE_SIZE, validate_uploaded_file
+from apps.exams.vocabulary import get_vocabulary
 from apps.ranking.models import Teacher
 
 
@@ -35,7 +36,46 @@ class ContentItemUploadForm(forms.ModelForm):
         return file
 
 
+class SnapshotChoiceField(forms.ModelChoiceField):
+    """``ModelChoiceField`` over preloaded objects: renders and validates without a query.
+
+    Values missing from the objects are looked up in ``fallback``, so a
+    choice added after the snapshot was taken is still accepted.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(queryset=None, **kwargs)
+        self.objects = ()
+        self.fallback = None
+
+    def set_objects(self, objects, fallback=None):
+        self.objects = tuple(objects)
+        self.fallback = fallback
+        self.widget.choices = [("", self.empty_label), *((obj.pk, self.label_from_instance(obj)) for obj in self.objects)]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        for obj in self.objects:
+            if str(obj.pk) == str(value):
+                return obj
+        if self.fallback is not None:
+            try:
+                obj = self.fallback.filter(pk=value).first()
+            except (ValueError, TypeError, ValidationError):
+                obj = None
+            if obj is not None:
+                return obj
+        raise ValidationError(self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value})
+
+
 class UploadBatchForm(forms.ModelForm):
+    type_option = SnapshotChoiceField()
+    year_option = SnapshotChoiceField()
+    subject_option = SnapshotChoiceField()
+    teacher = SnapshotChoiceField()
+    program_option = SnapshotChoiceField()
+
     class Meta:
         model = UploadBatch
         fields = ["type_option", "year_option", "subject_option", "teacher", "program_option"]
@@ -43,6 +83,7 @@ class UploadBatchForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         input_class = "kv-input"
+        vocabulary = get_vocabulary()
         required_labels = {
             "type_option": "Typ",
             "year_option": "Jahr",
@@ -58,23 +99,20 @@ class UploadBatchForm(forms.ModelForm):
         }
         for field_name, category_key in option_fields.items():
             field = self.fields[field_name]
-            field.queryset = MetaOption.objects.filter(
-                category__key=category_key,
-                category__is_active=True,
-                is_active=True,
-            ).order_by("sort_order", "label")
+            field.empty_label = "Bitte wählen"
+            field.set_objects(
+                vocabulary.options.get(category_key, ()),
+                fallback=MetaOption.objects.filter(category__key=category_key, category__is_active=True, is_active=True),
+            )
             field.required = True
             field.error_messages["required"] = f"Bitte {required_labels[field_name]} wählen."
         teacher_field = self.fields["teacher"]
-        teacher_field.queryset = Teacher.objects.order_by("-active", "name")
+        teacher_field.empty_label = "Bitte wählen"
+        teacher_field.set_objects(vocabulary.teachers, fallback=Teacher.objects.all())
         teacher_field.required = True
         teacher_field.error_messages["required"] = f"Bitte {required_labels['teacher']} wählen."
         for name, field in self.fields.items():
-            if isinstance(field.widget, forms.Select):
-                field.widget.attrs["class"] = input_class
-                field.empty_label = "Bitte wählen"
-            else:
-                field.widget.attrs["class"] = input_class
+            field.widget.attrs["class"] = input_class
 
     def save(self, commit=True):
         instance = super().save(commit=False)
@@ -0,0 +1,92 @@
+import re
+
+from django.db import connection
+
+from apps.exams.models import BatchSearchDoc, UploadFile
+
+# Body text indexed per batch; PostgreSQL rejects tsvectors over 1 MB.
+MAX_BATCH_TEXT_CHARS = 500_000
+# Words of a query beyond this are ignored.
+MAX_QUERY_TERMS = 8
+FULLTEXT_RESULT_LIMIT = 200
+
+_TERM_RE = re.compile(r"\w+")
+_TABLE = "exams_fulltext"
+
+
+def _sqlite():
+    return connection.vendor == "sqlite"
+
+
+def query_terms(query):
+    return _TERM_RE.findall((query or "").lower())[:MAX_QUERY_TERMS]
+
+
+def _documents(batch_ids):
+    docs = {doc.pk: doc for doc in BatchSearchDoc.objects.filter(pk__in=batch_ids)}
+    names = {pk: [] for pk in docs}
+    texts = {pk: [] for pk in docs}
+    files = UploadFile.objects.filter(batch_id__in=docs).order_by("pk").values_list("batch_id", "original_name", "blob__text__content")
+    for batch_id, original_name, content in files:
+        names[batch_id].append(original_name)
+        if content:
+            texts[batch_id].append(content)
+    for pk, doc in docs.items():
+        labels = [doc.type_label, doc.subject_label, doc.year_label, doc.program_label, doc.teacher_name]
+        title = " ".join(part for part in [*labels, *names[pk]] if part)
+        yield pk, title, " ".join(texts[pk])[:MAX_BATCH_TEXT_CHARS]
+
+
+def remove_batches(batch_ids) -> None:
+    batch_ids = list(batch_ids)
+    if not batch_ids:
+        return
+    column = "rowid" if _sqlite() else "batch_id"
+    placeholders = ", ".join(["%s"] * len(batch_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {_TABLE} WHERE {column} IN ({placeholders})", batch_ids)
+
+
+def index_batches(batch_ids) -> None:
+    """(Re)write the full-text rows of ``batch_ids`` from their search docs, file names and extracted text.
+
+    Batches without a search doc (not approved) are dropped from the index.
+    """
+    batch_ids = list(batch_ids)
+    if not batch_ids:
+        return
+    rows = list(_documents(batch_ids))
+    remove_batches(batch_ids)
+    if not rows:
+        return
+    if _sqlite():
+        sql = f"INSERT INTO {_TABLE} (rowid, title, body) VALUES (%s, %s, %s)"
+    else:
+        sql = (
+            f"INSERT INTO {_TABLE} (batch_id, document) VALUES "
+            "(%s, setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B'))"
+        )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def search(query, limit=FULLTEXT_RESULT_LIMIT):
+    """Batch ids matching every word of ``query`` as a prefix, best match first.
+
+    Matches in file names and labels weigh more than matches in the text.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+    if _sqlite():
+        sql = f"SELECT rowid FROM {_TABLE} WHERE {_TABLE} MATCH %s ORDER BY bm25({_TABLE}, 10.0, 1.0) LIMIT %s"
+        expression = " ".join(f'"{term}"*' for term in terms)
+    else:
+        sql = (
+            f"SELECT batch_id FROM {_TABLE}, to_tsquery('simple', %s) query "
+            "WHERE document @@ query ORDER BY ts_rank_cd(document, query) DESC, batch_id DESC LIMIT %s"
+        )
+        expression = " & ".join(f"{term}:*" for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [expression, limit])
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,130 @@
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from apps.exams.blobs import hash_uploaded_file
+from apps.exams.models import BatchSearchDoc, FileBlob, UploadFile
+from apps.exams.search import sync_search_docs
+from apps.exams.zipcache import invalidate_archive
+
+logger = logging.getLogger(__name__)
+
+
+def _write_blob(digest, uploaded_file):
+    # Storage only (save=False): worker threads never touch the database.
+    blob = FileBlob(sha256=digest, size=uploaded_file.size, ref_count=0)
+    blob.file.save(digest, uploaded_file, save=False)
+    return blob
+
+
+def _try_write(item):
+    try:
+        return _write_blob(*item), None
+    except Exception as exc:
+        return None, exc
+
+
+def _write_blobs(new_files):
+    """Write ``{digest: uploaded_file}`` to storage, in parallel for several files (0/1 worker = sequential).
+
+    If any write fails, the files already written are deleted before the error is raised.
+    """
+    items = list(new_files.items())
+    workers = min(settings.UPLOAD_STORE_WORKERS, len(items))
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-store") as executor:
+            results = list(executor.map(_try_write, items))
+    else:
+        results = [_try_write(item) for item in items]
+    written = [blob for blob, _ in results if blob is not None]
+    error = next((exc for _, exc in results if exc is not None), None)
+    if error is not None:
+        _delete_stored([blob.file.name for blob in written])
+        raise error
+    return written
+
+
+def _delete_stored(names):
+    storage = FileBlob._meta.get_field("file").storage
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Could not delete stored upload %s.", name, exc_info=True)
+
+
+def _reference_blobs(references, contents, written):
+    """Lock the blobs of ``references`` (``{digest: count}``), add the references and return the blobs by digest.
+
+    A blob released and deleted since the upload looked it up is stored again
+    from ``contents`` (``{digest: uploaded_file}``); the new files go to ``written``.
+    """
+    blobs = {}
+    missing = set(references)
+    while missing:
+        blobs.update({blob.sha256: blob for blob in FileBlob.objects.select_for_update().filter(sha256__in=missing)})
+        missing -= blobs.keys()
+        if missing:
+            stored = _write_blobs({digest: contents[digest] for digest in missing})
+            written.extend(stored)
+            FileBlob.objects.bulk_create(stored, ignore_conflicts=True)
+    increment = Case(
+        *[When(pk=blob.pk, then=Value(references[digest])) for digest, blob in blobs.items()],
+        default=Value(0),
+        output_field=PositiveIntegerField(),
+    )
+    FileBlob.objects.filter(pk__in=[blob.pk for blob in blobs.values()]).update(ref_count=F("ref_count") + increment)
+    return blobs
+
+
+def ingest_upload_files(batch, incoming_files):
+    """Store ``incoming_files`` in ``batch`` and return their ``UploadFile`` rows in the same order.
+
+    New content is written to storage by a small thread pool, then all rows
+    go in with ``bulk_create`` inside one transaction: either every file is
+    recorded or none is, and content written for a failed ingestion is
+    deleted again.
+    """
+    incoming_files = list(incoming_files)
+    if not incoming_files:
+        return []
+    digests = [hash_uploaded_file(incoming) for incoming in incoming_files]
+    known = set(FileBlob.objects.filter(sha256__in=digests).values_list("sha256", flat=True))
+    new_files = {digest: incoming for digest, incoming in zip(digests, incoming_files) if digest not in known}
+    written = _write_blobs(new_files)
+    try:
+        with transaction.atomic():
+            # Content stored meanwhile by a concurrent upload keeps its row; ours is dropped below.
+            FileBlob.objects.bulk_create(written, ignore_conflicts=True)
+            blobs = _reference_blobs(Counter(digests), dict(zip(digests, incoming_files)), written)
+            upload_files = UploadFile.objects.bulk_create(
+                [
+                    UploadFile(
+                        batch=batch,
+                        content_type=batch.content_type,
+                        category=batch.category,
+                        subcategory=batch.subcategory,
+                        file=blobs[digest].file.name,
+                        blob=blobs[digest],
+                        original_name=incoming.name,
+                        size=incoming.size,
+                        mime=incoming.content_type or "",
+                    )
+                    for digest, incoming in zip(digests, incoming_files)
+                ]
+            )
+    except Exception:
+        _delete_stored([blob.file.name for blob in written])
+        raise
+    orphans = [blob.file.name for blob in written if blobs[blob.sha256].file.name != blob.file.name]
+    if orphans:
+        transaction.on_commit(lambda: _delete_stored(orphans))
+    # bulk_create sends no post_save, so do what the UploadFile receivers would.
+    invalidate_archive(batch.pk)
+    if BatchSearchDoc.objects.filter(pk=batch.pk).exists():
+        sync_search_docs([batch.pk])
+    return upload_files
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.exams.counters import flush_download_counts
+
+
+class Command(BaseCommand):
+    help = "Write buffered download counters to the database."
+
+    def handle(self, *args, **options):
+        written = flush_download_counts()
+        self.stdout.write(f"Flushed {written} downloads.")
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.exams.models import UploadFile
+from apps.exams.renditions import generate_upload_preview
+
+
+class Command(BaseCommand):
+    help = "Render missing previews for clean uploads, e.g. files stored before previews existed."
+
+    def handle(self, *args, **options):
+        pending = UploadFile.objects.filter(
+            scan_status=UploadFile.ScanStatus.CLEAN,
+            blob__isnull=False,
+            blob__preview="",
+        ).values_list("pk", flat=True)
+        created = sum(generate_upload_preview(upload_file_id) for upload_file_id in pending.iterator())
+        self.stdout.write(f"Rendered {created} previews.")
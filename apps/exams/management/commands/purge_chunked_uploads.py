@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.exams.chunked import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete resumable uploads and part files that were not touched for a while."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, default=24, help="Maximum age of an open upload in hours.")
+
+    def handle(self, *args, **options):
+        deleted = purge_stale_uploads(timedelta(hours=options["hours"]))
+        self.stdout.write(f"Removed {deleted} stale uploads.")
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from apps.exams.search import rebuild_search_docs
+from apps.exams.tasks import pending_text_extractions
+from apps.exams.textextract import extract_upload_text
+
+
+class Command(BaseCommand):
+    help = "Extract missing text from approved uploads and rebuild the full-text index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--skip-extraction", action="store_true", help="Only re-index the text extracted so far.")
+
+    def handle(self, *args, **options):
+        extracted = 0
+        if not options["skip_extraction"]:
+            extracted = sum(extract_upload_text(upload_file_id) for upload_file_id in pending_text_extractions().iterator())
+        indexed = rebuild_search_docs()
+        self.stdout.write(f"Extracted text from {extracted} files, indexed {indexed} batches.")
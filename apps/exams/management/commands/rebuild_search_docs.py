@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.exams.search import rebuild_search_docs
+
+
+class Command(BaseCommand):
+    help = "Rebuild the archive search docs from the approved upload batches."
+
+    def handle(self, *args, **options):
+        rebuilt = rebuild_search_docs()
+        self.stdout.write(f"Rebuilt {rebuilt} search docs.")
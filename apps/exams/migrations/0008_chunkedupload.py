@@ -0,0 +1,29 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0007_fileblob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChunkedUpload",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("upload_id", models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ("original_name", models.CharField(max_length=255)),
+                ("size", models.PositiveIntegerField()),
+                ("mime", models.CharField(blank=True, max_length=120)),
+                ("received_ranges", models.JSONField(blank=True, default=list)),
+                ("status", models.CharField(choices=[("OPEN", "Open"), ("COMPLETE", "Complete")], default="OPEN", max_length=20)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("batch", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="chunked_uploads", to="exams.uploadbatch")),
+                ("upload_file", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="exams.uploadfile")),
+            ],
+        ),
+    ]
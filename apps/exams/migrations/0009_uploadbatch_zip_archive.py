@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0008_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadbatch",
+            name="zip_archive",
+            field=models.FileField(blank=True, editable=False, max_length=255, upload_to="zip_cache/"),
+        ),
+        migrations.AddField(
+            model_name="uploadbatch",
+            name="zip_archive_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
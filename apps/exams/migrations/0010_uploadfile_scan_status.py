@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+def mark_existing_clean(apps, schema_editor):
+    # Files uploaded before background scanning were fully validated in the request.
+    UploadFile = apps.get_model("exams", "UploadFile")
+    UploadFile.objects.update(scan_status="CLEAN")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0009_uploadbatch_zip_archive"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadfile",
+            name="scan_error",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="uploadfile",
+            name="scan_status",
+            field=models.CharField(choices=[("PENDING_SCAN", "Pending scan"), ("CLEAN", "Clean"), ("REJECTED", "Rejected")], default="PENDING_SCAN", max_length=20),
+        ),
+        migrations.RunPython(mark_existing_clean, migrations.RunPython.noop),
+    ]
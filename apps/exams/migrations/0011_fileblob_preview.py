@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0010_uploadfile_scan_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fileblob",
+            name="preview",
+            field=models.FileField(blank=True, editable=False, max_length=255, upload_to="previews/"),
+        ),
+    ]
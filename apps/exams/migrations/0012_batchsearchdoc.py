@@ -0,0 +1,62 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_search_docs(apps, schema_editor):
+    UploadBatch = apps.get_model("exams", "UploadBatch")
+    BatchSearchDoc = apps.get_model("exams", "BatchSearchDoc")
+    batches = (
+        UploadBatch.objects.filter(status="APPROVED")
+        .select_related("type_option", "year_option", "subject_option", "program_option", "teacher")
+        .annotate(file_count=models.Count("files"), total_size=models.Sum("files__size"))
+    )
+    docs = []
+    for batch in batches.iterator():
+        doc = BatchSearchDoc(
+            batch_id=batch.pk,
+            teacher_name=batch.teacher.name if batch.teacher else "",
+            file_count=batch.file_count,
+            total_size=batch.total_size or 0,
+            download_count=batch.download_count,
+            created_at=batch.created_at,
+        )
+        for name in ("type", "year", "subject", "program"):
+            option = getattr(batch, f"{name}_option")
+            setattr(doc, f"{name}_key", option.value_key if option else "")
+            setattr(doc, f"{name}_label", option.label if option else "")
+        doc.type_label = doc.type_label or batch.get_content_type_display()
+        docs.append(doc)
+    BatchSearchDoc.objects.bulk_create(docs, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0011_fileblob_preview"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BatchSearchDoc",
+            fields=[
+                ("batch", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="search_doc", serialize=False, to="exams.uploadbatch")),
+                ("type_key", models.CharField(blank=True, max_length=120)),
+                ("year_key", models.CharField(blank=True, max_length=120)),
+                ("subject_key", models.CharField(blank=True, max_length=120)),
+                ("program_key", models.CharField(blank=True, max_length=120)),
+                ("teacher_name", models.CharField(blank=True, max_length=120)),
+                ("type_label", models.CharField(blank=True, max_length=120)),
+                ("year_label", models.CharField(blank=True, max_length=120)),
+                ("subject_label", models.CharField(blank=True, max_length=120)),
+                ("program_label", models.CharField(blank=True, max_length=120)),
+                ("file_count", models.PositiveIntegerField(default=0)),
+                ("total_size", models.PositiveBigIntegerField(default=0)),
+                ("download_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField()),
+            ],
+            options={
+                "indexes": [models.Index(fields=["-created_at", "-batch"], name="searchdoc_newest_idx"), models.Index(fields=["-download_count", "-created_at", "-batch"], name="searchdoc_downloads_idx"), models.Index(fields=["type_key", "-created_at"], name="searchdoc_type_idx"), models.Index(fields=["year_key", "-created_at"], name="searchdoc_year_idx"), models.Index(fields=["subject_key", "-created_at"], name="searchdoc_subject_idx"), models.Index(fields=["program_key", "-created_at"], name="searchdoc_program_idx"), models.Index(fields=["teacher_name", "-created_at"], name="searchdoc_teacher_idx")],
+            },
+        ),
+        migrations.RunPython(build_search_docs, migrations.RunPython.noop),
+    ]
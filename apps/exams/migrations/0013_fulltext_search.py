@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Ranked index over approved batches: file names and labels in "title", extracted text in "body".
+SQLITE_CREATE = (
+    "CREATE VIRTUAL TABLE exams_fulltext USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')",
+)
+POSTGRES_CREATE = (
+    "CREATE TABLE exams_fulltext ("
+    "batch_id integer PRIMARY KEY REFERENCES exams_uploadbatch (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX exams_fulltext_document_idx ON exams_fulltext USING GIN (document)",
+)
+
+
+def create_fulltext_index(apps, schema_editor):
+    statements = SQLITE_CREATE if schema_editor.connection.vendor == "sqlite" else POSTGRES_CREATE
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    schema_editor.execute("DROP TABLE IF EXISTS exams_fulltext")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("exams", "0012_batchsearchdoc"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="BlobText",
+            fields=[
+                ("blob", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="text", serialize=False, to="exams.fileblob")),
+                ("content", models.TextField(blank=True)),
+                ("extracted_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
@@ -100,6 +100,8 @@ class UploadBatch(models.Model):
     context = models.CharField(max_length=200, blank=True)
     download_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    zip_archive = models.FileField(upload_to="zip_cache/", max_length=255, blank=True, editable=False)
+    zip_archive_hash = models.CharField(max_length=64, blank=True, editable=False)
     def clean(self):
         super().clean()
         errors = {}
@@ -118,15 +120,102 @@ class UploadBatch(models.Model):
     def __str__(self) -> str: return f"Batch {self.pk} ({self.owner})"
 
 
+def _blob_upload_to(instance, filename):
+    return f"blobs/{instance.sha256[:2]}/{instance.sha256}"
+
+
+class FileBlob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=_blob_upload_to, max_length=255)
+    size = models.PositiveIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    # JPEG rendition (first PDF page or downscaled image), stored under a key derived from sha256.
+    preview = models.FileField(upload_to="previews/", max_length=255, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str: return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
+class BlobText(models.Model):
+    """Plain text extracted from a blob for full-text search; kept apart so file queries never load it."""
+    blob = models.OneToOneField(FileBlob, on_delete=models.CASCADE, primary_key=True, related_name="text")
+    content = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(auto_now=True)
+    def __str__(self) -> str: return f"Text of {self.blob_id}"
+
+
 class UploadFile(models.Model):
+    class ScanStatus(models.TextChoices):
+        PENDING_SCAN = "PENDING_SCAN", "Pending scan"
+        CLEAN = "CLEAN", "Clean"
+        REJECTED = "REJECTED", "Rejected"
+
     batch = models.ForeignKey(UploadBatch, on_delete=models.CASCADE, related_name="files")
     content_type = models.CharField(max_length=20, choices=ContentItem.ContentType.choices, default=ContentItem.ContentType.EXAM)
     category = models.ForeignKey(Category, on_delete=models.PROTECT, null=True, blank=True, related_name="upload_files")
     subcategory = models.ForeignKey(SubCategory, on_delete=models.PROTECT, null=True, blank=True, related_name="upload_files")
     file = models.FileField(upload_to="uploads/")
+    blob = models.ForeignKey(FileBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="upload_files")
     original_name = models.CharField(max_length=255)
     size = models.PositiveIntegerField()
     mime = models.CharField(max_length=120)
+    scan_status = models.CharField(max_length=20, choices=ScanStatus.choices, default=ScanStatus.PENDING_SCAN)
+    scan_error = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str: return f"{self.original_name} ({self.batch_id})"
+
+
+class ChunkedUpload(models.Model):
+    class Status(models.TextChoices):
+        OPEN = "OPEN", "Open"
+        COMPLETE = "COMPLETE", "Complete"
+
+    batch = models.ForeignKey(UploadBatch, on_delete=models.CASCADE, related_name="chunked_uploads")
+    upload_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    original_name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    mime = models.CharField(max_length=120, blank=True)
+    received_ranges = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.OPEN)
+    upload_file = models.ForeignKey(UploadFile, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def received_bytes(self) -> int: return sum(end - start for start, end in self.received_ranges)
+
+    @property
+    def is_complete(self) -> bool: return self.received_ranges == [[0, self.size]]
+
+    def __str__(self) -> str: return f"{self.original_name} ({self.upload_id})"
+
+
+class BatchSearchDoc(models.Model):
+    """Flattened copy of an approved batch for the archive's filters, facets and paging (see apps.exams.search)."""
+    batch = models.OneToOneField(UploadBatch, on_delete=models.CASCADE, primary_key=True, related_name="search_doc")
+    type_key = models.CharField(max_length=120, blank=True)
+    year_key = models.CharField(max_length=120, blank=True)
+    subject_key = models.CharField(max_length=120, blank=True)
+    program_key = models.CharField(max_length=120, blank=True)
+    teacher_name = models.CharField(max_length=120, blank=True)
+    type_label = models.CharField(max_length=120, blank=True)
+    year_label = models.CharField(max_length=120, blank=True)
+    subject_label = models.CharField(max_length=120, blank=True)
+    program_label = models.CharField(max_length=120, blank=True)
+    file_count = models.PositiveIntegerField(default=0)
+    total_size = models.PositiveBigIntegerField(default=0)
+    download_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField()
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-batch"], name="searchdoc_newest_idx"),
+            models.Index(fields=["-download_count", "-created_at", "-batch"], name="searchdoc_downloads_idx"),
+            models.Index(fields=["type_key", "-created_at"], name="searchdoc_type_idx"),
+            models.Index(fields=["year_key", "-created_at"], name="searchdoc_year_idx"),
+            models.Index(fields=["subject_key", "-created_at"], name="searchdoc_subject_idx"),
+            models.Index(fields=["program_key", "-created_at"], name="searchdoc_program_idx"),
+            models.Index(fields=["teacher_name", "-created_at"], name="searchdoc_teacher_idx"),
+        ]
+    def __str__(self) -> str: return f"Search doc for batch {self.batch_id}"
+
@@ -0,0 +1,91 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+_PUT_TIMEOUT = 0.5
+
+
+class StoragePrefetcher:
+    """Read storage files on a thread pool, up to ``workers`` members ahead of the consumer.
+
+    Every member has its own bounded chunk queue, so buffered data stays
+    around ``max_buffer_bytes`` and readers block once their queue is full.
+    Members are consumed strictly in the order of ``file_names``; reading
+    only starts when the first member is iterated.
+    """
+
+    def __init__(self, storage, file_names, workers=4, max_buffer_bytes=32 * 1024 * 1024, chunk_size=64 * 1024, failures=None):
+        self.storage = storage
+        self.file_names = list(file_names)
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.failures = failures
+        queue_size = max(1, max_buffer_bytes // (self.workers * chunk_size))
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in self.file_names]
+        self._submitted = 0
+        self._executor = None
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def _schedule_until(self, index):
+        with self._lock:
+            if self._closed.is_set():
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="zip-prefetch")
+            limit = min(index + self.workers, len(self.file_names))
+            while self._submitted < limit:
+                self._executor.submit(self._read_member, self._submitted)
+                self._submitted += 1
+
+    def _put(self, member_queue, item):
+        while not self._closed.is_set():
+            try:
+                member_queue.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read_member(self, index):
+        member_queue = self._queues[index]
+        try:
+            with self.storage.open(self.file_names[index], "rb") as file_handle:
+                while not self._closed.is_set():
+                    chunk = file_handle.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    if not self._put(member_queue, chunk):
+                        return
+        except Exception as exc:
+            self._put(member_queue, exc)
+            return
+        self._put(member_queue, _DONE)
+
+    def iter_member(self, index):
+        self._schedule_until(index)
+        member_queue = self._queues[index]
+        file_name = self.file_names[index]
+        try:
+            while True:
+                item = member_queue.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    logger.error("Storage open/read failed for %s", file_name, exc_info=item)
+                    if self.failures is not None:
+                        self.failures.append(file_name)
+                    return
+                yield item
+        finally:
+            self._schedule_until(index + 1)
+
+    def close(self):
+        self._closed.set()
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
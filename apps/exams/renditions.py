@@ -0,0 +1,85 @@
+import io
+import logging
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from apps.exams.models import FileBlob, UploadFile
+
+try:
+    import pymupdf  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_MAX_SIZE = (480, 680)
+PREVIEW_QUALITY = 80
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg"}
+
+
+def preview_name(sha256) -> str:
+    return f"previews/{sha256[:2]}/{sha256}.jpg"
+
+
+def _first_pdf_page(data):
+    with pymupdf.open(stream=data, filetype="pdf") as document:
+        if not document.page_count:
+            return None
+        page = document.load_page(0)
+        zoom = min(PREVIEW_MAX_SIZE[0] / page.rect.width, PREVIEW_MAX_SIZE[1] / page.rect.height)
+        pixmap = page.get_pixmap(matrix=pymupdf.Matrix(zoom, zoom), alpha=False)
+        return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+
+
+def _to_rgb(image):
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_preview(file_handle, extension):
+    """Return JPEG bytes of the first PDF page or a downscaled image; ``None`` if unsupported."""
+    if extension == "pdf":
+        if pymupdf is None:
+            return None
+        image = _first_pdf_page(file_handle.read())
+    elif extension in IMAGE_EXTENSIONS:
+        image = Image.open(file_handle)
+        image.draft("RGB", PREVIEW_MAX_SIZE)
+        image = ImageOps.exif_transpose(image)
+    else:
+        return None
+    if image is None:
+        return None
+    image = _to_rgb(image)
+    image.thumbnail(PREVIEW_MAX_SIZE)
+    output = io.BytesIO()
+    image.save(output, "JPEG", quality=PREVIEW_QUALITY, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+def generate_upload_preview(upload_file_id) -> bool:
+    """Create the preview of an upload's blob unless it exists; return whether one was stored."""
+    upload_file = UploadFile.objects.select_related("blob").filter(pk=upload_file_id).first()
+    if upload_file is None or upload_file.blob is None or upload_file.blob.preview:
+        return False
+    blob = upload_file.blob
+    extension = Path(upload_file.original_name).suffix.lower().lstrip(".")
+    try:
+        with blob.file.open("rb") as file_handle:
+            data = render_preview(file_handle, extension)
+    except Exception:
+        logger.warning("Could not render preview for blob %s.", blob.sha256, exc_info=True)
+        return False
+    if data is None:
+        return False
+    storage = blob.preview.storage
+    name = preview_name(blob.sha256)
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(data))
+    return bool(FileBlob.objects.filter(pk=blob.pk, preview="").update(preview=name))
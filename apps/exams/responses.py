@@ -0,0 +1,251 @@
+import mimetypes
+import re
+import secrets
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from apps.exams.async_io import aiter_file, aiter_sync
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# More ranges than this in one request are answered with the full body.
+MAX_BYTE_RANGES = 16
+
+_RANGE_SPEC_RE = re.compile(r"^(\d*)-(\d*)$")
+
+
+def _parse_range_spec(spec, size):
+    match = _RANGE_SPEC_RE.match(spec.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        suffix = int(last)
+        if suffix == 0:
+            return False
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = int(last) if last else None
+    if end is not None and end < start:
+        return None
+    if start >= size:
+        return False
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def parse_byte_ranges(header, size):
+    """Return the satisfiable ``(start, end)`` pairs (end inclusive) of a ``Range`` header.
+
+    Returns ``None`` when the header is absent or malformed (the full body is
+    served then) and ``False`` when none of the ranges can be satisfied for a
+    body of ``size`` bytes.
+    """
+    header = (header or "").strip()
+    if not header.startswith("bytes="):
+        return None
+    specs = header[len("bytes="):].split(",")
+    if len(specs) > MAX_BYTE_RANGES:
+        return None
+    ranges = []
+    for spec in specs:
+        byte_range = _parse_range_spec(spec, size)
+        if byte_range is None:
+            return None
+        if byte_range:
+            ranges.append(byte_range)
+    return ranges or False
+
+
+def parse_range_header(header, size):
+    """Single-range variant of ``parse_byte_ranges``; multi-range headers yield ``None``."""
+    ranges = parse_byte_ranges(header, size)
+    if ranges and len(ranges) > 1:
+        return None
+    return ranges[0] if ranges else ranges
+
+
+def file_etag(size, modified=None, digest=None) -> str:
+    """Strong validator: the stored content hash if known, else size and mtime."""
+    if digest:
+        return f'"{digest}"'
+    stamp = int(modified.timestamp() * 1_000_000) if modified else 0
+    return f'"{size:x}-{stamp:x}"'
+
+
+def _set_validators(response, etag, last_modified):
+    if etag:
+        response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def conditional_file_response(request, etag, last_modified=None):
+    """Return a 304/412 response when the client's validators decide the request, else ``None``."""
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        _set_validators(response, etag, last_modified)
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return etag is not None and if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return bool(last_modified and if_range_date == int(last_modified.timestamp()))
+
+
+def _requested_ranges(request, size, etag=None, last_modified=None):
+    if request.method not in ("GET", "HEAD") or not _if_range_matches(request, etag, last_modified):
+        return None
+    return parse_byte_ranges(request.headers.get("Range"), size)
+
+
+def _not_satisfiable(size):
+    response = HttpResponse(status=416)
+    response["Content-Range"] = f"bytes */{size}"
+    return response
+
+
+def _iter_range(file_handle, start, length, close=True):
+    try:
+        file_handle.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = file_handle.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        if close:
+            file_handle.close()
+
+
+def serving_asgi(request) -> bool:
+    """Whether ``request`` came through the ASGI handler.
+
+    Under WSGI Django reads an async body completely into memory before
+    sending it, so bodies stay synchronous there.
+    """
+    return isinstance(request, ASGIRequest)
+
+
+def ranged_file_response(request, file_handle, size, filename, content_type="application/octet-stream", as_attachment=True):
+    """Serve ``file_handle`` honouring a single ``Range`` request header."""
+    byte_range = parse_range_header(request.headers.get("Range"), size) if request.method in ("GET", "HEAD") else None
+    if byte_range is False:
+        file_handle.close()
+        response = _not_satisfiable(size)
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(_iter_range(file_handle, start, end - start + 1), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    else:
+        response = FileResponse(file_handle, as_attachment=as_attachment, filename=filename, content_type=content_type)
+        response["Content-Length"] = str(size)
+    response["Accept-Ranges"] = "bytes"
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def _multipart_heads(ranges, size, content_type, boundary):
+    return [
+        f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode("ascii")
+        for start, end in ranges
+    ]
+
+
+def _iter_multipart(file_handle, ranges, heads, closing):
+    try:
+        for (start, end), head in zip(ranges, heads):
+            yield head
+            yield from _iter_range(file_handle, start, end - start + 1, close=False)
+            yield b"\r\n"
+        yield closing
+    finally:
+        file_handle.close()
+
+
+async def _aiter_multipart(reader, ranges, heads, closing):
+    await reader.open()
+    try:
+        for (start, end), head in zip(ranges, heads):
+            yield head
+            await reader.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await reader.read(min(STREAM_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+            yield b"\r\n"
+        yield closing
+    finally:
+        await reader.close()
+
+
+def async_file_response(request, reader, size, filename, content_type=None, as_attachment=True, etag=None, last_modified=None):
+    """Async counterpart of ``ranged_file_response``; ``reader`` is an ``AsyncFileReader``.
+
+    Several ranges are answered as ``multipart/byteranges``; ``If-Range`` is
+    checked against ``etag``/``last_modified``. Under WSGI the file is read
+    with blocking calls instead.
+    """
+    content_type = content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    asgi = serving_asgi(request)
+    ranges = _requested_ranges(request, size, etag, last_modified)
+    if ranges is False:
+        response = _not_satisfiable(size)
+    elif ranges and len(ranges) > 1:
+        boundary = secrets.token_hex(16)
+        heads = _multipart_heads(ranges, size, content_type, boundary)
+        closing = f"--{boundary}--\r\n".encode("ascii")
+        length = sum(len(head) + end - start + 3 for head, (start, end) in zip(heads, ranges)) + len(closing)
+        response = StreamingHttpResponse(
+            _aiter_multipart(reader, ranges, heads, closing) if asgi else _iter_multipart(reader.open_blocking(), ranges, heads, closing),
+            status=206,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+        )
+        response["Content-Length"] = str(length)
+        response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    else:
+        start, end = ranges[0] if ranges else (0, size - 1)
+        length = max(end - start + 1, 0)
+        response = StreamingHttpResponse(
+            aiter_file(reader, start=start, length=length) if asgi else _iter_range(reader.open_blocking(), start, length),
+            status=206 if ranges else 200,
+            content_type=content_type,
+        )
+        if ranges:
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+        response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    _set_validators(response, etag, last_modified)
+    response["Accept-Ranges"] = "bytes"
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def as_async_streaming(request, response):
+    """Let the ASGI handler pull a blocking streaming body without stalling the event loop.
+
+    Under WSGI the body is left as it is.
+    """
+    if serving_asgi(request) and response.streaming and not response.is_async:
+        response.streaming_content = aiter_sync(response.streaming_content)
+    return response
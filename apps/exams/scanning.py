@@ -0,0 +1,34 @@
+import logging
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+
+from apps.exams.models import UploadFile
+from apps.exams.security import scan_uploaded_file
+
+logger = logging.getLogger(__name__)
+
+
+def run_upload_scan(upload_file_id):
+    """Run the full-content checks for a quarantined upload and store the verdict.
+
+    Returns the new scan status, or ``None`` if the file is gone or was already scanned.
+    """
+    upload_file = UploadFile.objects.filter(pk=upload_file_id, scan_status=UploadFile.ScanStatus.PENDING_SCAN).first()
+    if upload_file is None:
+        return None
+    extension = Path(upload_file.original_name).suffix.lower().lstrip(".")
+    status, error = UploadFile.ScanStatus.CLEAN, ""
+    try:
+        with upload_file.file.open("rb") as file_handle:
+            scan_uploaded_file(file_handle, extension)
+    except ValidationError as exc:
+        status, error = UploadFile.ScanStatus.REJECTED, " ".join(exc.messages)
+    except OSError:
+        logger.exception("Could not read upload %s for scanning.", upload_file_id)
+        status, error = UploadFile.ScanStatus.REJECTED, "Die Datei konnte nicht geprüft werden."
+    UploadFile.objects.filter(pk=upload_file_id, scan_status=UploadFile.ScanStatus.PENDING_SCAN).update(
+        scan_status=status,
+        scan_error=error[:255],
+    )
+    return status
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Count, Q, Sum
+
+from apps.exams.fulltext import index_batches
+from apps.exams.models import BatchSearchDoc, UploadBatch
+from apps.pages.fragments import bump_namespace
+
+# Query parameter -> BatchSearchDoc column.
+FACETS = {
+    "year": "year_key",
+    "type": "type_key",
+    "subject": "subject_key",
+    "teacher": "teacher_name",
+    "program": "program_key",
+}
+# Orderings are unique thanks to the trailing primary key, which keyset paging needs.
+SORTS = {
+    "newest": ("created_at", "batch_id"),
+    "downloads": ("download_count", "created_at", "batch_id"),
+}
+ARCHIVE_PAGE_SIZE = 25
+
+_OPTION_FIELDS = ("type", "year", "subject", "program")
+_DOC_FIELDS = [
+    *(f"{name}_key" for name in _OPTION_FIELDS),
+    *(f"{name}_label" for name in _OPTION_FIELDS),
+    "teacher_name",
+    "file_count",
+    "total_size",
+    "download_count",
+    "created_at",
+]
+
+
+def _build_doc(batch):
+    doc = BatchSearchDoc(
+        batch_id=batch.pk,
+        teacher_name=batch.teacher.name if batch.teacher else "",
+        file_count=batch.file_count,
+        total_size=batch.total_size or 0,
+        download_count=batch.download_count,
+        created_at=batch.created_at,
+    )
+    for name in _OPTION_FIELDS:
+        option = getattr(batch, f"{name}_option")
+        setattr(doc, f"{name}_key", option.value_key if option else "")
+        setattr(doc, f"{name}_label", option.label if option else "")
+    doc.type_label = doc.type_label or batch.get_content_type_display()
+    return doc
+
+
+def sync_search_docs(batch_ids) -> None:
+    """Rewrite the search docs of ``batch_ids``: approved batches get a fresh row, all others lose theirs."""
+    batch_ids = set(batch_ids)
+    if not batch_ids:
+        return
+    batches = (
+        UploadBatch.objects.filter(pk__in=batch_ids, status=UploadBatch.Status.APPROVED)
+        .select_related(*(f"{name}_option" for name in _OPTION_FIELDS), "teacher")
+        .annotate(file_count=Count("files"), total_size=Sum("files__size"))
+    )
+    docs = [_build_doc(batch) for batch in batches]
+    deleted, _ = BatchSearchDoc.objects.filter(pk__in=batch_ids - {doc.batch_id for doc in docs}).delete()
+    if not docs and not deleted:
+        return
+    BatchSearchDoc.objects.bulk_create(docs, update_conflicts=True, unique_fields=["batch"], update_fields=_DOC_FIELDS)
+    index_batches(batch_ids)
+    bump_namespace("archive")
+
+
+def rebuild_search_docs(chunk_size=500) -> int:
+    """Re-sync every approved batch and drop stale docs; return the number of approved batches."""
+    stale_ids = list(BatchSearchDoc.objects.exclude(batch__status=UploadBatch.Status.APPROVED).values_list("pk", flat=True))
+    batch_ids = list(UploadBatch.objects.filter(status=UploadBatch.Status.APPROVED).values_list("pk", flat=True))
+    pending = [*stale_ids, *batch_ids]
+    for start in range(0, len(pending), chunk_size):
+        sync_search_docs(pending[start : start + chunk_size])
+    return len(batch_ids)
+
+
+def _filter_q(filters, skip=None):
+    return Q(**{FACETS[name]: value for name, value in filters.items() if value and name != skip})
+
+
+def facet_counts(filters, batch_ids=None):
+    """``{facet: {value: count}}`` for every facet, each counted under the other facets' filters.
+
+    One grouped query over the distinct facet combinations; the per-facet
+    sums are taken in Python. ``batch_ids`` narrows the counts to search hits.
+    """
+    docs = BatchSearchDoc.objects.all() if batch_ids is None else BatchSearchDoc.objects.filter(pk__in=batch_ids)
+    combos = docs.values(*FACETS.values()).annotate(total=Count("pk")).order_by()
+    counts = {name: {} for name in FACETS}
+    for combo in combos:
+        for name, column in FACETS.items():
+            if all(combo[FACETS[other]] == value for other, value in filters.items() if value and other != name):
+                counts[name][combo[column]] = counts[name].get(combo[column], 0) + combo["total"]
+    return counts
+
+
+def _encode_cursor(doc, fields) -> str:
+    values = [getattr(doc, field) for field in fields]
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, fields):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise ValueError("Invalid cursor.")
+    try:
+        return [datetime.fromisoformat(value) if field == "created_at" else int(value) for field, value in zip(fields, values)]
+    except (TypeError, ValueError, OverflowError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def _after(fields, values):
+    """Rows that come after ``values`` in descending ``fields`` order."""
+    condition = Q()
+    for index, field in enumerate(fields):
+        condition |= Q(**dict(zip(fields[:index], values[:index])), **{f"{field}__lt": values[index]})
+    return condition
+
+
+def search_batches(filters, sort="newest", cursor=None, limit=ARCHIVE_PAGE_SIZE):
+    """One page of search docs matching ``filters`` and the cursor of the next page.
+
+    Raises ``ValueError`` for a malformed cursor.
+    """
+    fields = SORTS.get(sort, SORTS["newest"])
+    docs = BatchSearchDoc.objects.filter(_filter_q(filters)).order_by(*(f"-{field}" for field in fields))
+    if cursor:
+        docs = docs.filter(_after(fields, _decode_cursor(cursor, fields)))
+    docs = list(docs[: limit + 1])
+    next_cursor = _encode_cursor(docs[limit - 1], fields) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def search_ranked(filters, batch_ids, cursor=None, limit=ARCHIVE_PAGE_SIZE):
+    """Page through ``batch_ids`` (full-text hits, best first) that match ``filters``.
+
+    The cursor is the offset into the ranked hits; raises ``ValueError`` for a malformed one.
+    """
+    start = int(cursor) if cursor else 0
+    if start < 0:
+        raise ValueError("Invalid cursor.")
+    docs = {doc.pk: doc for doc in BatchSearchDoc.objects.filter(_filter_q(filters), pk__in=batch_ids)}
+    ranked = [docs[pk] for pk in batch_ids if pk in docs]
+    next_cursor = str(start + limit) if len(ranked) > start + limit else None
+    return ranked[start : start + limit], next_cursor
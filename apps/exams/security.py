@@ -6,9 +6,17 @@ from django.core.exceptions import ValidationError
 from django.utils.text import get_valid_filename
 
 MAX_FILE_SIZE = 15 * 1024 * 1024
+MAX_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
 MAX_FILES_PER_SUBMISSION = 10
 MAX_ZIP_ENTRIES = 200
 MAX_ZIP_TOTAL_UNCOMPRESSED = 150 * 1024 * 1024
+# Leading bytes used to recognise the file format.
+SNIFF_HEADER_SIZE = 8
+
+# A PDF must end with its trailer (startxref ... %%EOF) within this many bytes.
+PDF_TRAILER_WINDOW = 1024
+
+FILE_TOO_LARGE_MESSAGE = "Die Datei ist zu gross. Maximal 15 MB erlaubt."
 
 ALLOWED_EXTENSIONS = {"pdf", "docx", "pptx", "xlsx", "png", "jpg", "jpeg", "zip"}
 BLOCKED_EXTENSIONS = {
@@ -39,6 +47,18 @@ ALLOWED_MIME_TYPES = {
     "zip": {"application/zip", "application/x-zip-compressed"},
 }
 
+# Formats that are already compressed; deflating them again only costs CPU.
+PRECOMPRESSED_MIME_TYPES = {
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "image/png",
+    "image/jpeg",
+    "application/zip",
+    "application/x-zip-compressed",
+}
+
 try:
     import magic  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency
@@ -57,7 +77,7 @@ def sanitize_filename(name: str) -> str:
     return cleaned
 
 
-def _read_header(uploaded_file, length=8) -> bytes:
+def _read_header(uploaded_file, length=SNIFF_HEADER_SIZE) -> bytes:
     try:
         uploaded_file.seek(0)
         return uploaded_file.read(length)
@@ -68,8 +88,7 @@ def _read_header(uploaded_file, length=8) -> bytes:
             pass
 
 
-def _sniff_mime(uploaded_file) -> str:
-    header = _read_header(uploaded_file, length=8)
+def sniff_header(header: bytes) -> str:
     if magic:
         try:
             return magic.from_buffer(header, mime=True)
@@ -86,6 +105,14 @@ def _sniff_mime(uploaded_file) -> str:
     return ""
 
 
+def _sniff_mime(uploaded_file) -> str:
+    # Set by the inspecting upload handlers while the upload was received.
+    sniffed = getattr(uploaded_file, "sniffed_mime", None)
+    if sniffed is not None:
+        return sniffed
+    return sniff_header(_read_header(uploaded_file))
+
+
 def _is_unsafe_zip_path(name: str) -> bool:
     normalized = name.replace("\\", "/")
     if normalized.startswith(("/", "\\")):
@@ -96,21 +123,31 @@ def _is_unsafe_zip_path(name: str) -> bool:
     return ".." in parts
 
 
-def validate_uploaded_file(uploaded_file) -> None:
-    if uploaded_file.size > MAX_FILE_SIZE:
-        raise ValidationError("Die Datei ist zu gross. Maximal 15 MB erlaubt.")
-    name = uploaded_file.name or ""
-    extension = Path(name).suffix.lower().lstrip(".")
+def validate_upload_metadata(name, size, content_type="") -> str:
+    """Run the checks that need no file content and return the file extension."""
+    if size > MAX_FILE_SIZE:
+        raise ValidationError(FILE_TOO_LARGE_MESSAGE)
+    extension = Path(name or "").suffix.lower().lstrip(".")
     if not extension:
         raise ValidationError("Dateien müssen eine gültige Dateiendung besitzen.")
     if extension in BLOCKED_EXTENSIONS:
         raise ValidationError("Ausführbare oder skriptbasierte Dateien sind nicht erlaubt.")
     if extension not in ALLOWED_EXTENSIONS:
         raise ValidationError("Dateityp nicht erlaubt.")
-    content_type = (getattr(uploaded_file, "content_type", "") or "").lower()
+    content_type = (content_type or "").lower()
     allowed_types = ALLOWED_MIME_TYPES.get(extension)
     if content_type and allowed_types and content_type not in allowed_types:
         raise ValidationError("Der Dateityp stimmt nicht mit dem Inhalt überein.")
+    return extension
+
+
+def validate_uploaded_file(uploaded_file, deep=True) -> None:
+    """Check name, size and format; ``deep=False`` leaves the full-content checks to ``scan_uploaded_file``."""
+    extension = validate_upload_metadata(
+        uploaded_file.name,
+        uploaded_file.size,
+        getattr(uploaded_file, "content_type", ""),
+    )
     detected = _sniff_mime(uploaded_file)
     if not detected:
         raise ValidationError("Der Dateityp konnte nicht verifiziert werden.")
@@ -122,8 +159,50 @@ def validate_uploaded_file(uploaded_file) -> None:
         raise ValidationError("Die Datei ist kein gültiges JPG.")
     if extension == "png" and detected != "image/png":
         raise ValidationError("Die Datei ist kein gültiges PNG.")
+    if deep:
+        scan_uploaded_file(uploaded_file, extension)
+
+
+def scan_uploaded_file(uploaded_file, extension) -> None:
+    """Checks that read the whole file: ZIP directory, PDF trailer and, if installed, python-magic."""
     if extension == "zip":
         inspect_zip_upload(uploaded_file)
+    elif extension == "pdf":
+        inspect_pdf_upload(uploaded_file)
+    if magic:
+        inspect_full_mime(uploaded_file, extension)
+
+
+def inspect_pdf_upload(uploaded_file) -> None:
+    try:
+        uploaded_file.seek(max(uploaded_file.size - PDF_TRAILER_WINDOW, 0))
+        trailer = uploaded_file.read()
+        if b"startxref" not in trailer or b"%%EOF" not in trailer:
+            raise ValidationError("Das PDF ist unvollständig oder beschädigt.")
+    finally:
+        try:
+            uploaded_file.seek(0)
+        except Exception:
+            pass
+
+
+def inspect_full_mime(uploaded_file, extension) -> None:
+    try:
+        uploaded_file.seek(0)
+        detected = magic.from_buffer(uploaded_file.read(), mime=True)
+    except Exception:
+        detected = ""
+    finally:
+        try:
+            uploaded_file.seek(0)
+        except Exception:
+            pass
+    allowed_types = set(ALLOWED_MIME_TYPES.get(extension, ()))
+    if extension in {"docx", "pptx", "xlsx"}:
+        # libmagic reports some Office files only as ZIP containers.
+        allowed_types.add("application/zip")
+    if detected not in allowed_types:
+        raise ValidationError("Der Dateityp stimmt nicht mit dem Inhalt überein.")
 
 
 def inspect_zip_upload(uploaded_file) -> None:
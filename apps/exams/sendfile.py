@@ -0,0 +1,52 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import HttpResponse
+from django.utils.http import content_disposition_header
+
+
+def _nginx(path, media_name):
+    prefix = settings.SENDFILE_URL_PREFIX.rstrip("/")
+    return "X-Accel-Redirect", f"{prefix}/{quote(media_name)}"
+
+
+def _apache(path, media_name):
+    return "X-Sendfile", path
+
+
+# SENDFILE_BACKEND -> builder for the header that hands the file to the web server.
+BACKENDS = {
+    "nginx": _nginx,
+    "apache": _apache,
+}
+
+
+def sendfile_response(path, filename, content_type=None, as_attachment=True):
+    """Return an empty response telling the web server to send ``path``.
+
+    Returns ``None`` when the Python backend is configured or ``path`` lies
+    outside ``MEDIA_ROOT`` (the only directory the web server exposes).
+    """
+    backend = BACKENDS.get(settings.SENDFILE_BACKEND)
+    if backend is None:
+        return None
+    media_root = os.path.realpath(settings.MEDIA_ROOT)
+    path = os.path.realpath(path)
+    if os.path.commonpath([media_root, path]) != media_root:
+        return None
+    header, value = backend(path, os.path.relpath(path, media_root).replace(os.sep, "/"))
+    response = HttpResponse(content_type=content_type or mimetypes.guess_type(filename)[0] or "application/octet-stream")
+    response[header] = value
+    response["Content-Disposition"] = content_disposition_header(as_attachment, filename)
+    response["X-Content-Type-Options"] = "nosniff"
+    return response
+
+
+def storage_sendfile_response(storage, name, filename, content_type=None, as_attachment=True):
+    """``sendfile_response`` for a stored file; remote storages such as S3 return ``None``."""
+    if settings.SENDFILE_BACKEND not in BACKENDS or not isinstance(storage, FileSystemStorage):
+        return None
+    return sendfile_response(storage.path(name), filename, content_type, as_attachment)
@@ -0,0 +1,80 @@
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.exams.blobs import release_blob
+from apps.exams.fulltext import remove_batches
+from apps.exams.models import BatchSearchDoc, MetaCategory, MetaOption, UploadBatch, UploadFile
+from apps.exams.search import sync_search_docs
+from apps.exams.tasks import schedule_text_extraction
+from apps.exams.vocabulary import invalidate_vocabulary
+from apps.exams.zipcache import invalidate_archive
+from apps.pages.fragments import bump_namespace
+from apps.ranking.models import Teacher
+
+
+@receiver(post_delete, sender=UploadFile)
+def release_upload_file_blob(sender, instance, **kwargs):
+    if instance.blob_id:
+        release_blob(instance.blob_id)
+
+
+@receiver(post_save, sender=UploadFile)
+@receiver(post_delete, sender=UploadFile)
+def invalidate_batch_zip_archive(sender, instance, **kwargs):
+    invalidate_archive(instance.batch_id)
+
+
+@receiver(post_delete, sender=UploadBatch)
+def delete_batch_zip_archive(sender, instance, **kwargs):
+    if instance.zip_archive:
+        storage = instance.zip_archive.storage
+        name = instance.zip_archive.name
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=UploadBatch)
+def sync_batch_search_doc(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_search_docs([instance.pk])
+        if instance.status == UploadBatch.Status.APPROVED:
+            schedule_text_extraction([instance.pk])
+
+
+@receiver(post_delete, sender=UploadBatch)
+def remove_batch_fulltext(sender, instance, **kwargs):
+    remove_batches([instance.pk])
+
+
+@receiver(post_save, sender=UploadFile)
+@receiver(post_delete, sender=UploadFile)
+def sync_file_search_doc(sender, instance, raw=False, **kwargs):
+    # Only listed batches have a doc; this also keeps a cascading batch delete from recreating it.
+    if not raw and BatchSearchDoc.objects.filter(pk=instance.batch_id).exists():
+        sync_search_docs([instance.batch_id])
+
+
+@receiver(post_save, sender=MetaOption)
+def sync_option_search_docs(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    batches = UploadBatch.objects.filter(
+        models.Q(type_option=instance) | models.Q(year_option=instance) | models.Q(subject_option=instance) | models.Q(program_option=instance)
+    )
+    sync_search_docs(batches.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=Teacher)
+def sync_teacher_search_docs(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_search_docs(instance.upload_batches.values_list("pk", flat=True))
+
+
+@receiver([post_save, post_delete], sender=MetaCategory)
+@receiver([post_save, post_delete], sender=MetaOption)
+@receiver([post_save, post_delete], sender=Teacher)
+def refresh_vocabulary(sender, raw=False, **kwargs):
+    # Filter options and labels are part of every cached archive page.
+    if not raw:
+        invalidate_vocabulary()
+        bump_namespace("archive")
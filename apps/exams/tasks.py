@@ -0,0 +1,80 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.exams.counters import flush_download_counts as _flush_download_counts
+from apps.exams.fulltext import index_batches
+from apps.exams.models import UploadBatch, UploadFile
+from apps.exams.renditions import generate_upload_preview
+from apps.exams.scanning import run_upload_scan
+from apps.exams.textextract import extract_upload_text as _extract_upload_text
+from apps.pages.celery import app
+from apps.pages.fragments import bump_namespace
+
+logger = logging.getLogger(__name__)
+
+
+def _run(task, *args):
+    """Queue ``task`` on the worker; run it inline if disabled or no worker is reachable."""
+    if settings.UPLOAD_SCAN_IN_BACKGROUND:
+        try:
+            task.delay(*args)
+            return
+        except Exception:
+            logger.exception("Could not queue %s%r; running inline.", task.name, args)
+    task(*args)
+
+
+@app.task
+def flush_download_counts():
+    return _flush_download_counts()
+
+
+@app.task
+def scan_upload_file(upload_file_id):
+    status = run_upload_scan(upload_file_id)
+    if status == UploadFile.ScanStatus.CLEAN:
+        _run(render_upload_preview, upload_file_id)
+    return status
+
+
+@app.task
+def render_upload_preview(upload_file_id):
+    return generate_upload_preview(upload_file_id)
+
+
+def schedule_upload_scans(upload_file_ids) -> None:
+    """Queue the deep checks once the upload is committed; previews follow for clean files."""
+    upload_file_ids = list(upload_file_ids)
+    transaction.on_commit(lambda: [_run(scan_upload_file, upload_file_id) for upload_file_id in upload_file_ids])
+
+
+@app.task
+def extract_upload_text(upload_file_id):
+    """Extract an upload's text and refresh the full-text rows of every batch sharing its blob."""
+    if not _extract_upload_text(upload_file_id):
+        return False
+    blob_id = UploadFile.objects.filter(pk=upload_file_id).values_list("blob_id", flat=True).first()
+    index_batches(set(UploadFile.objects.filter(blob_id=blob_id).values_list("batch_id", flat=True)))
+    bump_namespace("archive")
+    return True
+
+
+def pending_text_extractions(batch_ids=None):
+    """Clean files of approved batches whose blob has no extracted text yet."""
+    upload_files = UploadFile.objects.filter(
+        batch__status=UploadBatch.Status.APPROVED,
+        scan_status=UploadFile.ScanStatus.CLEAN,
+        blob__isnull=False,
+        blob__text__isnull=True,
+    )
+    if batch_ids is not None:
+        upload_files = upload_files.filter(batch_id__in=batch_ids)
+    return upload_files.values_list("pk", flat=True)
+
+
+def schedule_text_extraction(batch_ids) -> None:
+    """Queue text extraction for newly approved batches once the approval is committed."""
+    batch_ids = list(batch_ids)
+    transaction.on_commit(lambda: [_run(extract_upload_text, upload_file_id) for upload_file_id in pending_text_extractions(batch_ids)])
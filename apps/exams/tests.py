@@ -1,9 +1,55 @@
+import base64
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from unittest import mock
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+
+from asgiref.sync import async_to_sync
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from apps.exams.models import MetaOption, UploadBatch, UploadFile
+from apps.exams.async_io import aiter_file, async_reader_for
+from apps.exams.counters import flush_download_counts, record_download
+from apps.exams.export import plan_export_parts
+from apps.exams.forms import UploadBatchForm
+from apps.exams import ingest, textextract, vocabulary
+from apps.exams.ingest import ingest_upload_files
+from apps.exams.models import BatchSearchDoc, BlobText, ChunkedUpload, FileBlob, MetaCategory, MetaOption, UploadBatch, UploadFile
+from apps.exams.prefetch import StoragePrefetcher
+from apps.exams.renditions import PREVIEW_MAX_SIZE, generate_upload_preview
+from apps.exams.scanning import run_upload_scan
+from apps.exams.fulltext import search as fulltext_search
+from apps.exams.search import facet_counts, search_batches
+from apps.exams.tasks import extract_upload_text, pending_text_extractions
+from apps.exams.sendfile import sendfile_response
+from apps.exams.uploadhandlers import (
+    InspectingMemoryFileUploadHandler,
+    InspectingTemporaryFileUploadHandler,
+    InspectingUploadMixin,
+)
+from apps.exams.views import _create_upload_file, build_zip_response, zip_compression_for
+from apps.exams.vocabulary import find_option, find_teacher_ids, get_vocabulary
+from apps.pages.counterbuffer import BufferedCounter
+from apps.pages.tests import use_fake_redis
 from apps.ranking.models import Teacher
+def read_streaming(response):
+    if not response.is_async:
+        return b"".join(response.streaming_content)
+
+    async def collect():
+        return b"".join([chunk async for chunk in response.streaming_content])
+
+    return async_to_sync(collect)()
 class UploadBatchTests(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username="tester", password="pass")
@@ -60,3 +106,660 @@ class UploadBatchTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response["Content-Type"], "application/zip")
         self.assertIn("attachment;", response["Content-Disposition"])
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FileBlobTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create()
+    def _upload(self, content=b"%PDF-1.4 same exam"):
+        incoming = SimpleUploadedFile("exam.pdf", content, content_type="application/pdf")
+        return _create_upload_file(self.batch, incoming)
+    def test_duplicate_upload_reuses_blob(self):
+        first = self._upload()
+        second = self._upload()
+        self.assertEqual(first.blob_id, second.blob_id)
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(FileBlob.objects.count(), 1)
+        self.assertEqual(FileBlob.objects.get().ref_count, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(first.file.path))), 1)
+    def test_blob_removed_with_last_reference(self):
+        first = self._upload()
+        second = self._upload()
+        stored_path = first.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(stored_path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(os.path.exists(stored_path))
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_STORE_WORKERS=4)
+class UploadIngestTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create()
+    def _files(self, count, prefix="exam"):
+        return [SimpleUploadedFile(f"{prefix}-{index}.pdf", f"%PDF-1.4 {prefix} {index % 3}".encode()) for index in range(count)]
+    def test_rows_are_bulk_inserted_in_order(self):
+        with CaptureQueriesContext(connection) as small:
+            ingest_upload_files(self.batch, self._files(2, "small"))
+        with CaptureQueriesContext(connection) as large:
+            upload_files = ingest_upload_files(self.batch, self._files(6, "large"))
+        self.assertEqual(len(large), len(small))
+        self.assertEqual([upload_file.original_name for upload_file in upload_files], [f"large-{index}.pdf" for index in range(6)])
+        self.assertEqual(sorted(FileBlob.objects.filter(sha256__in=[f.blob.sha256 for f in upload_files]).values_list("ref_count", flat=True)), [2, 2, 2])
+    def test_blob_released_during_ingest_is_stored_again(self):
+        first = ingest_upload_files(self.batch, [SimpleUploadedFile("a.pdf", b"%PDF-1.4 same")])[0]
+        write_blobs = ingest._write_blobs
+
+        def release_then_write(new_files):
+            # The content was known when the upload looked it up, then its last reference went away.
+            if first.pk is not None:
+                first.delete()
+            return write_blobs(new_files)
+
+        with mock.patch.object(ingest, "_write_blobs", release_then_write):
+            upload_file = ingest_upload_files(self.batch, [SimpleUploadedFile("b.pdf", b"%PDF-1.4 same")])[0]
+        blob = FileBlob.objects.get(pk=upload_file.blob_id)
+        self.assertEqual(blob.ref_count, 1)
+        with blob.file.open("rb") as stored:
+            self.assertEqual(stored.read(), b"%PDF-1.4 same")
+    def _stored_names(self):
+        return {name for _, _, names in os.walk(default_storage.location) for name in names}
+    def test_failed_insert_leaves_no_rows_or_files(self):
+        stored_before = self._stored_names()
+        with mock.patch.object(UploadFile.objects, "bulk_create", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                ingest_upload_files(self.batch, self._files(3, "failed"))
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(self.batch.files.exists())
+        self.assertEqual(self._stored_names(), stored_before)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class InspectingUploadHandlerTests(TestCase):
+    def _parse(self, content):
+        request = RequestFactory().post("/upload", data={"files": SimpleUploadedFile("exam.pdf", content, content_type="application/pdf")})
+        request.upload_handlers = [InspectingMemoryFileUploadHandler(request), InspectingTemporaryFileUploadHandler(request)]
+        return request, request.FILES.getlist("files")
+    def test_hash_and_mime_recorded_while_receiving(self):
+        content = b"%PDF-1.4 " + b"x" * 5000
+        for memory_limit in (2621440, 100):
+            with self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=memory_limit):
+                _, (uploaded,) = self._parse(content)
+            self.assertEqual(uploaded.sha256, hashlib.sha256(content).hexdigest())
+            self.assertEqual(uploaded.sniffed_mime, "application/pdf")
+    def test_oversized_upload_stops_body_read(self):
+        batch = UploadBatch.objects.create()
+        session = self.client.session
+        session["upload_batch_tokens"] = {str(batch.id): str(batch.token)}
+        session.save()
+        with mock.patch.object(InspectingUploadMixin, "max_file_size", 1000):
+            request, files = self._parse(b"%PDF-1.4 " + b"x" * 5000)
+            self.assertEqual(files, [])
+            self.assertEqual(len(request.upload_errors), 1)
+            response = self.client.post(
+                reverse("exams:upload_batch_files", args=[batch.id]),
+                data={"files": [SimpleUploadedFile("big.pdf", b"%PDF-1.4 " + b"x" * 5000, content_type="application/pdf")]},
+                HTTP_X_UPLOAD_TOKEN=str(batch.token),
+            )
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(UploadFile.objects.exists())
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), CHUNKED_UPLOAD_DIR=tempfile.mkdtemp())
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create()
+        session = self.client.session
+        session["upload_batch_tokens"] = {str(self.batch.id): str(self.batch.token)}
+        session.save()
+        self.headers = {"HTTP_X_UPLOAD_TOKEN": str(self.batch.token)}
+        self.content = b"%PDF-1.4 " + b"x" * 100
+    def _init(self, name="exam.pdf"):
+        response = self.client.post(
+            reverse("exams:init_chunked_upload", args=[self.batch.id]),
+            data={"name": name, "size": len(self.content), "content_type": "application/pdf"},
+            content_type="application/json",
+            **self.headers,
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()["upload_id"]
+    def _put(self, upload_id, start, end):
+        return self.client.put(
+            reverse("exams:chunked_upload", args=[self.batch.id, upload_id]),
+            data=self.content[start:end],
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end - 1}/{len(self.content)}",
+            **self.headers,
+        )
+    def test_out_of_order_chunks_resume_and_finalize(self):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 60, len(self.content)).status_code, 200)
+        status = self.client.get(reverse("exams:chunked_upload", args=[self.batch.id, upload_id]), **self.headers).json()
+        self.assertEqual(status["missing"], [[0, 60]])
+        finalize_url = reverse("exams:finalize_chunked_upload", args=[self.batch.id, upload_id])
+        self.assertEqual(self.client.post(finalize_url, **self.headers).status_code, 409)
+        self._put(upload_id, 0, 60)
+        response = self.client.post(finalize_url, **self.headers)
+        self.assertEqual(response.status_code, 202)
+        upload_file = UploadFile.objects.get(pk=response.json()["files"][0]["id"])
+        self.assertEqual(upload_file.file.read(), self.content)
+        self.assertEqual(ChunkedUpload.objects.get().status, ChunkedUpload.Status.COMPLETE)
+    def test_finalize_rejects_content_that_fails_validation(self):
+        self.content = b"not a pdf at all"
+        upload_id = self._init()
+        self._put(upload_id, 0, len(self.content))
+        response = self.client.post(reverse("exams:finalize_chunked_upload", args=[self.batch.id, upload_id]), **self.headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadFile.objects.exists())
+        self.assertFalse(ChunkedUpload.objects.exists())
+    def test_requires_batch_token(self):
+        response = self.client.post(
+            reverse("exams:init_chunked_upload", args=[self.batch.id]),
+            data={"name": "exam.pdf", "size": 10},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 403)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_SCAN_IN_BACKGROUND=False)
+class UploadScanTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create()
+        session = self.client.session
+        session["upload_batch_tokens"] = {str(self.batch.id): str(self.batch.token)}
+        session.save()
+        self.headers = {"HTTP_X_UPLOAD_TOKEN": str(self.batch.token)}
+    def _scan(self, name, content):
+        upload_file = _create_upload_file(self.batch, SimpleUploadedFile(name, content))
+        self.assertEqual(upload_file.scan_status, UploadFile.ScanStatus.PENDING_SCAN)
+        run_upload_scan(upload_file.id)
+        upload_file.refresh_from_db()
+        return upload_file
+    def test_deep_checks_set_scan_status(self):
+        self.assertEqual(self._scan("ok.pdf", b"%PDF-1.4\nbody\nstartxref\n9\n%%EOF\n").scan_status, UploadFile.ScanStatus.CLEAN)
+        truncated = self._scan("cut.pdf", b"%PDF-1.4\nbody without trailer")
+        self.assertEqual(truncated.scan_status, UploadFile.ScanStatus.REJECTED)
+        self.assertIn("PDF", truncated.scan_error)
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("tool.exe", b"MZ")
+        self.assertEqual(self._scan("bundle.zip", archive.getvalue()).scan_status, UploadFile.ScanStatus.REJECTED)
+    def test_upload_is_accepted_and_scanned_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse("exams:upload_batch_files", args=[self.batch.id]),
+                data={"files": [SimpleUploadedFile("exam.pdf", b"%PDF-1.4\nstartxref\n0\n%%EOF", content_type="application/pdf")]},
+                **self.headers,
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["files"][0]["scan_status"], UploadFile.ScanStatus.PENDING_SCAN)
+        status = self.client.get(response.json()["status_url"], **self.headers).json()
+        self.assertEqual(status["pending"], 0)
+        self.assertEqual(status["files"][0]["scan_status"], UploadFile.ScanStatus.CLEAN)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class UploadPreviewTests(TestCase):
+    def _upload(self, batch, name, image_format):
+        from PIL import Image
+
+        content = io.BytesIO()
+        Image.new("RGB", (1200, 1700), "white").save(content, image_format)
+        return _create_upload_file(batch, SimpleUploadedFile(name, content.getvalue()))
+    def test_pdf_and_image_previews_are_shared_per_blob(self):
+        from PIL import Image
+
+        batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        for name, image_format in (("exam.pdf", "PDF"), ("scan.png", "PNG")):
+            upload_file = self._upload(batch, name, image_format)
+            self.assertTrue(generate_upload_preview(upload_file.id))
+            upload_file.blob.refresh_from_db()
+            with upload_file.blob.preview.open("rb") as preview:
+                image = Image.open(preview)
+                self.assertEqual(image.format, "JPEG")
+                self.assertLessEqual(image.width, PREVIEW_MAX_SIZE[0])
+        duplicate = self._upload(UploadBatch.objects.create(), "copy.png", "PNG")
+        self.assertFalse(generate_upload_preview(duplicate.id))
+        self.assertTrue(duplicate.blob.preview)
+    def test_preview_view_is_cacheable_for_approved_batches(self):
+        pending = self._upload(UploadBatch.objects.create(), "scan.png", "PNG")
+        generate_upload_preview(pending.id)
+        self.assertEqual(self.client.get(reverse("exams:upload_file_preview", args=[pending.id])).status_code, 404)
+        approved = self._upload(UploadBatch.objects.create(status=UploadBatch.Status.APPROVED), "scan.png", "PNG")
+        response = self.client.get(reverse("exams:upload_file_preview", args=[approved.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/jpeg")
+        self.assertIn("immutable", response["Cache-Control"])
+        revalidated = self.client.get(reverse("exams:upload_file_preview", args=[approved.id]), HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BatchZipCacheTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        _create_upload_file(self.batch, SimpleUploadedFile("a.pdf", b"%PDF-1.4 first", content_type="application/pdf"))
+        self.url = reverse("exams:download_upload_batch", args=[self.batch.id])
+    def _download(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = read_streaming(response)
+        return response, body
+    def test_first_download_populates_cache(self):
+        response, body = self._download()
+        self.assertEqual(response.status_code, 200)
+        self.batch.refresh_from_db()
+        self.assertTrue(self.batch.zip_archive)
+        cached_response, cached_body = self._download()
+        self.assertEqual(cached_body, body)
+        self.assertEqual(cached_response["Accept-Ranges"], "bytes")
+        partial, partial_body = self._download(HTTP_RANGE="bytes=0-9")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial_body, body[:10])
+    def test_file_change_invalidates_cache(self):
+        self._download()
+        self.batch.refresh_from_db()
+        archive_path = self.batch.zip_archive.path
+        with self.captureOnCommitCallbacks(execute=True):
+            _create_upload_file(self.batch, SimpleUploadedFile("b.pdf", b"%PDF-1.4 second", content_type="application/pdf"))
+        self.batch.refresh_from_db()
+        self.assertFalse(self.batch.zip_archive)
+        self.assertFalse(os.path.exists(archive_path))
+        response, body = self._download()
+        self.assertIn(b"b.pdf", body)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AsyncDownloadTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        self.content = b"%PDF-1.4 " + bytes(range(256)) * 4
+    def _read(self, storage, name, **kwargs):
+        async def collect():
+            return b"".join([chunk async for chunk in aiter_file(async_reader_for(storage, name), chunk_size=100, **kwargs)])
+
+        return async_to_sync(collect)()
+    def test_reader_works_for_local_and_remote_storage(self):
+        from django.core.files.storage import InMemoryStorage
+
+        for storage in (FileSystemStorage(location=tempfile.mkdtemp()), InMemoryStorage()):
+            name = storage.save("exam.pdf", ContentFile(self.content))
+            self.assertEqual(self._read(storage, name), self.content)
+            self.assertEqual(self._read(storage, name, start=10, length=300), self.content[10:310])
+    def test_upload_file_download_streams_ranges(self):
+        upload_file = _create_upload_file(self.batch, SimpleUploadedFile("exam.pdf", self.content, content_type="application/pdf"))
+        url = reverse("exams:download_upload_file", args=[upload_file.id])
+        response = self.client.get(url)
+        # The test client is a WSGI handler, which gets a blocking body.
+        self.assertFalse(response.is_async)
+        self.assertEqual(response["Content-Length"], str(len(self.content)))
+        self.assertEqual(read_streaming(response), self.content)
+        partial = self.client.get(url, HTTP_RANGE="bytes=-16")
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(read_streaming(partial), self.content[-16:])
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f"bytes={len(self.content)}-").status_code, 416)
+    def test_validators_and_multiple_ranges(self):
+        upload_file = _create_upload_file(self.batch, SimpleUploadedFile("exam.pdf", self.content, content_type="application/pdf"))
+        url = reverse("exams:download_upload_file", args=[upload_file.id])
+        response = self.client.get(url)
+        self.assertEqual(response["ETag"], f'"{upload_file.blob.sha256}"')
+        self.assertTrue(response.has_header("Last-Modified"))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        stale = self.client.get(url, HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"outdated"')
+        self.assertEqual(stale.status_code, 200)
+        multi = self.client.get(url, HTTP_RANGE="bytes=0-3,-4")
+        self.assertEqual(multi.status_code, 206)
+        self.assertTrue(multi["Content-Type"].startswith("multipart/byteranges; boundary="))
+        body = read_streaming(multi)
+        self.assertEqual(int(multi["Content-Length"]), len(body))
+        self.assertIn(self.content[:4], body)
+        self.assertIn(f"Content-Range: bytes {len(self.content) - 4}-{len(self.content) - 1}/{len(self.content)}".encode(), body)
+    def test_media_view_answers_revalidation_with_304(self):
+        from config.views import serve_media
+
+        with self.settings(USE_S3_MEDIA=False):
+            default_storage.save("memes/cat.png", ContentFile(b"\x89PNG cat"))
+            request = RequestFactory().get("/media/memes/cat.png")
+            response = async_to_sync(serve_media)(request, "memes/cat.png")
+            self.assertEqual(read_streaming(response), b"\x89PNG cat")
+            request = RequestFactory().get("/media/memes/cat.png", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(async_to_sync(serve_media)(request, "memes/cat.png").status_code, 304)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), SENDFILE_BACKEND="python")
+class AsyncStreamingViewTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        self.batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        content = io.BytesIO()
+        Image.new("RGB", (40, 40), "white").save(content, "PNG")
+        self.upload_file = _create_upload_file(self.batch, SimpleUploadedFile("scan.png", content.getvalue()))
+        generate_upload_preview(self.upload_file.id)
+        admin_user = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.async_client.force_login(admin_user)
+        self.client.force_login(admin_user)
+        self.urls = [
+            reverse("exams:download_filtered_zip"),
+            reverse("exams:upload_file_preview", args=[self.upload_file.id]),
+            reverse("exams:download_upload_file", args=[self.upload_file.id]),
+            reverse("admin:exams_uploadbatch_zip", args=[self.batch.id]),
+            # The second admin download is answered from the cached archive.
+            reverse("admin:exams_uploadbatch_zip", args=[self.batch.id]),
+        ]
+    async def test_zip_and_preview_views_stream_asynchronously(self):
+        for url in self.urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.is_async, url)
+            self.assertTrue(b"".join([chunk async for chunk in response.streaming_content]))
+    def test_wsgi_keeps_synchronous_bodies(self):
+        for url in self.urls:
+            response = self.client.get(url, HTTP_RANGE="bytes=0-3,8-11") if "preview" not in url else self.client.get(url)
+            self.assertIn(response.status_code, (200, 206))
+            self.assertFalse(response.is_async, url)
+            self.assertTrue(b"".join(response.streaming_content))
+class UploadBatchAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        self.batch = UploadBatch.objects.create()
+        self.upload_file = UploadFile.objects.create(batch=self.batch, original_name="a.pdf", file="uploads/a.pdf", size=10)
+        self.url = reverse("admin:exams_uploadbatch_change", args=[self.batch.id])
+    def _approve_in_change_form(self):
+        return self.client.post(self.url, {
+            "status": UploadBatch.Status.APPROVED,
+            "files-TOTAL_FORMS": 1,
+            "files-INITIAL_FORMS": 1,
+            "files-0-id": self.upload_file.id,
+            "files-0-batch": self.batch.id,
+        })
+    def test_unscanned_batch_cannot_be_approved(self):
+        self.client.post(reverse("admin:exams_uploadbatch_changelist"), {"action": "approve_batches", "_selected_action": [self.batch.id]})
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, UploadBatch.Status.PENDING)
+        response = self._approve_in_change_form()
+        self.assertContains(response, "Freigabe nicht möglich")
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, UploadBatch.Status.PENDING)
+    def test_scanned_batch_is_approved_from_change_form(self):
+        UploadFile.objects.filter(pk=self.upload_file.pk).update(scan_status=UploadFile.ScanStatus.CLEAN)
+        self.assertEqual(self._approve_in_change_form().status_code, 302)
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.status, UploadBatch.Status.APPROVED)
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), SENDFILE_BACKEND="nginx")
+class SendfileTests(TestCase):
+    def setUp(self):
+        batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        self.upload_file = _create_upload_file(batch, SimpleUploadedFile("Prüfung 1.pdf", b"%PDF-1.4 exam", content_type="application/pdf"))
+        self.url = reverse("exams:download_upload_file", args=[self.upload_file.id])
+    def test_nginx_backend_hands_off_internal_redirect(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b"")
+        self.assertTrue(response["X-Accel-Redirect"].startswith("/protected-media/blobs/"))
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertIn("attachment;", response["Content-Disposition"])
+    def test_apache_backend_and_outside_paths(self):
+        with self.settings(SENDFILE_BACKEND="apache"):
+            self.assertEqual(self.client.get(self.url)["X-Sendfile"], self.upload_file.file.path)
+        self.assertIsNone(sendfile_response("/etc/passwd", "passwd"))
+        with self.settings(SENDFILE_BACKEND="python"):
+            self.assertFalse(self.client.get(self.url).has_header("X-Accel-Redirect"))
+@override_settings(DOWNLOAD_COUNT_FLUSH_INTERVAL=3600)
+class DownloadCounterTests(TestCase):
+    def setUp(self):
+        use_fake_redis(self)
+        self.batches = [UploadBatch.objects.create(status=UploadBatch.Status.APPROVED) for _ in range(2)]
+    def test_downloads_are_buffered_until_flush(self):
+        first, second = self.batches
+        for batch in (first, first, second, first):
+            record_download(UploadBatch, batch.pk)
+        first.refresh_from_db()
+        self.assertEqual(first.download_count, 1)
+        self.assertEqual(flush_download_counts(), 3)
+        self.assertEqual(
+            list(UploadBatch.objects.order_by("pk").values_list("download_count", flat=True)),
+            [3, 1],
+        )
+        self.assertEqual(flush_download_counts(), 0)
+    def test_download_during_flush_stays_buffered(self):
+        first, _ = self.batches
+        record_download(UploadBatch, first.pk)
+        record_download(UploadBatch, first.pk)
+        write = BufferedCounter.write
+
+        def write_after_download(counter, deltas):
+            record_download(UploadBatch, first.pk)
+            write(counter, deltas)
+
+        with mock.patch.object(BufferedCounter, "write", write_after_download):
+            self.assertEqual(flush_download_counts(), 1)
+        self.assertEqual(flush_download_counts(), 1)
+        first.refresh_from_db()
+        self.assertEqual(first.download_count, 3)
+    def test_downloads_are_written_directly_without_redis(self):
+        first, _ = self.batches
+        with mock.patch("apps.pages.counterbuffer._redis", return_value=None):
+            record_download(UploadBatch, first.pk)
+            record_download(UploadBatch, first.pk)
+            self.assertEqual(flush_download_counts(), 0)
+        first.refresh_from_db()
+        self.assertEqual(first.download_count, 2)
+        self.assertEqual(BatchSearchDoc.objects.get(pk=first.pk).download_count, 2)
+    def test_archive_page_does_not_flush(self):
+        first, second = self.batches
+        record_download(UploadBatch, first.pk)
+        record_download(UploadBatch, second.pk)
+        record_download(UploadBatch, second.pk)
+        response = self.client.get(reverse("pruefungen"), {"sort": "downloads"})
+        self.assertEqual([batch.pk for batch in response.context["batches"]], [first.pk, second.pk])
+        flush_download_counts()
+        response = self.client.get(reverse("pruefungen"), {"sort": "downloads"})
+        self.assertEqual([batch.pk for batch in response.context["batches"]], [second.pk, first.pk])
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ZipCompressionTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+    def test_policy_stores_precompressed_formats(self):
+        self.assertEqual(zip_compression_for("exam.pdf"), ZIP_STORED)
+        self.assertEqual(zip_compression_for("slides.PPTX"), ZIP_STORED)
+        self.assertEqual(zip_compression_for("notes.txt", "text/plain"), ZIP_DEFLATED)
+    def test_stored_archive_has_exact_content_length(self):
+        _create_upload_file(self.batch, SimpleUploadedFile("a.pdf", b"%PDF-1.4 " + b"a" * 500, content_type="application/pdf"))
+        response = build_zip_response(self.batch.files.all(), "batch.zip")
+        body = b"".join(response.streaming_content)
+        self.assertEqual(int(response["Content-Length"]), len(body))
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertEqual(archive.infolist()[0].compress_type, ZIP_STORED)
+    def test_size_mismatch_drops_content_length(self):
+        upload_file = _create_upload_file(self.batch, SimpleUploadedFile("a.pdf", b"%PDF-1.4 " + b"a" * 500, content_type="application/pdf"))
+        with open(upload_file.file.path, "wb") as stored:
+            stored.write(b"%PDF-1.4 short")
+        with self.assertLogs("apps.exams.views", "WARNING"):
+            response = build_zip_response(self.batch.files.all(), "batch.zip")
+        self.assertFalse(response.has_header("Content-Length"))
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.read(archive.namelist()[0]), b"%PDF-1.4 short")
+    @override_settings(ZIP_COMPRESSION_PROBE=True)
+    def test_probe_deflates_compressible_content(self):
+        _create_upload_file(self.batch, SimpleUploadedFile("a.pdf", b"%PDF-1.4 " + b"a" * 5000, content_type="application/pdf"))
+        response = build_zip_response(self.batch.files.all(), "batch.zip")
+        self.assertFalse(response.has_header("Content-Length"))
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+            self.assertEqual(archive.infolist()[0].compress_type, ZIP_DEFLATED)
+class StoragePrefetcherTests(TestCase):
+    def setUp(self):
+        self.storage = FileSystemStorage(location=tempfile.mkdtemp())
+        self.contents = {f"member-{i}.bin": bytes([i]) * (1000 + i * 300) for i in range(6)}
+        for name, content in self.contents.items():
+            self.storage.save(name, ContentFile(content))
+    def test_members_are_read_in_order_with_small_buffer(self):
+        names = list(self.contents)
+        prefetcher = StoragePrefetcher(self.storage, names, workers=3, max_buffer_bytes=512, chunk_size=128)
+        try:
+            for index, name in enumerate(names):
+                self.assertEqual(b"".join(prefetcher.iter_member(index)), self.contents[name])
+        finally:
+            prefetcher.close()
+    def test_missing_member_is_reported(self):
+        failures = []
+        prefetcher = StoragePrefetcher(self.storage, ["missing.bin", "member-0.bin"], workers=2, failures=failures)
+        try:
+            self.assertEqual(b"".join(prefetcher.iter_member(0)), b"")
+            self.assertEqual(b"".join(prefetcher.iter_member(1)), self.contents["member-0.bin"])
+        finally:
+            prefetcher.close()
+        self.assertEqual(failures, ["missing.bin"])
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), ZIP_EXPORT_PART_MAX_FILES=2)
+class FilteredZipExportTests(TestCase):
+    def setUp(self):
+        batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        for index in range(3):
+            _create_upload_file(batch, SimpleUploadedFile(f"exam-{index}.pdf", f"%PDF-1.4 {index}".encode(), content_type="application/pdf"))
+        self.url = reverse("exams:download_filtered_zip")
+    def test_plan_respects_byte_and_file_caps(self):
+        parts = plan_export_parts([(1, 60), (2, 50), (3, 200), (4, 10)], max_bytes=100, max_files=5)
+        self.assertEqual([part["file_ids"] for part in parts], [[1], [2], [3], [4]])
+        parts = plan_export_parts([(1, 10), (2, 10), (3, 10)], max_bytes=100, max_files=2)
+        self.assertEqual([part["file_ids"] for part in parts], [[1, 2], [3]])
+    def test_manifest_lists_parts(self):
+        response = self.client.get(self.url, {"format": "json"})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([part["files"] for part in data["parts"]], [2, 1])
+        self.assertEqual(data["total_files"], 3)
+        html = self.client.get(self.url)
+        self.assertContains(html, "part=2")
+    def test_part_download_is_cacheable(self):
+        response = self.client.get(self.url, {"part": 2})
+        self.assertEqual(response.status_code, 200)
+        with zipfile.ZipFile(io.BytesIO(read_streaming(response))) as archive:
+            self.assertEqual(len(archive.namelist()), 1)
+        self.assertIn("public", response["Cache-Control"])
+        cached = self.client.get(self.url, {"part": 2}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        for if_none_match in (f'W/{response["ETag"]}', f'"other", {response["ETag"]}', "*"):
+            self.assertEqual(self.client.get(self.url, {"part": 2}, HTTP_IF_NONE_MATCH=if_none_match).status_code, 304)
+        self.assertEqual(self.client.get(self.url, {"part": 2}, HTTP_IF_NONE_MATCH=response["ETag"][:-2] + '"').status_code, 200)
+        self.assertEqual(self.client.get(self.url, {"part": 3}).status_code, 404)
+class BatchSearchDocTests(TestCase):
+    def setUp(self):
+        year, _ = MetaCategory.objects.get_or_create(key="year", defaults={"label": "Jahr"})
+        self.y2023 = MetaOption.objects.create(category=year, value_key="s2023", label="2023")
+        self.y2024 = MetaOption.objects.create(category=year, value_key="s2024", label="2024")
+        self.teacher = Teacher.objects.create(name="Muster")
+        self.batches = [
+            UploadBatch.objects.create(status=UploadBatch.Status.APPROVED, year_option=self.y2023, teacher=self.teacher),
+            UploadBatch.objects.create(status=UploadBatch.Status.APPROVED, year_option=self.y2024, teacher=self.teacher),
+            UploadBatch.objects.create(status=UploadBatch.Status.APPROVED, year_option=self.y2024),
+            UploadBatch.objects.create(status=UploadBatch.Status.PENDING, year_option=self.y2024),
+        ]
+    def test_docs_follow_approval_and_edits(self):
+        self.assertEqual(BatchSearchDoc.objects.count(), 3)
+        UploadFile.objects.create(batch=self.batches[0], original_name="a.pdf", file="uploads/a.pdf", size=120)
+        doc = BatchSearchDoc.objects.get(pk=self.batches[0].pk)
+        self.assertEqual((doc.year_key, doc.teacher_name, doc.file_count, doc.total_size), ("s2023", "Muster", 1, 120))
+        self.teacher.name = "Beispiel"
+        self.teacher.save()
+        self.assertEqual(BatchSearchDoc.objects.filter(teacher_name="Beispiel").count(), 2)
+        self.batches[1].status = UploadBatch.Status.REJECTED
+        self.batches[1].save()
+        self.assertFalse(BatchSearchDoc.objects.filter(pk=self.batches[1].pk).exists())
+    def test_facet_counts_ignore_own_filter(self):
+        with self.assertNumQueries(1):
+            counts = facet_counts({"year": "s2024", "teacher": "Muster"})
+        self.assertEqual(counts["year"], {"s2023": 1, "s2024": 1})
+        self.assertEqual(counts["teacher"], {"Muster": 1, "": 1})
+    def test_keyset_pages_cover_all_docs(self):
+        first, cursor = search_batches({}, limit=2)
+        second, last_cursor = search_batches({}, cursor=cursor, limit=2)
+        self.assertEqual([doc.pk for doc in first + second], [batch.pk for batch in reversed(self.batches[:3])])
+        self.assertIsNone(last_cursor)
+        with self.assertRaises(ValueError):
+            search_batches({}, cursor="kaputt")
+        for values in ([None, None], [[1], 2], ["2024-01-01T00:00:00", {"id": 1}]):
+            wrong_types = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            with self.assertRaises(ValueError):
+                search_batches({}, cursor=wrong_types)
+            self.assertEqual(self.client.get(reverse("pruefungen"), {"cursor": wrong_types}).status_code, 200)
+    def test_archive_page_shows_facet_counts(self):
+        response = self.client.get(reverse("pruefungen"), {"year": "s2024"})
+        self.assertEqual([doc.pk for doc in response.context["batches"]], [self.batches[2].pk, self.batches[1].pk])
+        self.assertContains(response, "2023 (1)")
+        self.assertContains(response, "Muster (1)")
+def make_docx(text):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f"<w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>",
+        )
+    return buffer.getvalue()
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.batch = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        self.upload_file = _create_upload_file(self.batch, SimpleUploadedFile("Analysis.docx", make_docx("Die Ableitung der Exponentialfunktion")))
+        UploadFile.objects.filter(pk=self.upload_file.pk).update(scan_status=UploadFile.ScanStatus.CLEAN)
+        self.other = UploadBatch.objects.create(status=UploadBatch.Status.APPROVED)
+        _create_upload_file(self.other, SimpleUploadedFile("Exponentialfunktion.pdf", b"%PDF-1.4 broken"))
+        self.pending = UploadBatch.objects.create(status=UploadBatch.Status.PENDING)
+        _create_upload_file(self.pending, SimpleUploadedFile("Exponentialfunktion-neu.pdf", b"%PDF-1.4 pending"))
+    def test_extracted_text_is_searchable(self):
+        self.assertEqual(fulltext_search("ableitung"), [])
+        self.assertEqual(list(pending_text_extractions()), [self.upload_file.pk])
+        self.assertTrue(extract_upload_text(self.upload_file.pk))
+        self.assertIn("Ableitung", BlobText.objects.get(pk=self.upload_file.blob_id).content)
+        self.assertEqual(fulltext_search("ablei"), [self.batch.pk])
+        self.assertEqual(list(pending_text_extractions()), [])
+    def test_oversized_docx_is_not_inflated(self):
+        with mock.patch.object(textextract, "MAX_DOCX_XML_BYTES", 100), mock.patch.object(zipfile.ZipFile, "open") as open_member:
+            self.assertFalse(extract_upload_text(self.upload_file.pk))
+        open_member.assert_not_called()
+        self.assertEqual(BlobText.objects.get(pk=self.upload_file.blob_id).content, "")
+    def test_file_names_rank_above_text(self):
+        extract_upload_text(self.upload_file.pk)
+        self.assertEqual(fulltext_search("exponentialfunktion"), [self.other.pk, self.batch.pk])
+        self.assertEqual(fulltext_search("exponentialfunktion ableitung"), [self.batch.pk])
+        self.assertEqual(fulltext_search('"); DROP TABLE --'), [])
+    def test_index_follows_rejection_and_delete(self):
+        self.other.status = UploadBatch.Status.REJECTED
+        self.other.save()
+        self.assertEqual(fulltext_search("exponentialfunktion"), [])
+        self.batch.delete()
+        self.assertEqual(fulltext_search("analysis"), [])
+    def test_search_endpoint_and_archive_page(self):
+        response = self.client.get(reverse("exams:search_archive"), {"q": "Exponential"})
+        self.assertEqual([result["batch_id"] for result in response.json()["results"]], [self.other.pk])
+        self.assertEqual(self.client.get(reverse("exams:search_archive"), {"q": "x", "cursor": "-1"}).status_code, 400)
+        page = self.client.get(reverse("pruefungen"), {"q": "analysis"})
+        self.assertEqual([doc.pk for doc in page.context["batches"]], [self.batch.pk])
+class VocabularyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.teacher = Teacher.objects.create(name="Muster")
+    def test_snapshot_is_reused_until_a_change(self):
+        vocabulary = get_vocabulary()
+        with self.assertNumQueries(0):
+            self.assertIs(get_vocabulary(), vocabulary)
+        self.assertIn(self.teacher.pk, [teacher.pk for teacher in vocabulary.teachers])
+        option = MetaOption.objects.create(category=MetaCategory.objects.get(key="year"), value_key="s2099", label="2099")
+        self.assertEqual(get_vocabulary().option("year", "s2099"), option)
+        self.assertIsNone(get_vocabulary().option("year", "unbekannt"))
+    def test_form_renders_from_snapshot(self):
+        get_vocabulary()
+        data = {
+            f"{key}_option": get_vocabulary().options[key][0].pk for key in ("type", "year", "subject", "program")
+        }
+        data["teacher"] = self.teacher.pk
+        with self.assertNumQueries(0):
+            form = UploadBatchForm(data)
+            self.assertIn("Muster", str(form["teacher"]))
+        # Model validation still confirms the rows exist, which guards against a stale snapshot.
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertFalse(UploadBatchForm({**data, "teacher": 0}).is_valid())
+    def test_snapshot_expires(self):
+        snapshot = get_vocabulary()
+        with mock.patch.object(vocabulary, "SNAPSHOT_TIMEOUT", -1):
+            self.assertIsNot(get_vocabulary(), snapshot)
+    def test_additions_missing_from_the_snapshot_are_found_in_the_database(self):
+        get_vocabulary()
+        # bulk_create sends no signals, like a change made in a worker whose cache this one does not share.
+        option = MetaOption.objects.bulk_create([MetaOption(category=MetaCategory.objects.get(key="year"), value_key="s2099", label="2099")])[0]
+        teacher = Teacher.objects.bulk_create([Teacher(name="Neu")])[0]
+        self.assertIsNone(get_vocabulary().option("year", "s2099"))
+        self.assertEqual(find_option("year", "s2099"), option)
+        self.assertEqual(find_teacher_ids("Neu"), [teacher.pk])
+        self.assertIsNone(find_option("year", "unbekannt"))
+        data = {f"{key}_option": get_vocabulary().options[key][0].pk for key in ("type", "subject", "program")}
+        form = UploadBatchForm({**data, "year_option": option.pk, "teacher": teacher.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data["teacher"], teacher)
+        self.assertFalse(UploadBatchForm({**data, "year_option": "x", "teacher": teacher.pk}).is_valid())
@@ -0,0 +1,77 @@
+import logging
+import re
+import zipfile
+from pathlib import Path
+from xml.etree import ElementTree
+
+from apps.exams.models import BlobText, UploadFile
+
+try:
+    import pymupdf  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    pymupdf = None
+
+logger = logging.getLogger(__name__)
+
+# Text beyond this is not indexed; it keeps index rows and PostgreSQL tsvectors bounded.
+MAX_TEXT_CHARS = 100_000
+TEXT_EXTENSIONS = {"pdf", "docx"}
+# Larger document.xml members are refused unread; a few kilobytes of DOCX can inflate to gigabytes.
+MAX_DOCX_XML_BYTES = 20 * 1024 * 1024
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _pdf_text(file_handle):
+    parts, length = [], 0
+    with pymupdf.open(stream=file_handle.read(), filetype="pdf") as document:
+        for page in document:
+            parts.append(page.get_text())
+            length += len(parts[-1])
+            if length >= MAX_TEXT_CHARS:
+                break
+    return " ".join(parts)
+
+
+def _docx_text(file_handle):
+    with zipfile.ZipFile(file_handle) as archive:
+        # zipfile stops reading at the declared size, so checking it bounds the inflated bytes.
+        size = archive.getinfo("word/document.xml").file_size
+        if size > MAX_DOCX_XML_BYTES:
+            raise ValueError(f"word/document.xml inflates to {size} bytes.")
+        with archive.open("word/document.xml") as document:
+            return " ".join(node.text for node in ElementTree.parse(document).iter(f"{_WORD_NS}t") if node.text)
+
+
+def extract_text(file_handle, extension):
+    """Return the plain text of a PDF or DOCX file, whitespace-collapsed and capped; ``None`` if unsupported."""
+    if extension == "pdf":
+        if pymupdf is None:
+            return None
+        text = _pdf_text(file_handle)
+    elif extension == "docx":
+        text = _docx_text(file_handle)
+    else:
+        return None
+    return _WHITESPACE_RE.sub(" ", text).strip()[:MAX_TEXT_CHARS]
+
+
+def extract_upload_text(upload_file_id) -> bool:
+    """Store the text of an upload's blob unless it was extracted before; return whether text was stored.
+
+    Unreadable and unsupported files get an empty row so they are not retried.
+    """
+    upload_file = UploadFile.objects.select_related("blob").filter(pk=upload_file_id).first()
+    if upload_file is None or upload_file.blob is None or BlobText.objects.filter(pk=upload_file.blob_id).exists():
+        return False
+    extension = Path(upload_file.original_name).suffix.lower().lstrip(".")
+    text = None
+    if extension in TEXT_EXTENSIONS:
+        try:
+            with upload_file.blob.file.open("rb") as file_handle:
+                text = extract_text(file_handle, extension)
+        except Exception:
+            logger.warning("Could not extract text from blob %s.", upload_file.blob.sha256, exc_info=True)
+    BlobText.objects.update_or_create(pk=upload_file.blob_id, defaults={"content": text or ""})
+    return bool(text)
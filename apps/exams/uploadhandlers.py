@@ -0,0 +1,76 @@
+import hashlib
+from functools import wraps
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, StopUpload, TemporaryFileUploadHandler
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+
+from apps.exams.security import FILE_TOO_LARGE_MESSAGE, MAX_FILE_SIZE, SNIFF_HEADER_SIZE, sniff_header
+
+
+class InspectingUploadMixin:
+    """Hash, sniff and size-check each uploaded file while its chunks arrive.
+
+    The finished file object gets ``sha256`` and ``sniffed_mime`` attributes.
+    A file over ``MAX_FILE_SIZE`` stops the body read; the reason is kept in
+    ``request.upload_errors``. Only under WSGI does that save bandwidth and
+    disk: the ASGI handler spools the whole body first, so there the request
+    size is capped by nginx's ``client_max_body_size``.
+    """
+
+    max_file_size = MAX_FILE_SIZE
+
+    def new_file(self, *args, **kwargs):
+        self._hasher = hashlib.sha256()
+        self._header = b""
+        self._received = 0
+        super().new_file(*args, **kwargs)
+
+    def _inspecting(self):
+        # The memory handler passes chunks on to the next handler when it is not active.
+        return getattr(self, "activated", True)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._inspecting():
+            self._received += len(raw_data)
+            if self._received > self.max_file_size:
+                self.request.upload_errors = [*getattr(self.request, "upload_errors", []), f"{self.file_name}: {FILE_TOO_LARGE_MESSAGE}"]
+                raise StopUpload(connection_reset=True)
+            self._hasher.update(raw_data)
+            if len(self._header) < SNIFF_HEADER_SIZE:
+                self._header += raw_data[: SNIFF_HEADER_SIZE - len(self._header)]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self._hasher.hexdigest()
+            uploaded_file.sniffed_mime = sniff_header(self._header)
+        return uploaded_file
+
+
+class InspectingMemoryFileUploadHandler(InspectingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class InspectingTemporaryFileUploadHandler(InspectingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def inspect_uploads(view):
+    """Parse the view's uploads with the inspecting handlers.
+
+    Handlers must be swapped before ``request.POST`` is read, which the CSRF
+    middleware would do first; the check is therefore run inside the wrapper.
+    """
+    protected_view = csrf_protect(view)
+
+    @csrf_exempt
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [
+            InspectingMemoryFileUploadHandler(request),
+            InspectingTemporaryFileUploadHandler(request),
+        ]
+        return protected_view(request, *args, **kwargs)
+
+    return wrapper
@@ -12,12 +12,34 @@ urlpatterns = [
     path("d/<int:pk>/download", views.download, name="download"),
     path("exams/download.zip", views.download_filtered_zip, name="download_filtered_zip"),
     path("uploads/<int:file_id>/download", views.download_upload_file, name="download_upload_file"),
+    path("uploads/<int:file_id>/preview.jpg", views.upload_file_preview, name="upload_file_preview"),
+    path("api/search/", views.search_archive, name="search_archive"),
     path("api/upload-batches/", views.create_upload_batch, name="create_upload_batch"),
     path(
         "api/upload-batches/<int:batch_id>/files/",
         views.upload_batch_files,
         name="upload_batch_files",
     ),
+    path(
+        "api/upload-batches/<int:batch_id>/uploads/",
+        views.init_chunked_upload,
+        name="init_chunked_upload",
+    ),
+    path(
+        "api/upload-batches/<int:batch_id>/uploads/<uuid:upload_id>/",
+        views.chunked_upload,
+        name="chunked_upload",
+    ),
+    path(
+        "api/upload-batches/<int:batch_id>/uploads/<uuid:upload_id>/finalize/",
+        views.finalize_chunked_upload,
+        name="finalize_chunked_upload",
+    ),
+    path(
+        "api/upload-batches/<int:batch_id>/scan-status/",
+        views.upload_batch_scan_status,
+        name="upload_batch_scan_status",
+    ),
     path(
         "api/upload-batches/<int:batch_id>/download.zip",
         views.download_upload_batch,
@@ -1,26 +1,69 @@
+import itertools
 import json
 import logging
 import os
-import zipfile
+import tempfile
+import zlib
 from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED
 
-from django.db.models import F
+from django.conf import settings
+from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.urls import reverse
 from django.views.decorators.http import require_http_methods
 import zipstream
+from asgiref.sync import sync_to_async
 from django.core.files.storage import default_storage
+from apps.exams.async_io import async_reader_for, stat_storage_file
+from apps.exams.chunked import (
+    discard_chunks,
+    merge_range,
+    missing_ranges,
+    open_assembled,
+    parse_content_range,
+    write_chunk,
+)
+from apps.exams.counters import record_download
+from apps.exams.export import plan_export_parts
 from apps.exams.forms import UploadBatchForm
-from apps.exams.models import ContentItem, MetaCategory, UploadBatch, UploadFile
+from apps.exams.fulltext import search as fulltext_search
+from apps.exams.ingest import ingest_upload_files
+from apps.exams.models import ChunkedUpload, ContentItem, UploadBatch, UploadFile
+from apps.exams.prefetch import StoragePrefetcher
+from apps.exams.search import FACETS, search_ranked
+from apps.exams.responses import (
+    as_async_streaming,
+    async_file_response,
+    conditional_file_response,
+    file_etag,
+    ranged_file_response,
+)
+from apps.exams.sendfile import storage_sendfile_response
 from apps.exams.security import (
     ALLOWED_EXTENSIONS,
+    ALLOWED_MIME_TYPES,
     MAX_FILES_PER_SUBMISSION,
     MAX_FILE_SIZE,
+    MAX_UPLOAD_CHUNK_SIZE,
+    PRECOMPRESSED_MIME_TYPES,
     sanitize_filename,
+    validate_upload_metadata,
     validate_uploaded_file,
 )
+from apps.exams.tasks import schedule_upload_scans
+from apps.exams.uploadhandlers import inspect_uploads
+from apps.exams.vocabulary import find_option, find_teacher_ids, get_vocabulary
+from apps.exams.zipcache import file_list_hash, get_cached_archive, store_archive
+from apps.pages.ratelimit import rate_limit
 logger = logging.getLogger(__name__)
+
+# Deflate an entry only if the first chunk shrinks below this ratio.
+ZIP_PROBE_MIN_RATIO = 0.9
+# Previews live under content-derived keys, so clients may keep them for a year.
+PREVIEW_CACHE_SECONDS = 365 * 24 * 60 * 60
 def _validate_upload_files(incoming_files, existing_count=0):
     errors = []
     if existing_count + len(incoming_files) > MAX_FILES_PER_SUBMISSION:
@@ -28,19 +71,27 @@ def _validate_upload_files(incoming_files, existing_count=0):
         return errors
     for incoming in incoming_files:
         try:
-            validate_uploaded_file(incoming)
+            validate_uploaded_file(incoming, deep=False)
         except ValidationError as exc:
             for message in exc.messages:
                 errors.append(f"{incoming.name}: {message}")
     return errors
 
 
+def _create_upload_file(batch, incoming):
+    return ingest_upload_files(batch, [incoming])[0]
+
+
+@rate_limit("exam-upload")
+@inspect_uploads
 def upload(request):
     server_errors = []
     form = UploadBatchForm(request.POST or None)
     if request.method == "POST":
         incoming_files = request.FILES.getlist("files")
-        if not incoming_files:
+        if getattr(request, "upload_errors", None):
+            server_errors = request.upload_errors
+        elif not incoming_files:
             server_errors = ["Bitte mindestens eine Datei auswählen."]
         elif form.is_valid():
             server_errors = _validate_upload_files(incoming_files)
@@ -48,34 +99,23 @@ def upload(request):
                 batch = form.save(commit=False)
                 if request.user.is_authenticated:
                     batch.owner = request.user
-                batch.save()
+                # A failed file leaves no half-filled batch behind.
+                with transaction.atomic():
+                    batch.save()
+                    saved_files = ingest_upload_files(batch, incoming_files)
                 _store_batch_token(request, batch)
-                for incoming in incoming_files:
-                    UploadFile.objects.create(
-                        batch=batch,
-                        content_type=batch.content_type,
-                        category=batch.category,
-                        subcategory=batch.subcategory,
-                        file=incoming,
-                        original_name=incoming.name,
-                        size=incoming.size,
-                        mime=incoming.content_type or "",
-                    )
+                schedule_upload_scans(upload_file.id for upload_file in saved_files)
                 return redirect("exams:upload_success", batch_id=batch.id)
         elif not server_errors:
             server_errors = [
                 f"{field}: {', '.join(errors)}" for field, errors in form.errors.items()
             ]
-    meta_labels = {
-        category.key: category.label
-        for category in MetaCategory.objects.filter(is_active=True).order_by("sort_order", "label")
-    }
     return render(
         request,
         "exams/upload_batch.html",
         {
             "form": form,
-            "meta_labels": meta_labels,
+            "meta_labels": get_vocabulary().labels,
             "max_files": MAX_FILES_PER_SUBMISSION,
             "max_file_size_mb": int(MAX_FILE_SIZE / (1024 * 1024)),
             "allowed_extensions": ", ".join(sorted(f".{ext}" for ext in ALLOWED_EXTENSIONS)),
@@ -91,44 +131,80 @@ def upload_success(request, batch_id):
     if not _has_batch_access(request, batch):
         raise Http404("Not found.")
     return render(request, "exams/upload_thanks.html", {"batch": batch, "file_count": batch.files.count()})
-def download(request, pk):
-    content_item = get_object_or_404(
-        ContentItem,
-        pk=pk,
-        status=ContentItem.Status.APPROVED,
-    )
+async def download(request, pk):
+    try:
+        content_item = await ContentItem.objects.aget(pk=pk, status=ContentItem.Status.APPROVED)
+    except ContentItem.DoesNotExist:
+        raise Http404("Not found.")
     if not content_item.file:
         raise Http404("File not found.")
     storage = content_item.file.storage
-    if not storage.exists(content_item.file.name):
-        raise Http404("File not found.")
-    ContentItem.objects.filter(pk=pk).update(download_count=F("download_count") + 1)
-    try:
-        file_handle = content_item.file.open("rb")
-    except (FileNotFoundError, OSError):
+    stat = await stat_storage_file(storage, content_item.file.name)
+    if stat is None:
         raise Http404("File not found.")
+    size, modified = stat
+    etag = file_etag(size, modified)
+    not_modified = conditional_file_response(request, etag, modified)
+    if not_modified is not None:
+        return not_modified
+    await sync_to_async(record_download)(ContentItem, pk)
     filename = sanitize_filename(os.path.basename(content_item.file.name))
-    response = FileResponse(file_handle, as_attachment=True, filename=filename)
-    response["X-Content-Type-Options"] = "nosniff"
-    return response
-def download_upload_file(request, file_id):
-    upload_file = get_object_or_404(
-        UploadFile,
-        pk=file_id,
-        batch__status=UploadBatch.Status.APPROVED,
+    sendfile = storage_sendfile_response(storage, content_item.file.name, filename)
+    if sendfile is not None:
+        return sendfile
+    return async_file_response(
+        request, async_reader_for(storage, content_item.file.name), size, filename, etag=etag, last_modified=modified
     )
+async def download_upload_file(request, file_id):
+    try:
+        upload_file = await UploadFile.objects.select_related("blob").aget(pk=file_id, batch__status=UploadBatch.Status.APPROVED)
+    except UploadFile.DoesNotExist:
+        raise Http404("Not found.")
     if not upload_file.file:
         raise Http404("File not found.")
     storage = upload_file.file.storage
-    if not storage.exists(upload_file.file.name):
-        raise Http404("File not found.")
-    try:
-        file_handle = upload_file.file.open("rb")
-    except (FileNotFoundError, OSError):
+    stat = await stat_storage_file(storage, upload_file.file.name)
+    if stat is None:
         raise Http404("File not found.")
+    size, modified = stat
+    etag = file_etag(size, modified, upload_file.blob.sha256 if upload_file.blob else None)
+    not_modified = conditional_file_response(request, etag, modified)
+    if not_modified is not None:
+        return not_modified
     filename = sanitize_filename(upload_file.original_name or os.path.basename(upload_file.file.name))
-    response = FileResponse(file_handle, as_attachment=True, filename=filename)
-    response["X-Content-Type-Options"] = "nosniff"
+    sendfile = storage_sendfile_response(storage, upload_file.file.name, filename)
+    if sendfile is not None:
+        return sendfile
+    return async_file_response(
+        request, async_reader_for(storage, upload_file.file.name), size, filename, etag=etag, last_modified=modified
+    )
+async def upload_file_preview(request, file_id):
+    if request.method not in ("GET", "HEAD"):
+        return HttpResponseNotAllowed(["GET", "HEAD"])
+    response = await sync_to_async(_preview_response)(request, file_id)
+    return as_async_streaming(request, response)
+
+
+def _preview_response(request, file_id):
+    upload_file = get_object_or_404(UploadFile.objects.select_related("batch", "blob"), pk=file_id)
+    is_public = upload_file.batch.status == UploadBatch.Status.APPROVED
+    if not (is_public or request.user.is_staff):
+        raise Http404("Not found.")
+    if upload_file.blob is None or not upload_file.blob.preview:
+        raise Http404("No preview.")
+    preview = upload_file.blob.preview
+    filename = f"{Path(sanitize_filename(upload_file.original_name)).stem or 'file'}-preview.jpg"
+    etag = file_etag(0, digest=f"{upload_file.blob.sha256}-preview")
+    response = conditional_file_response(request, etag)
+    if response is None:
+        response = storage_sendfile_response(preview.storage, preview.name, filename, "image/jpeg", as_attachment=False)
+    if response is None:
+        try:
+            response = ranged_file_response(request, preview.open("rb"), preview.size, filename, "image/jpeg", as_attachment=False)
+        except (FileNotFoundError, OSError):
+            raise Http404("No preview.")
+        response["ETag"] = etag
+    response["Cache-Control"] = f"{'public' if is_public else 'private'}, max-age={PREVIEW_CACHE_SECONDS}, immutable"
     return response
 def upload_batch_portal(request):
     return redirect("exams:upload")
@@ -150,11 +226,13 @@ def _unique_zip_path(prefix, filename, used_paths):
         counter += 1
 
 
-def _iter_storage_chunks(file_name):
+def _iter_storage_chunks(file_name, failures=None):
     try:
         file_handle = default_storage.open(file_name, "rb")
     except (FileNotFoundError, OSError, ValueError):
         logger.exception("Storage open/read failed for %s", file_name)
+        if failures is not None:
+            failures.append(file_name)
         return None
     if hasattr(file_handle, "chunks"):
         def generator():
@@ -163,6 +241,8 @@ def _iter_storage_chunks(file_name):
                     yield chunk
             except Exception:
                 logger.exception("Storage open/read failed for %s", file_name)
+                if failures is not None:
+                    failures.append(file_name)
             finally:
                 try:
                     file_handle.close()
@@ -178,6 +258,8 @@ def _iter_storage_chunks(file_name):
                 yield chunk
         except Exception:
             logger.exception("Storage open/read failed for %s", file_name)
+            if failures is not None:
+                failures.append(file_name)
         finally:
             try:
                 file_handle.close()
@@ -186,36 +268,120 @@ def _iter_storage_chunks(file_name):
     return generator()
 
 
-def _make_zipstream():
+def _make_zipstream(sized=False):
     zip_cls = getattr(zipstream, "ZipFile", None) or getattr(zipstream, "ZipStream", None)
     if zip_cls is None:
         raise RuntimeError("zipstream module missing ZipFile/ZipStream; check installed package")
-    compression = getattr(zipstream, "ZIP_DEFLATED", zipfile.ZIP_DEFLATED)
+    compression = ZIP_STORED if sized else ZIP_DEFLATED
     try:
         return zip_cls(mode="w", compression=compression)
     except TypeError:
-        return zip_cls(compression=compression)
+        return zip_cls(compress_type=compression, sized=sized)
 
 
-def build_zip_response(file_items, filename):
-    used_paths = set()
+def zip_compression_for(name, mime=""):
+    """Pick the ZIP method for one entry; formats in PRECOMPRESSED_MIME_TYPES are stored as-is."""
+    extension = Path(name or "").suffix.lower().lstrip(".")
+    mime_types = set(ALLOWED_MIME_TYPES.get(extension, ()))
+    if mime:
+        mime_types.add(mime.lower())
+    return ZIP_STORED if mime_types & PRECOMPRESSED_MIME_TYPES else ZIP_DEFLATED
+
+
+def _probe_compression(chunk_iter):
+    """Decide the ZIP method from the first chunk; returns ``(compress_type, chunk_iter)``."""
+    first_chunk = next(chunk_iter, b"")
+    chained = itertools.chain([first_chunk], chunk_iter) if first_chunk else chunk_iter
+    if first_chunk and len(zlib.compress(first_chunk, 1)) < len(first_chunk) * ZIP_PROBE_MIN_RATIO:
+        return ZIP_DEFLATED, chained
+    return ZIP_STORED, chained
+
+
+def _add_archive_entry(archive, zip_path, chunk_iter, compress_type, size=None):
+    if hasattr(archive, "write_iter"):
+        archive.write_iter(zip_path, chunk_iter, compress_type=compress_type)
+    elif getattr(archive, "sized", False):
+        archive.add(chunk_iter, zip_path, size=size, compress_type=compress_type)
+    else:
+        archive.add(chunk_iter, zip_path, compress_type=compress_type)
+
+
+def _stream_archive(archive, prefetcher):
     try:
-        archive = _make_zipstream()
-    except Exception as exc:
-        logger.exception("ZIP init failed")
-        raise Http404("Keine Dateien verfügbar") from exc
-    added_files = 0
+        yield from archive
+    finally:
+        if prefetcher is not None:
+            prefetcher.close()
+
+
+def _stored_sizes_match(upload_files):
+    """Whether each file in storage has the size recorded for it; any doubt counts as a mismatch."""
+    for upload_file in upload_files:
+        try:
+            stored_size = default_storage.size(upload_file.file.name)
+        except (OSError, NotImplementedError, ValueError):
+            logger.warning("Could not stat %s; sending the ZIP without Content-Length.", upload_file.file.name)
+            return False
+        if stored_size != upload_file.size:
+            logger.warning(
+                "Stored size of %s is %s, expected %s; sending the ZIP without Content-Length.",
+                upload_file.file.name,
+                stored_size,
+                upload_file.size,
+            )
+            return False
+    return True
+
+
+def _build_archive(file_items, failures=None):
+    """Queue ``file_items`` into a ZIP stream; returns ``(chunks, content_length)``."""
+    used_paths = set()
+    probe = getattr(settings, "ZIP_COMPRESSION_PROBE", False)
+    entries = []
     for upload_file in file_items:
         if not upload_file.file or not upload_file.file.name:
             continue
         sanitized = sanitize_filename(upload_file.original_name or upload_file.file.name)
         prefix = f"submission_{upload_file.batch_id}"
         zip_path = _unique_zip_path(prefix, sanitized, used_paths)
-        chunk_iter = _iter_storage_chunks(upload_file.file.name)
+        compress_type = None if probe else zip_compression_for(sanitized, upload_file.mime)
+        entries.append((upload_file, zip_path, compress_type))
+    # An archive made only of stored entries has a known length up front,
+    # but it is only announced once every member's stored size is confirmed.
+    sized = (
+        bool(entries)
+        and all(compress_type == ZIP_STORED for _, _, compress_type in entries)
+        and _stored_sizes_match(upload_file for upload_file, _, _ in entries)
+    )
+    try:
+        archive = _make_zipstream(sized=sized)
+    except Exception as exc:
+        logger.exception("ZIP init failed")
+        raise Http404("Keine Dateien verfügbar") from exc
+    # Probing reads each entry's first chunk while building, which would
+    # pin prefetch workers out of order, so it keeps the sequential reader.
+    prefetch_workers = getattr(settings, "ZIP_PREFETCH_WORKERS", 0)
+    prefetcher = None
+    if not probe and prefetch_workers > 0 and len(entries) > 1:
+        prefetcher = StoragePrefetcher(
+            default_storage,
+            [upload_file.file.name for upload_file, _, _ in entries],
+            workers=prefetch_workers,
+            max_buffer_bytes=getattr(settings, "ZIP_PREFETCH_BUFFER_BYTES", 32 * 1024 * 1024),
+            failures=failures,
+        )
+    added_files = 0
+    for index, (upload_file, zip_path, compress_type) in enumerate(entries):
+        if prefetcher is not None:
+            chunk_iter = prefetcher.iter_member(index)
+        else:
+            chunk_iter = _iter_storage_chunks(upload_file.file.name, failures)
         if not chunk_iter:
             continue
+        if compress_type is None:
+            compress_type, chunk_iter = _probe_compression(chunk_iter)
         try:
-            archive.write_iter(zip_path, chunk_iter)
+            _add_archive_entry(archive, zip_path, chunk_iter, compress_type, size=upload_file.size)
             added_files += 1
         except Exception:
             logger.exception(
@@ -223,13 +389,84 @@ def build_zip_response(file_items, filename):
                 upload_file.file.name,
                 zip_path,
             )
+            if failures is not None:
+                failures.append(upload_file.file.name)
     if added_files == 0:
+        if prefetcher is not None:
+            prefetcher.close()
         raise Http404("Keine Dateien verfügbar")
+    return _stream_archive(archive, prefetcher), _archive_length(archive)
+
+
+def _archive_length(archive):
+    if not getattr(archive, "sized", False):
+        return None
+    try:
+        return len(archive)
+    except TypeError:
+        return None
+
+
+def _zip_streaming_response(chunks, filename, content_length=None):
     safe_filename = sanitize_filename(filename) or "download.zip"
-    response = StreamingHttpResponse(archive, content_type="application/zip")
+    response = StreamingHttpResponse(chunks, content_type="application/zip")
     response["Content-Disposition"] = f'attachment; filename="{safe_filename}"'
     response["X-Content-Type-Options"] = "nosniff"
+    if content_length is not None:
+        response["Content-Length"] = str(content_length)
     return response
+
+
+def build_zip_response(file_items, filename):
+    chunks, content_length = _build_archive(file_items)
+    return _zip_streaming_response(chunks, filename, content_length)
+
+
+def _tee_to_tempfile(chunks, on_complete):
+    """Yield ``chunks`` while spooling them; call ``on_complete`` only if the stream finished."""
+    spool = tempfile.TemporaryFile()
+    completed = False
+    try:
+        for chunk in chunks:
+            spool.write(chunk)
+            yield chunk
+        completed = True
+    finally:
+        if completed:
+            try:
+                spool.seek(0)
+                on_complete(spool)
+            except Exception:
+                logger.exception("Failed to cache ZIP archive.")
+        spool.close()
+
+
+def batch_zip_response(request, batch):
+    """ZIP download for a batch; approved batches are served from the archive cache."""
+    upload_files = list(batch.files.all().order_by("created_at", "id"))
+    filename = f"batch-{batch.id}.zip"
+    if batch.status != UploadBatch.Status.APPROVED:
+        return build_zip_response(upload_files, filename)
+    digest = file_list_hash(upload_files)
+    cached = get_cached_archive(batch, digest)
+    if cached:
+        sendfile = storage_sendfile_response(cached.storage, cached.name, filename, "application/zip")
+        if sendfile is not None and cached.storage.exists(cached.name):
+            return sendfile
+        try:
+            return ranged_file_response(request, cached.open("rb"), cached.size, filename, "application/zip")
+        except (FileNotFoundError, OSError):
+            logger.warning("Cached ZIP missing for batch %s; rebuilding.", batch.id)
+    failures = []
+    chunks, content_length = _build_archive(upload_files, failures)
+
+    def cache_archive(spool):
+        if not failures:
+            store_archive(batch.id, digest, spool)
+
+    return _zip_streaming_response(_tee_to_tempfile(chunks, cache_archive), filename, content_length)
+
+
 def _store_batch_token(request, batch):
     tokens = request.session.get("upload_batch_tokens", {})
     tokens[str(batch.id)] = str(batch.token)
@@ -242,16 +479,18 @@ def _has_batch_access(request, batch):
     token = _get_request_token(request)
     session_token = request.session.get("upload_batch_tokens", {}).get(str(batch.id))
     return token and session_token and token == session_token and token == str(batch.token)
-@require_http_methods(["POST"])
-def create_upload_batch(request):
-    payload = {}
+def _read_payload(request):
     if request.content_type == "application/json":
         try:
             payload = json.loads(request.body.decode("utf-8"))
         except json.JSONDecodeError:
-            payload = {}
-    else:
-        payload = request.POST
+            return {}
+        return payload if isinstance(payload, dict) else {}
+    return request.POST
+@rate_limit("exam-upload")
+@require_http_methods(["POST"])
+def create_upload_batch(request):
+    payload = _read_payload(request)
     form = UploadBatchForm(payload)
     if not form.is_valid():
         return JsonResponse({"errors": form.errors}, status=400)
@@ -269,71 +508,268 @@ def create_upload_batch(request):
         )
     _store_batch_token(request, batch)
     return JsonResponse({"batch_id": batch.id, "upload_token": str(batch.token)}, status=201)
+@rate_limit("exam-upload")
 @require_http_methods(["POST"])
+@inspect_uploads
 def upload_batch_files(request, batch_id):
     batch = get_object_or_404(UploadBatch, pk=batch_id)
     if not _has_batch_access(request, batch):
         return JsonResponse({"error": "Unauthorized."}, status=403)
     incoming_files = request.FILES.getlist("files")
+    if getattr(request, "upload_errors", None):
+        return JsonResponse({"errors": request.upload_errors}, status=413)
     if not incoming_files:
         return JsonResponse({"error": "No files provided."}, status=400)
     existing_count = batch.files.count()
     errors = _validate_upload_files(incoming_files, existing_count=existing_count)
     if errors:
         return JsonResponse({"errors": errors}, status=400)
-    saved_files = []
-    for incoming in incoming_files:
-        upload_file = UploadFile.objects.create(
-            batch=batch,
-            content_type=batch.content_type,
-            category=batch.category,
-            subcategory=batch.subcategory,
-            file=incoming,
-            original_name=incoming.name,
-            size=incoming.size,
-            mime=incoming.content_type or "",
-        )
-        saved_files.append({"id": upload_file.id, "name": upload_file.original_name, "size": upload_file.size})
-    return JsonResponse({"files": saved_files}, status=201)
+    saved_files = ingest_upload_files(batch, incoming_files)
+    schedule_upload_scans(upload_file.id for upload_file in saved_files)
+    return _accepted_files_response(batch, saved_files)
+def _scan_state(upload_file):
+    return {
+        "id": upload_file.id,
+        "name": upload_file.original_name,
+        "size": upload_file.size,
+        "scan_status": upload_file.scan_status,
+        "scan_error": upload_file.scan_error,
+    }
+def _accepted_files_response(batch, upload_files):
+    return JsonResponse(
+        {
+            "files": [_scan_state(upload_file) for upload_file in upload_files],
+            "status_url": reverse("exams:upload_batch_scan_status", args=[batch.id]),
+        },
+        status=202,
+    )
+@require_http_methods(["GET"])
+def upload_batch_scan_status(request, batch_id):
+    batch = get_object_or_404(UploadBatch, pk=batch_id)
+    if not _has_batch_access(request, batch):
+        return JsonResponse({"error": "Unauthorized."}, status=403)
+    files = [_scan_state(upload_file) for upload_file in batch.files.order_by("created_at", "id")]
+    pending = sum(1 for state in files if state["scan_status"] == UploadFile.ScanStatus.PENDING_SCAN)
+    return JsonResponse({"files": files, "pending": pending})
 @require_http_methods(["DELETE"])
 def delete_upload_file(request, file_id):
     upload_file = get_object_or_404(UploadFile, pk=file_id)
     if not _has_batch_access(request, upload_file.batch):
         return JsonResponse({"error": "Unauthorized."}, status=403)
-    upload_file.file.delete(save=False)
+    if not upload_file.blob_id:
+        upload_file.file.delete(save=False)
     upload_file.delete()
     return JsonResponse({"deleted": True})
-@require_http_methods(["GET"])
-def download_upload_batch(request, batch_id):
-    batch = get_object_or_404(
-        UploadBatch,
-        pk=batch_id,
-        status=UploadBatch.Status.APPROVED,
-    )
-    UploadBatch.objects.filter(pk=batch_id).update(download_count=F("download_count") + 1)
-    return build_zip_response(
-        batch.files.all().order_by("created_at", "id").iterator(),
-        f"batch-{batch_id}.zip",
-    )
+def _chunked_upload_state(upload):
+    return {
+        "upload_id": str(upload.upload_id),
+        "name": upload.original_name,
+        "size": upload.size,
+        "status": upload.status,
+        "chunk_size": MAX_UPLOAD_CHUNK_SIZE,
+        "received_bytes": upload.received_bytes,
+        "received": upload.received_ranges,
+        "missing": missing_ranges(upload.received_ranges, upload.size),
+    }
+def _get_chunked_upload(request, batch_id, upload_id):
+    upload = get_object_or_404(ChunkedUpload.objects.select_related("batch"), batch_id=batch_id, upload_id=upload_id)
+    if not _has_batch_access(request, upload.batch):
+        return None, JsonResponse({"error": "Unauthorized."}, status=403)
+    return upload, None
+@rate_limit("exam-upload")
+@require_http_methods(["POST"])
+def init_chunked_upload(request, batch_id):
+    batch = get_object_or_404(UploadBatch, pk=batch_id)
+    if not _has_batch_access(request, batch):
+        return JsonResponse({"error": "Unauthorized."}, status=403)
+    if batch.status != UploadBatch.Status.PENDING:
+        return JsonResponse({"error": "Batch ist bereits abgeschlossen."}, status=409)
+    payload = _read_payload(request)
+    name = str(payload.get("name") or "")
+    mime = str(payload.get("content_type") or "")
+    try:
+        size = int(payload.get("size"))
+    except (TypeError, ValueError):
+        size = 0
+    if size <= 0:
+        return JsonResponse({"errors": ["Ungültige Dateigrösse."]}, status=400)
+    open_count = batch.chunked_uploads.filter(status=ChunkedUpload.Status.OPEN).count()
+    if batch.files.count() + open_count >= MAX_FILES_PER_SUBMISSION:
+        return JsonResponse({"errors": [f"Maximal {MAX_FILES_PER_SUBMISSION} Dateien pro Upload."]}, status=400)
+    try:
+        validate_upload_metadata(name, size, mime)
+    except ValidationError as exc:
+        return JsonResponse({"errors": [f"{name}: {message}" for message in exc.messages]}, status=400)
+    upload = ChunkedUpload.objects.create(batch=batch, original_name=name, size=size, mime=mime)
+    return JsonResponse(_chunked_upload_state(upload), status=201)
+@require_http_methods(["GET", "PUT"])
+def chunked_upload(request, batch_id, upload_id):
+    upload, error_response = _get_chunked_upload(request, batch_id, upload_id)
+    if error_response:
+        return error_response
+    if request.method == "GET":
+        return JsonResponse(_chunked_upload_state(upload))
+    if upload.status != ChunkedUpload.Status.OPEN:
+        return JsonResponse({"error": "Upload ist bereits abgeschlossen."}, status=409)
+    try:
+        length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        length = 0
+    content_range = parse_content_range(request.headers.get("Content-Range"))
+    if content_range:
+        start, end, total = content_range
+        if total not in (None, upload.size) or end - start != length:
+            return JsonResponse({"error": "Content-Range passt nicht zur Anfrage."}, status=400)
+    else:
+        try:
+            start = int(request.GET.get("offset", ""))
+        except ValueError:
+            return JsonResponse({"error": "Content-Range oder offset fehlt."}, status=400)
+        end = start + length
+    if length > MAX_UPLOAD_CHUNK_SIZE:
+        return JsonResponse({"error": "Chunk ist zu gross."}, status=413)
+    if length <= 0 or start < 0 or end > upload.size:
+        return JsonResponse({"error": "Ungültiger Bytebereich."}, status=416)
+    written = write_chunk(upload, request, start, length)
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if written:
+            upload.received_ranges = merge_range(upload.received_ranges, start, start + written)
+            upload.save(update_fields=["received_ranges", "updated_at"])
+    return JsonResponse(_chunked_upload_state(upload))
+@require_http_methods(["POST"])
+def finalize_chunked_upload(request, batch_id, upload_id):
+    upload, error_response = _get_chunked_upload(request, batch_id, upload_id)
+    if error_response:
+        return error_response
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().select_related("batch", "upload_file").get(pk=upload.pk)
+        if upload.status == ChunkedUpload.Status.COMPLETE and upload.upload_file:
+            return _accepted_files_response(upload.batch, [upload.upload_file])
+        if not upload.is_complete:
+            return JsonResponse({"error": "Upload unvollständig.", **_chunked_upload_state(upload)}, status=409)
+        batch = upload.batch
+        errors = []
+        if batch.files.count() >= MAX_FILES_PER_SUBMISSION:
+            errors.append(f"Maximal {MAX_FILES_PER_SUBMISSION} Dateien pro Upload.")
+        else:
+            incoming = open_assembled(upload)
+            try:
+                validate_uploaded_file(incoming, deep=False)
+                upload_file = _create_upload_file(batch, incoming)
+            except ValidationError as exc:
+                errors = [f"{upload.original_name}: {message}" for message in exc.messages]
+            finally:
+                incoming.close()
+        if errors:
+            discard_chunks(upload)
+            upload.delete()
+            return JsonResponse({"errors": errors}, status=400)
+        upload.status = ChunkedUpload.Status.COMPLETE
+        upload.upload_file = upload_file
+        upload.save(update_fields=["status", "upload_file", "updated_at"])
+        schedule_upload_scans([upload_file.id])
+    discard_chunks(upload)
+    return _accepted_files_response(batch, [upload_file])
+async def download_upload_batch(request, batch_id):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        batch = await UploadBatch.objects.aget(pk=batch_id, status=UploadBatch.Status.APPROVED)
+    except UploadBatch.DoesNotExist:
+        raise Http404("Not found.")
+    await sync_to_async(record_download)(UploadBatch, batch_id)
+    response = await sync_to_async(batch_zip_response)(request, batch)
+    return as_async_streaming(request, response)
 
 
-@require_http_methods(["GET"])
-def download_filtered_zip(request):
-    approved_batches = UploadBatch.objects.filter(status=UploadBatch.Status.APPROVED)
-    type_key = request.GET.get("type"); year_key = request.GET.get("year"); subject_key = request.GET.get("subject")
-    teacher_key = request.GET.get("teacher"); program_key = request.GET.get("program")
-    batches = approved_batches
-    if type_key:
-        batches = batches.filter(type_option__value_key=type_key)
-    if year_key:
-        batches = batches.filter(year_option__value_key=year_key)
-    if subject_key:
-        batches = batches.filter(subject_option__value_key=subject_key)
+async def download_filtered_zip(request):
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    response = await sync_to_async(_filtered_zip_response)(request)
+    return as_async_streaming(request, response)
+
+
+def _filtered_zip_response(request):
+    batches = UploadBatch.objects.filter(status=UploadBatch.Status.APPROVED)
+    # Keys resolve to ids through the vocabulary, so the filters need no joins; unknown keys match nothing.
+    for category_key in ("type", "year", "subject", "program"):
+        value_key = request.GET.get(category_key)
+        if value_key:
+            option = find_option(category_key, value_key)
+            batches = batches.filter(**{f"{category_key}_option_id": option.pk}) if option else batches.none()
+    teacher_key = request.GET.get("teacher")
     if teacher_key:
-        batches = batches.filter(teacher__name=teacher_key)
-    if program_key:
-        batches = batches.filter(program_option__value_key=program_key)
+        batches = batches.filter(teacher_id__in=find_teacher_ids(teacher_key))
 
-    batches = batches.order_by("-created_at")
     files = UploadFile.objects.filter(batch__in=batches).order_by("batch__created_at", "id")
-    return build_zip_response(files.iterator(), "pruefungen.zip")
+    parts = plan_export_parts(
+        files.values_list("id", "size"),
+        max_bytes=settings.ZIP_EXPORT_PART_MAX_BYTES,
+        max_files=settings.ZIP_EXPORT_PART_MAX_FILES,
+    )
+    if not parts:
+        raise Http404("Keine Dateien verfügbar")
+    part_param = request.GET.get("part")
+    if part_param is None:
+        if len(parts) == 1:
+            return build_zip_response(files.iterator(), "pruefungen.zip")
+        return _export_manifest_response(request, parts)
+    try:
+        part_number = int(part_param)
+    except ValueError:
+        raise Http404("Teil nicht gefunden.")
+    if not 1 <= part_number <= len(parts):
+        raise Http404("Teil nicht gefunden.")
+    part = parts[part_number - 1]
+    part_files = list(files.filter(pk__in=part["file_ids"]))
+    etag = f'"{file_list_hash(part_files)}"'
+    response = conditional_file_response(request, etag)
+    if response is None:
+        response = build_zip_response(part_files, f"pruefungen-teil-{part_number}.zip")
+        response["ETag"] = etag
+    response["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+def _export_manifest_response(request, parts):
+    entries = []
+    for part in parts:
+        query = request.GET.copy()
+        query.pop("format", None)
+        query["part"] = part["number"]
+        entries.append({
+            "part": part["number"],
+            "url": f"{request.path}?{query.urlencode()}",
+            "files": len(part["file_ids"]),
+            "size": part["size"],
+        })
+    if request.GET.get("format") == "json" or "application/json" in request.headers.get("Accept", ""):
+        return JsonResponse({
+            "parts": entries,
+            "total_files": sum(entry["files"] for entry in entries),
+            "total_size": sum(entry["size"] for entry in entries),
+        })
+    return render(request, "exams/zip_manifest.html", {"parts": entries})
+def _search_result(doc):
+    return {
+        "batch_id": doc.batch_id,
+        "type": doc.type_label,
+        "subject": doc.subject_label,
+        "teacher": doc.teacher_name,
+        "year": doc.year_label,
+        "program": doc.program_label,
+        "file_count": doc.file_count,
+        "download_count": doc.download_count,
+        "created_at": doc.created_at.isoformat(),
+        "download_url": reverse("exams:download_upload_batch", args=[doc.batch_id]),
+    }
+@require_http_methods(["GET"])
+def search_archive(request):
+    """Full-text hits among approved batches, best first, narrowed by the archive's facet filters."""
+    filters = {facet: request.GET.get(facet, "") for facet in FACETS}
+    try:
+        docs, next_cursor = search_ranked(filters, fulltext_search(request.GET.get("q")), request.GET.get("cursor"))
+    except ValueError:
+        return JsonResponse({"error": "Invalid cursor."}, status=400)
+    return JsonResponse({"results": [_search_result(doc) for doc in docs], "next_cursor": next_cursor})
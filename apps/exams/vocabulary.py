@@ -0,0 +1,113 @@
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+
+from apps.exams.models import MetaCategory, MetaOption
+from apps.ranking.models import Teacher
+
+# Cache-stored counter shared by all workers; a worker whose snapshot is older reloads it.
+_GENERATION_KEY = "vocabulary:generation"
+# Without a shared cache other workers never see a bump, so snapshots are reloaded after this long anyway.
+SNAPSHOT_TIMEOUT = 60
+
+_snapshot = None
+
+
+@dataclass(frozen=True)
+class Vocabulary:
+    """Read-only snapshot of the active metadata categories and options and of all teachers.
+
+    The model instances are shared between requests and threads; treat them as immutable.
+    """
+
+    generation: int
+    # Active category key -> label.
+    labels: Mapping[str, str]
+    # Active category key -> its active options in display order.
+    options: Mapping[str, tuple]
+    # Active teachers first, then by name.
+    teachers: tuple
+    # time.monotonic() of the load.
+    loaded_at: float = 0.0
+
+    def option(self, category_key, value_key):
+        return next((option for option in self.options.get(category_key, ()) if option.value_key == value_key), None)
+
+    def teacher_ids(self, name):
+        return [teacher.pk for teacher in self.teachers if teacher.name == name]
+
+
+def _fresh_generation():
+    # Time-based, so a counter lost to eviction never returns to a generation already loaded.
+    return time.time_ns() // 1000
+
+
+def _current_generation():
+    generation = cache.get(_GENERATION_KEY)
+    if generation is None:
+        cache.add(_GENERATION_KEY, _fresh_generation(), timeout=None)
+        generation = cache.get(_GENERATION_KEY, 0)
+    return generation
+
+
+def _load(generation):
+    active_options = MetaOption.objects.filter(is_active=True).order_by("sort_order", "label")
+    categories = MetaCategory.objects.filter(is_active=True).prefetch_related(Prefetch("options", queryset=active_options))
+    labels, options = {}, {}
+    for category in categories:
+        labels[category.key] = category.label
+        category_options = tuple(category.options.all())
+        for option in category_options:
+            # Set the cached relation so str(option) needs no query.
+            option.category = category
+        options[category.key] = category_options
+    return Vocabulary(
+        generation=generation,
+        labels=MappingProxyType(labels),
+        options=MappingProxyType(options),
+        teachers=tuple(Teacher.objects.order_by("-active", "name")),
+        loaded_at=time.monotonic(),
+    )
+
+
+def get_vocabulary() -> Vocabulary:
+    """The process-local snapshot, reloaded (three queries) once the shared generation moved or it expired."""
+    global _snapshot
+    generation = _current_generation()
+    snapshot = _snapshot
+    if snapshot is None or snapshot.generation != generation or time.monotonic() - snapshot.loaded_at > SNAPSHOT_TIMEOUT:
+        snapshot = _snapshot = _load(generation)
+    return snapshot
+
+
+def find_option(category_key, value_key):
+    """Active option ``value_key`` of ``category_key``; looked up in the database if the snapshot lacks it."""
+    option = get_vocabulary().option(category_key, value_key)
+    if option is None:
+        option = MetaOption.objects.filter(
+            category__key=category_key, category__is_active=True, value_key=value_key, is_active=True
+        ).first()
+    return option
+
+
+def find_teacher_ids(name):
+    """Ids of the teachers called ``name``; looked up in the database if the snapshot has none."""
+    return get_vocabulary().teacher_ids(name) or list(Teacher.objects.filter(name=name).values_list("pk", flat=True))
+
+
+def _bump():
+    try:
+        cache.incr(_GENERATION_KEY)
+    except ValueError:
+        cache.set(_GENERATION_KEY, _fresh_generation(), timeout=None)
+
+
+def invalidate_vocabulary() -> None:
+    """Make every worker reload its snapshot, now and again once the change is committed."""
+    _bump()
+    transaction.on_commit(_bump)
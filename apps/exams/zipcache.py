@@ -0,0 +1,60 @@
+import hashlib
+import logging
+
+from django.core.files import File
+from django.db import transaction
+
+from apps.exams.models import UploadBatch
+
+logger = logging.getLogger(__name__)
+
+
+def file_list_hash(upload_files) -> str:
+    """Fingerprint the members of a batch archive; any change yields a new hash."""
+    hasher = hashlib.sha256()
+    for upload_file in upload_files:
+        hasher.update(f"{upload_file.pk}:{upload_file.file.name}:{upload_file.size}:{upload_file.original_name}\n".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def archive_name(batch_id, digest) -> str:
+    return f"batch-{batch_id}-{digest[:16]}.zip"
+
+
+def get_cached_archive(batch, digest):
+    if batch.zip_archive and batch.zip_archive_hash == digest:
+        return batch.zip_archive
+    return None
+
+
+def _delete_later(storage, name):
+    if name:
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+def store_archive(batch_id, digest, archive_file) -> None:
+    """Persist a finished archive for ``batch_id`` unless a newer one already exists."""
+    batch = UploadBatch.objects.filter(pk=batch_id, status=UploadBatch.Status.APPROVED).first()
+    if batch is None or batch.zip_archive_hash == digest:
+        return
+    previous_name = batch.zip_archive.name
+    previous_hash = batch.zip_archive_hash
+    storage = batch.zip_archive.storage
+    saved_name = storage.save(batch.zip_archive.field.generate_filename(batch, archive_name(batch_id, digest)), File(archive_file))
+    updated = UploadBatch.objects.filter(pk=batch_id, zip_archive_hash=previous_hash).update(
+        zip_archive=saved_name,
+        zip_archive_hash=digest,
+    )
+    if not updated:
+        # Another request stored or invalidated the archive meanwhile.
+        storage.delete(saved_name)
+        return
+    _delete_later(storage, previous_name)
+
+
+def invalidate_archive(batch_id) -> None:
+    batch = UploadBatch.objects.filter(pk=batch_id).exclude(zip_archive="").only("zip_archive").first()
+    if batch is None:
+        return
+    UploadBatch.objects.filter(pk=batch_id).update(zip_archive="", zip_archive_hash="")
+    _delete_later(batch.zip_archive.storage, batch.zip_archive.name)
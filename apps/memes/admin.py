@@ -3,6 +3,8 @@ from django.utils import timezone
 from django.utils.html import format_html
 
 from apps.memes.models import Meme, MemeLike
+from apps.memes.tasks import schedule_meme_renditions
+from apps.pages.fragments import bump_namespace
 
 
 @admin.register(Meme)
@@ -38,10 +40,13 @@ class MemeAdmin(admin.ModelAdmin):
     @admin.action(description="Approve selected")
     def approve_selected(self, request, queryset):
         queryset.update(status=Meme.Status.APPROVED, approved_at=timezone.now())
+        bump_namespace("memes")
+        schedule_meme_renditions(queryset.filter(renditions={}).values_list("pk", flat=True))
 
     @admin.action(description="Reject selected")
     def reject_selected(self, request, queryset):
         queryset.update(status=Meme.Status.REJECTED)
+        bump_namespace("memes")
 
 
 @admin.register(MemeLike)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MemesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.memes"
+
+    def ready(self):
+        import apps.memes.signals
@@ -0,0 +1,91 @@
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from apps.memes.models import Meme, MemeLike
+from apps.pages.counterbuffer import BufferedCounter
+
+logger = logging.getLogger(__name__)
+
+_PREFIX = "meme-likes"
+# A visitor's liked set is rebuilt from the database after this long without likes.
+LIKED_SET_TIMEOUT = 24 * 60 * 60
+
+LIKES = BufferedCounter(_PREFIX, Meme, "like_count", "LIKE_COUNT_FLUSH_INTERVAL")
+
+
+def _liked_key(anon_id):
+    return f"{_PREFIX}:liked:{anon_id}"
+
+
+def _insert_like(meme_id, anon_id) -> bool:
+    """Insert one like with ``ON CONFLICT DO NOTHING``; return whether a row was added.
+
+    One statement and no row locks: a repeated like is a no-op instead of an
+    ``IntegrityError`` inside a transaction.
+    """
+    qn = connection.ops.quote_name
+    meme_column = MemeLike._meta.get_field("meme").column
+    anon_field = MemeLike._meta.get_field("anon_id")
+    created_field = MemeLike._meta.get_field("created_at")
+    sql = (
+        f"INSERT INTO {qn(MemeLike._meta.db_table)} ({qn(meme_column)}, {qn(anon_field.column)}, {qn(created_field.column)}) "
+        f"VALUES (%s, %s, %s) ON CONFLICT ({qn(meme_column)}, {qn(anon_field.column)}) DO NOTHING RETURNING {qn('id')}"
+    )
+    params = [
+        meme_id,
+        anon_field.get_db_prep_value(anon_id, connection),
+        created_field.get_db_prep_value(timezone.now(), connection),
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone() is not None
+
+
+def liked_meme_ids(anon_id) -> set:
+    """IDs of the memes ``anon_id`` has liked, from the cache when possible."""
+    key = _liked_key(anon_id)
+    liked = cache.get(key)
+    if liked is None:
+        liked = set(MemeLike.objects.filter(anon_id=anon_id).values_list("meme_id", flat=True))
+        cache.set(key, liked, timeout=LIKED_SET_TIMEOUT)
+    return liked
+
+
+def _remember_like(anon_id, meme_id):
+    liked = liked_meme_ids(anon_id)
+    if meme_id not in liked:
+        cache.set(_liked_key(anon_id), liked | {meme_id}, timeout=LIKED_SET_TIMEOUT)
+
+
+def record_like(meme_id, anon_id) -> bool:
+    """Store a like and buffer the counter increment; return whether it was new.
+
+    ``Meme.like_count`` is not touched here, so a burst of likes on one meme
+    does not queue on its row; ``flush_like_counts`` writes the deltas.
+    """
+    if meme_id in liked_meme_ids(anon_id):
+        return False
+    created = _insert_like(meme_id, anon_id)
+    _remember_like(anon_id, meme_id)
+    if created:
+        LIKES.add(meme_id)
+    return created
+
+
+def add_pending_likes(memes):
+    """Add increments that are still buffered to each meme's ``like_count`` (in memory only)."""
+    pending = LIKES.pending(meme.pk for meme in memes)
+    for meme in memes:
+        meme.like_count += pending[meme.pk]
+    return memes
+
+
+def flush_like_counts() -> int:
+    """Write buffered like increments with one ``CASE`` update; return the likes written."""
+    written = LIKES.flush()
+    if written:
+        logger.info("Flushed %s buffered likes.", written)
+    return written
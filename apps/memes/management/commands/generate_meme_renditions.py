@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from apps.memes.models import Meme
+from apps.memes.renditions import generate_meme_renditions
+
+
+class Command(BaseCommand):
+    help = "Render missing responsive image variants, e.g. for memes uploaded before they existed."
+
+    def handle(self, *args, **options):
+        pending = Meme.objects.filter(renditions={}).exclude(image="").values_list("pk", flat=True)
+        created = sum(generate_meme_renditions(meme_id) for meme_id in pending.iterator())
+        self.stdout.write(f"Rendered variants for {created} memes.")
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memes", "0005_meme_title_required"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="meme",
+            name="renditions",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
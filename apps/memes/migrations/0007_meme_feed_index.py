@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memes", "0006_meme_renditions"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="meme",
+            index=models.Index(fields=["status", "-created_at", "-id"], name="meme_feed_idx"),
+        ),
+    ]
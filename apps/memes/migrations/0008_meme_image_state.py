@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def mark_existing_present(apps, schema_editor):
+    # Assume stored files exist; the reconcile task fills in dimensions and corrects misses.
+    Meme = apps.get_model("memes", "Meme")
+    Meme.objects.exclude(image="").exclude(image__isnull=True).update(image_present=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("memes", "0007_meme_feed_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="meme",
+            name="image_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="meme",
+            name="image_present",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="meme",
+            name="image_size",
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="meme",
+            name="image_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_existing_present, migrations.RunPython.noop),
+    ]
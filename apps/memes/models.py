@@ -1,5 +1,7 @@
 from django.db import models
 
+from apps.pages.stored_images import track_image_field
+
 
 class ApprovedMemeManager(models.Manager):
     def get_queryset(self):
@@ -13,6 +15,11 @@ class Meme(models.Model):
         REJECTED = "rejected", "Rejected"
 
     image = models.ImageField(upload_to="memes/")
+    # Cached file state (see apps.pages.stored_images), so listings need no storage requests.
+    image_present = models.BooleanField(default=False, editable=False)
+    image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    image_size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
     title = models.CharField(max_length=200)
     status = models.CharField(
         max_length=20,
@@ -20,6 +27,8 @@ class Meme(models.Model):
         default=Status.PENDING,
     )
     like_count = models.PositiveIntegerField(default=0)
+    # {"<width>": {"webp": name, "jpg": name}}, filled by apps.memes.renditions after upload.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     approved_at = models.DateTimeField(null=True, blank=True)
 
@@ -27,18 +36,50 @@ class Meme(models.Model):
     objects = models.Manager()
     approved = ApprovedMemeManager()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the approved feed (see apps.memes.views._meme_page).
+            models.Index(
+                fields=["status", "-created_at", "-id"], name="meme_feed_idx"
+            ),
+        ]
+
     def __str__(self):
         return f"Meme {self.pk} ({self.status})"
 
     @property
     def image_url(self) -> str:
-        if not self.image:
-            return ""
-        storage = self.image.storage
-        if not storage.exists(self.image.name):
+        if not self.image or not self.image_present:
             return ""
         return self.image.url
 
+    def rendition_srcset(self, extension) -> str:
+        storage = self.image.storage
+        return ", ".join(
+            f"{storage.url(names[extension])} {width}w"
+            for width, names in sorted(self.renditions.items(), key=lambda item: int(item[0]))
+            if extension in names
+        )
+
+    @property
+    def webp_srcset(self) -> str:
+        return self.rendition_srcset("webp")
+
+    @property
+    def jpeg_srcset(self) -> str:
+        return self.rendition_srcset("jpg")
+
+    @property
+    def display_url(self) -> str:
+        """Largest JPEG rendition, for the full-size view; the original until renditions exist."""
+        if not self.renditions:
+            return self.image_url
+        largest = max(self.renditions, key=int)
+        return self.image.storage.url(self.renditions[largest]["jpg"])
+
+
+track_image_field(Meme, "image")
+
 
 class MemeLike(models.Model):
     meme = models.ForeignKey(Meme, related_name="likes", on_delete=models.CASCADE)
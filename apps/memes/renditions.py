@@ -0,0 +1,70 @@
+import io
+import logging
+from pathlib import Path
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from apps.memes.models import Meme
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = (320, 640, 960, 1280)
+# Extension -> (Pillow format, save options); the first entry is preferred, the last is the fallback.
+RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 75, "method": 4}),
+    "jpg": ("JPEG", {"quality": 80, "optimize": True, "progressive": True}),
+}
+
+
+def rendition_name(meme, width, extension) -> str:
+    stem = Path(meme.image.name).stem
+    return f"memes/renditions/{meme.pk}/{stem}-{width}w.{extension}"
+
+
+def _target_widths(original_width):
+    widths = [width for width in RENDITION_WIDTHS if width < original_width]
+    # Small originals still get one re-encoded copy at their own width.
+    return widths or [original_width]
+
+
+def _to_rgb(image):
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image.convert("RGB")
+
+
+def render_meme_renditions(file_handle):
+    """Yield ``(width, extension, bytes)`` for every rendition of an uploaded meme image."""
+    with Image.open(file_handle) as original:
+        image = _to_rgb(ImageOps.exif_transpose(original))
+    for width in _target_widths(image.width):
+        height = max(round(image.height * width / image.width), 1)
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in RENDITION_FORMATS.items():
+            output = io.BytesIO()
+            resized.save(output, image_format, **options)
+            yield width, extension, output.getvalue()
+
+
+def generate_meme_renditions(meme_id) -> bool:
+    """Store resized WebP/JPEG copies next to the original; return whether any were stored."""
+    meme = Meme.objects.filter(pk=meme_id).first()
+    if meme is None or not meme.image or meme.renditions:
+        return False
+    storage = meme.image.storage
+    renditions = {}
+    try:
+        with meme.image.open("rb") as file_handle:
+            for width, extension, data in render_meme_renditions(file_handle):
+                name = rendition_name(meme, width, extension)
+                if storage.exists(name):
+                    storage.delete(name)
+                renditions.setdefault(str(width), {})[extension] = storage.save(name, ContentFile(data))
+    except Exception:
+        logger.warning("Could not render renditions for meme %s.", meme_id, exc_info=True)
+        return False
+    return bool(Meme.objects.filter(pk=meme.pk, renditions={}).update(renditions=renditions))
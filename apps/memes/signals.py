@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.memes.models import Meme
+from apps.pages.fragments import bump_namespace
+
+
+@receiver([post_save, post_delete], sender=Meme)
+def refresh_meme_grid(sender, raw=False, **kwargs):
+    if not raw:
+        bump_namespace("memes")
@@ -0,0 +1,40 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.memes.likes import flush_like_counts as _flush_like_counts
+from apps.memes.renditions import generate_meme_renditions
+from apps.pages.celery import app
+from apps.pages.fragments import bump_namespace
+
+logger = logging.getLogger(__name__)
+
+
+@app.task
+def flush_like_counts():
+    return _flush_like_counts()
+
+
+@app.task
+def render_meme_renditions(meme_id):
+    if not generate_meme_renditions(meme_id):
+        return False
+    bump_namespace("memes")
+    return True
+
+
+def _run(meme_id):
+    if settings.MEME_RENDITIONS_IN_BACKGROUND:
+        try:
+            render_meme_renditions.delay(meme_id)
+            return
+        except Exception:
+            logger.exception("Could not queue renditions for meme %s; rendering inline.", meme_id)
+    render_meme_renditions(meme_id)
+
+
+def schedule_meme_renditions(meme_ids) -> None:
+    """Render the responsive copies once the upload or approval is committed."""
+    meme_ids = list(meme_ids)
+    transaction.on_commit(lambda: [_run(meme_id) for meme_id in meme_ids])
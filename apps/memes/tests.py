@@ -1,16 +1,26 @@
+import io
 import tempfile
 import uuid
+from unittest import mock
 
+from django.core.cache import cache
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.db import IntegrityError, transaction
 from django.test import TestCase, override_settings
+from PIL import Image
 
+from apps.memes.likes import add_pending_likes, flush_like_counts, liked_meme_ids, record_like
 from apps.memes.models import Meme, MemeLike
+from apps.memes.renditions import RENDITION_WIDTHS, generate_meme_renditions
+from apps.pages.stored_images import reconcile_image_field
+from apps.pages.tests import use_fake_redis
 
 
 @override_settings(MEDIA_ROOT=tempfile.mkdtemp())
 class MemeLikeTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.meme = Meme.objects.create(
             image=SimpleUploadedFile("meme.jpg", b"file", content_type="image/jpeg"),
             status=Meme.Status.APPROVED,
@@ -41,3 +51,146 @@ class MemeLikeTests(TestCase):
         )
         self.assertEqual(response.status_code, 200)
         self.assertTrue(response.json().get("already_liked"))
+
+
+def _png(width, height):
+    content = io.BytesIO()
+    Image.new("RGBA", (width, height), (200, 30, 30, 128)).save(content, "PNG")
+    return SimpleUploadedFile("meme.png", content.getvalue(), content_type="image/png")
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), MEME_RENDITIONS_IN_BACKGROUND=False)
+class MemeRenditionTests(TestCase):
+    def test_renditions_cover_widths_below_original(self):
+        meme = Meme.objects.create(image=_png(1000, 500), status=Meme.Status.APPROVED)
+        self.assertTrue(generate_meme_renditions(meme.id))
+        self.assertFalse(generate_meme_renditions(meme.id))
+        meme.refresh_from_db()
+        widths = [width for width in RENDITION_WIDTHS if width < 1000]
+        self.assertEqual(sorted(map(int, meme.renditions)), widths)
+        with meme.image.storage.open(meme.renditions["320"]["webp"]) as rendition:
+            image = Image.open(rendition)
+            self.assertEqual((image.format, image.size), ("WEBP", (320, 160)))
+
+        data = self.client.get("/api/memes/").json()["results"][0]
+        self.assertIn("320w", data["srcset"]["webp"])
+        self.assertIn(".jpg 640w", data["srcset"]["jpeg"])
+        self.assertTrue(data["display_url"].endswith("-960w.jpg"))
+
+    def test_small_original_gets_single_reencoded_copy(self):
+        meme = Meme.objects.create(image=_png(200, 100), status=Meme.Status.APPROVED)
+        generate_meme_renditions(meme.id)
+        meme.refresh_from_db()
+        self.assertEqual(list(meme.renditions), ["200"])
+        self.assertEqual(set(meme.renditions["200"]), {"webp", "jpg"})
+
+    def test_upload_schedules_renditions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/memes/upload/", {"title": "Test", "image": _png(700, 700)})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sorted(map(int, Meme.objects.get().renditions)), [320, 640])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MemeFeedPaginationTests(TestCase):
+    def setUp(self):
+        self.memes = [
+            Meme.objects.create(
+                image=SimpleUploadedFile(f"meme{index}.jpg", b"file", content_type="image/jpeg"),
+                title=f"Meme {index}",
+                status=Meme.Status.APPROVED,
+            )
+            for index in range(5)
+        ]
+        # Equal timestamps must still page deterministically through the id tie-breaker.
+        Meme.objects.update(created_at=self.memes[0].created_at)
+        Meme.objects.create(image=SimpleUploadedFile("pending.jpg", b"file"), title="Pending")
+
+    def test_cursor_walks_every_approved_meme_once(self):
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get("/api/memes/", params).json()
+            self.assertLessEqual(len(data["results"]), 2)
+            seen += [item["id"] for item in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(seen, sorted((meme.id for meme in self.memes), reverse=True))
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get("/api/memes/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MemeImageStateTests(TestCase):
+    def test_upload_records_state_and_urls_skip_storage(self):
+        meme = Meme.objects.create(image=_png(300, 150), title="State", status=Meme.Status.APPROVED)
+        meme.refresh_from_db()
+        self.assertEqual((meme.image_present, meme.image_width, meme.image_height), (True, 300, 150))
+        self.assertEqual(meme.image_size, meme.image.storage.size(meme.image.name))
+        with mock.patch.object(FileSystemStorage, "exists", side_effect=AssertionError("storage hit")):
+            self.assertTrue(meme.image_url)
+            self.assertEqual(self.client.get("/memes/").status_code, 200)
+
+    def test_reconcile_detects_removed_and_unmeasured_files(self):
+        gone = Meme.objects.create(image=_png(10, 10), title="Gone")
+        legacy = Meme.objects.create(image=_png(40, 20), title="Legacy")
+        Meme.objects.filter(pk=legacy.pk).update(image_width=None, image_height=None)
+        gone.image.storage.delete(gone.image.name)
+
+        self.assertEqual(reconcile_image_field(Meme, "image"), 2)
+        gone.refresh_from_db()
+        legacy.refresh_from_db()
+        self.assertFalse(gone.image_present)
+        self.assertEqual(gone.image_url, "")
+        self.assertEqual((legacy.image_width, legacy.image_height), (40, 20))
+        self.assertEqual(reconcile_image_field(Meme, "image"), 0)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class BufferedLikeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_fake_redis(self)
+        self.meme = Meme.objects.create(
+            image=SimpleUploadedFile("meme.jpg", b"file", content_type="image/jpeg"),
+            title="Viral",
+            status=Meme.Status.APPROVED,
+        )
+
+    def test_likes_are_inserted_once_and_counted_after_flush(self):
+        anon_id = uuid.uuid4()
+        self.assertTrue(record_like(self.meme.pk, anon_id))
+        cache.delete(f"meme-likes:liked:{anon_id}")
+        self.assertFalse(record_like(self.meme.pk, anon_id))
+        self.assertEqual(MemeLike.objects.filter(meme=self.meme).count(), 1)
+
+        for _ in range(3):
+            record_like(self.meme.pk, uuid.uuid4())
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.like_count, 1)
+        self.assertEqual(add_pending_likes([self.meme])[0].like_count, 4)
+        self.assertEqual(flush_like_counts(), 3)
+        self.meme.refresh_from_db()
+        self.assertEqual(self.meme.like_count, 4)
+
+    def test_liked_set_is_served_from_cache(self):
+        anon_id = uuid.uuid4()
+        record_like(self.meme.pk, anon_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(liked_meme_ids(anon_id), {self.meme.pk})
+
+    def test_shared_grid_is_cached_but_likers_get_their_own(self):
+        self.client.get("/memes/")
+        self.client.get("/memes/")  # The returning visitor's (empty) liked set is cached now.
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get("/memes/"), "🤍 Like")
+        anon_id = uuid.uuid4()
+        record_like(self.meme.pk, anon_id)
+        self.client.cookies["anon_id"] = str(anon_id)
+        self.assertContains(self.client.get("/memes/"), "❤️ Geliked")
+        Meme.objects.create(image=SimpleUploadedFile("new.jpg", b"file", content_type="image/jpeg"), title="Neu", status=Meme.Status.APPROVED)
+        del self.client.cookies["anon_id"]
+        self.assertContains(self.client.get("/memes/"), "Neu")
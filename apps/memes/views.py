@@ -1,24 +1,25 @@
+import base64
+import binascii
 import uuid
+from datetime import datetime
 
-from django.core.cache import cache
-from django.db import IntegrityError, transaction
-from django.db.models import F
+from django.db.models import Q
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.views.decorators.http import require_GET, require_POST
 
 from apps.memes.forms import MemeUploadForm
-from apps.memes.models import Meme, MemeLike
+from apps.memes.likes import add_pending_likes, liked_meme_ids, record_like
+from apps.memes.models import Meme
+from apps.memes.tasks import schedule_meme_renditions
+from apps.pages.fragments import cached_fragment
+from apps.pages.ratelimit import rate_limit
 
-LIKE_RATE_LIMIT = 30
-LIKE_RATE_WINDOW_SECONDS = 60 * 60
-
-
-def _get_client_ip(request) -> str:
-    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
-    if forwarded:
-        return forwarded.split(",")[0].strip()
-    return request.META.get("REMOTE_ADDR", "")
+MEMES_PAGE_SIZE = 24
+MEMES_MAX_PAGE_SIZE = 100
+# Like counts move constantly and are only flushed every few seconds, so the shared grid is kept briefly.
+MEME_GRID_CACHE_SECONDS = 60
 
 
 def _get_anon_id(request):
@@ -31,32 +32,56 @@ def _get_anon_id(request):
     return uuid.uuid4(), True
 
 
-def _check_rate_limit(request):
-    ip = _get_client_ip(request) or "unknown"
-    cache_key = f"memes_like_rate:{ip}"
+def _encode_cursor(meme) -> str:
+    raw = f"{meme.created_at.isoformat()}|{meme.pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor):
+    """Return ``(created_at, id)`` of the last meme on the previous page; ``ValueError`` if malformed."""
     try:
-        if cache.add(cache_key, 1, timeout=LIKE_RATE_WINDOW_SECONDS):
-            return True
-        current = cache.incr(cache_key)
-    except ValueError:
-        cache.set(cache_key, 1, timeout=LIKE_RATE_WINDOW_SECONDS)
-        current = 1
-    return current <= LIKE_RATE_LIMIT
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.split("|")
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def _meme_page(cursor=None, limit=MEMES_PAGE_SIZE):
+    """Return one page of approved memes, newest first, and the cursor of the next page.
+
+    Keyset pagination on ``(created_at, id)``: every page is an index range
+    scan, no matter how deep the client has scrolled.
+    """
+    memes = Meme.approved.order_by("-created_at", "-id")
+    if cursor:
+        created_at, pk = _decode_cursor(cursor)
+        memes = memes.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+    memes = list(memes[: limit + 1])
+    next_cursor = _encode_cursor(memes[limit - 1]) if len(memes) > limit else None
+    return memes[:limit], next_cursor
+
+
+def _liked_ids(anon_id, memes):
+    return liked_meme_ids(anon_id) & {meme.pk for meme in memes}
+
+
+def _meme_grid_context(liked=frozenset()):
+    memes, next_cursor = _meme_page()
+    add_pending_likes(memes)
+    return {"memes": memes, "liked_ids": liked & {meme.pk for meme in memes}, "next_cursor": next_cursor}
 
 
 def index(request):
     anon_id, needs_cookie = _get_anon_id(request)
-    memes = Meme.approved.order_by("-created_at")
-    liked_ids = set(
-        MemeLike.objects.filter(anon_id=anon_id, meme__in=memes).values_list(
-            "meme_id", flat=True
-        )
-    )
-    response = render(
-        request,
-        "memes/index.html",
-        {"memes": memes, "liked_ids": liked_ids},
-    )
+    # A new visitor has liked nothing yet; no lookup needed.
+    liked = set() if needs_cookie else liked_meme_ids(anon_id)
+    if liked:
+        meme_grid = render_to_string("memes/partials/meme_grid.html", _meme_grid_context(liked))
+    else:
+        # Visitors without likes all see the same grid.
+        meme_grid = cached_fragment("memes", "memes/partials/meme_grid.html", _meme_grid_context, timeout=MEME_GRID_CACHE_SECONDS)
+    response = render(request, "memes/index.html", {"meme_grid": meme_grid})
     if needs_cookie:
         response.set_cookie(
             "anon_id", str(anon_id), max_age=60 * 60 * 24 * 365, samesite="Lax"
@@ -64,6 +89,7 @@ def index(request):
     return response
 
 
+@rate_limit("meme-upload")
 def upload(request):
     if request.method == "POST":
         form = MemeUploadForm(request.POST, request.FILES)
@@ -71,6 +97,7 @@ def upload(request):
             meme = form.save(commit=False)
             meme.status = Meme.Status.PENDING
             meme.save()
+            schedule_meme_renditions([meme.pk])
             return redirect("memes:thanks")
     else:
         form = MemeUploadForm()
@@ -86,24 +113,30 @@ def thanks(request):
 def api_memes(request):
     anon_id, needs_cookie = _get_anon_id(request)
 
-    memes = list(Meme.approved.order_by("-created_at"))
-    liked_ids = set(
-        MemeLike.objects.filter(anon_id=anon_id, meme__in=memes).values_list(
-            "meme_id", flat=True
+    try:
+        limit = int(request.GET.get("limit", MEMES_PAGE_SIZE))
+        memes, next_cursor = _meme_page(
+            request.GET.get("cursor"), min(max(limit, 1), MEMES_MAX_PAGE_SIZE)
         )
-    )
+    except ValueError:
+        return JsonResponse({"detail": "Invalid cursor or limit."}, status=400)
+    liked_ids = _liked_ids(anon_id, add_pending_likes(memes))
 
-    data = [
+    results = [
         {
             "id": meme.id,
             "title": meme.title,
             "image_url": meme.image_url,
+            "display_url": meme.display_url,
+            "srcset": {"webp": meme.webp_srcset, "jpeg": meme.jpeg_srcset},
+            "width": meme.image_width,
+            "height": meme.image_height,
             "like_count": meme.like_count,
             "liked_by_me": meme.id in liked_ids,
         }
         for meme in memes
     ]
-    response = JsonResponse(data, safe=False)
+    response = JsonResponse({"results": results, "next_cursor": next_cursor})
     if needs_cookie:
         response.set_cookie(
             "anon_id", str(anon_id), max_age=60 * 60 * 24 * 365, samesite="Lax"
@@ -111,31 +144,20 @@ def api_memes(request):
     return response
 
 
+@rate_limit("meme-like")
 @require_POST
 def api_like_meme(request, meme_id):
     anon_id, needs_cookie = _get_anon_id(request)
 
-    if not _check_rate_limit(request):
-        return JsonResponse({"detail": "Rate limit exceeded."}, status=429)
-
-    meme = get_object_or_404(Meme, pk=meme_id, status=Meme.Status.APPROVED)
-
-    created = False
-    with transaction.atomic():
-        try:
-            _, created = MemeLike.objects.get_or_create(
-                meme=meme,
-                anon_id=anon_id,
-            )
-        except IntegrityError:
-            created = False
-
-        if created:
-            Meme.objects.filter(pk=meme.pk).update(like_count=F("like_count") + 1)
-
-    meme.refresh_from_db(fields=["like_count"])
+    meme = get_object_or_404(Meme.approved.only("id", "like_count"), pk=meme_id)
+    add_pending_likes([meme])
+    created = record_like(meme.pk, anon_id)
     response = JsonResponse(
-        {"like_count": meme.like_count, "liked": True, "already_liked": not created}
+        {
+            "like_count": meme.like_count + created,
+            "liked": True,
+            "already_liked": not created,
+        }
     )
     if needs_cookie:
         response.set_cookie(
@@ -0,0 +1,69 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+_PREFIX = "fragment"
+
+
+def _version_key(namespace):
+    return f"{_PREFIX}:{namespace}:version"
+
+
+def _fresh_version():
+    # Time-based, so a version key lost to eviction never comes back to a number in use before.
+    return time.time_ns() // 1000
+
+
+def namespace_version(namespace) -> int:
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), _fresh_version(), timeout=None)
+        version = cache.get(_version_key(namespace), 0)
+    return version
+
+
+def _bump(namespaces):
+    for namespace in namespaces:
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            cache.set(_version_key(namespace), _fresh_version(), timeout=None)
+
+
+def bump_namespace(*namespaces) -> None:
+    """Retire every fragment cached under ``namespaces``; the old entries expire unread.
+
+    The version moves now and again after the transaction commits, so a
+    render that read the old rows in between is not kept.
+    """
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+
+def _fragment_key(namespace, template_name, vary):
+    digest = hashlib.sha1(repr((template_name, *vary)).encode()).hexdigest()
+    return f"{_PREFIX}:{namespace}:{namespace_version(namespace)}:{digest}"
+
+
+def cached_fragment(namespace, template_name, get_context, vary=(), timeout=None):
+    """Render ``template_name`` once per namespace version and ``vary`` values.
+
+    ``get_context`` only runs on a miss, so its queries are skipped as well.
+    Fragments are rendered without the request and must not depend on the
+    visitor.
+    """
+    html = cache.get(_fragment_key(namespace, template_name, vary))
+    if html is None:
+        html = render_to_string(template_name, get_context())
+        # Keyed after rendering: building the context may itself bump the namespace.
+        cache.set(
+            _fragment_key(namespace, template_name, vary),
+            html,
+            timeout=settings.FRAGMENT_CACHE_TIMEOUT if timeout is None else timeout,
+        )
+    return mark_safe(html)
@@ -0,0 +1,148 @@
+import logging
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_MESSAGE = "Zu viele Anfragen. Bitte später erneut versuchen."
+
+# Sliding window over two fixed windows: the previous window's count is
+# weighted by how much of it still overlaps the last ``window`` seconds.
+# Checks and increments in one step; denied requests are not counted.
+_SLIDING_WINDOW_LUA = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local elapsed = tonumber(ARGV[3])
+if previous * (window - elapsed) / window + current + 1 > limit then
+  return {0, current, previous}
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], window * 2)
+return {1, current, previous}
+"""
+
+_redis_script = None
+
+
+def client_ip(request) -> str:
+    """Address of the client as seen by the outermost of ``RATE_LIMIT_TRUSTED_PROXIES`` proxies.
+
+    Each proxy appends its peer to ``X-Forwarded-For``, so only the rightmost
+    entries are trustworthy; anything before them is whatever the client sent.
+    """
+    trusted = settings.RATE_LIMIT_TRUSTED_PROXIES
+    if trusted:
+        forwarded = [entry.strip() for entry in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",") if entry.strip()]
+        if len(forwarded) >= trusted:
+            return forwarded[-trusted]
+    return request.META.get("REMOTE_ADDR", "") or "unknown"
+
+
+def _script():
+    global _redis_script
+    if _redis_script is None:
+        client = redis.Redis.from_url(settings.RATE_LIMIT_REDIS_URL)
+        _redis_script = client.register_script(_SLIDING_WINDOW_LUA)
+    return _redis_script
+
+
+def _hit_redis(keys, limit, window, elapsed):
+    allowed, current, previous = _script()(keys=keys, args=[limit, window, elapsed])
+    return bool(allowed), int(current), int(previous)
+
+
+def _hit_cache(keys, limit, window, elapsed):
+    current_key, previous_key = keys
+    # Count first with the cache's atomic incr, then give the slot back if it was over the limit.
+    if cache.add(current_key, 1, timeout=window * 2):
+        current = 1
+    else:
+        try:
+            current = cache.incr(current_key)
+        except ValueError:
+            cache.set(current_key, 1, timeout=window * 2)
+            current = 1
+    previous = cache.get(previous_key, 0)
+    if previous * (window - elapsed) / window + current > limit:
+        cache.decr(current_key)
+        return False, current - 1, previous
+    return True, current - 1, previous
+
+
+def _retry_after(limit, window, elapsed, current, previous) -> int:
+    """Seconds until one more request fits into the sliding window."""
+    if current + 1 > limit:
+        # Wait for the next window, then for this window's weight to decay far enough.
+        wait = 2 * window - elapsed - window * (limit - 1) / current
+    else:
+        wait = window - elapsed - window * (limit - current - 1) / previous
+    return max(math.ceil(wait), 1)
+
+
+def hit(policy, identity):
+    """Count one request of ``identity`` against ``policy``; return ``None`` or the seconds to wait.
+
+    Policies come from ``settings.RATE_LIMITS`` as ``(requests, window seconds)``;
+    an unknown policy never limits.
+    """
+    rule = settings.RATE_LIMITS.get(policy)
+    if not rule:
+        return None
+    limit, window = rule
+    now = time.time()
+    index, elapsed = divmod(int(now), window)
+    keys = [f"ratelimit:{policy}:{identity}:{index}", f"ratelimit:{policy}:{identity}:{index - 1}"]
+    try:
+        if settings.RATE_LIMIT_REDIS_URL and redis is not None:
+            allowed, current, previous = _hit_redis(keys, limit, window, elapsed)
+        else:
+            allowed, current, previous = _hit_cache(keys, limit, window, elapsed)
+    except Exception:
+        # A broken limiter must not take the endpoints down with it.
+        logger.exception("Rate limiter for %s failed; letting the request through.", policy)
+        return None
+    if allowed:
+        return None
+    return _retry_after(limit, window, elapsed, current, previous)
+
+
+def _limited_response(request, retry_after):
+    if request.path.startswith("/api/"):
+        response = JsonResponse({"detail": RATE_LIMIT_MESSAGE}, status=429)
+    else:
+        response = HttpResponse(RATE_LIMIT_MESSAGE, status=429, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def rate_limit(policy, methods=("POST",), key=client_ip):
+    """Reject ``methods`` requests over ``policy`` with 429 before the view runs.
+
+    Place it outermost so throttled requests are shed before body parsing,
+    database queries or storage writes.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = hit(policy, key(request))
+                if retry_after is not None:
+                    return _limited_response(request, retry_after)
+            return view(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,97 @@
+import logging
+
+from django.db.models.signals import pre_save
+from PIL import Image, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# (model, field name) pairs whose file state is kept in ``<field>_present/_width/_height/_size`` columns.
+TRACKED_IMAGE_FIELDS = []
+
+
+def _state_fields(field_name):
+    return [f"{field_name}_{suffix}" for suffix in ("present", "width", "height", "size")]
+
+
+def _dimensions(file_handle):
+    try:
+        with Image.open(file_handle) as image:
+            return image.size
+    except (UnidentifiedImageError, OSError):
+        return None, None
+
+
+def read_image_state(field_file):
+    """Return ``(present, width, height, size)`` of ``field_file``; a pending upload is read in memory."""
+    if not field_file:
+        return False, None, None, None
+    if not field_file._committed:
+        upload = field_file.file
+        position = upload.tell()
+        upload.seek(0)
+        width, height = _dimensions(upload)
+        upload.seek(position)
+        return True, width, height, upload.size
+    storage = field_file.storage
+    if not storage.exists(field_file.name):
+        return False, None, None, None
+    with storage.open(field_file.name, "rb") as file_handle:
+        width, height = _dimensions(file_handle)
+    return True, width, height, storage.size(field_file.name)
+
+
+def _record_upload_state(sender, instance, field_name, **kwargs):
+    field_file = getattr(instance, field_name)
+    if field_file and field_file._committed and not instance._state.adding:
+        # Unchanged file: the stored state stays, the reconcile task corrects drift.
+        return
+    # A fresh upload is measured in memory before it is written to storage.
+    for name, value in zip(_state_fields(field_name), read_image_state(field_file)):
+        setattr(instance, name, value)
+
+
+def track_image_field(model, field_name):
+    """Keep ``model``'s cached file state for ``field_name`` current on save.
+
+    Lets ``*_url`` properties answer without a storage request; deletions or
+    changes made behind Django's back are caught by ``reconcile_image_fields``.
+    """
+    TRACKED_IMAGE_FIELDS.append((model, field_name))
+    pre_save.connect(
+        lambda sender, instance, **kwargs: _record_upload_state(sender, instance, field_name, **kwargs),
+        sender=model,
+        weak=False,
+        dispatch_uid=f"track-image:{model._meta.label}:{field_name}",
+    )
+
+
+def reconcile_image_field(model, field_name, batch_size=200) -> int:
+    """Re-read the file state of every row against storage; return how many rows changed."""
+    state_fields = _state_fields(field_name)
+    changed = []
+    updated = 0
+    for instance in model.objects.only("pk", field_name, *state_fields).iterator(chunk_size=batch_size):
+        field_file = getattr(instance, field_name)
+        current = tuple(getattr(instance, name) for name in state_fields)
+        try:
+            if current[0] and current[1] is not None and field_file and field_file.storage.exists(field_file.name):
+                # Measured before and still there: skip downloading the file again.
+                continue
+            state = read_image_state(field_file)
+        except Exception:
+            logger.warning("Could not read %s of %s %s.", field_name, model._meta.label, instance.pk, exc_info=True)
+            continue
+        if state != current:
+            for name, value in zip(state_fields, state):
+                setattr(instance, name, value)
+            changed.append(instance)
+        if len(changed) >= batch_size:
+            updated += model.objects.bulk_update(changed, state_fields)
+            changed = []
+    if changed:
+        updated += model.objects.bulk_update(changed, state_fields)
+    return updated
+
+
+def reconcile_image_fields() -> int:
+    return sum(reconcile_image_field(model, field_name) for model, field_name in TRACKED_IMAGE_FIELDS)
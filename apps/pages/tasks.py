@@ -11,6 +11,8 @@ from django.contrib.auth.models import User
 from django.conf import settings
 from celery.exceptions import Ignore, TaskError
 
+from apps.pages.stored_images import reconcile_image_fields
+
 
 def get_scripts():
     """
@@ -82,4 +84,10 @@ def execute_script(self, data: dict):
 
         log_file = write_to_log_file(logs, script)
 
-        return {"logs": logs, "input": script, "error": error, "output": "", "status": status, "log_file": log_file}
\ No newline at end of file
+        return {"logs": logs, "input": script, "error": error, "output": "", "status": status, "log_file": log_file}
+@app.task
+def reconcile_stored_images():
+    """
+    Re-checks the cached file state of tracked image fields (memes, avatars) against storage.
+    """
+    return reconcile_image_fields()
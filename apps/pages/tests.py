@@ -1,3 +1,136 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.exams.models import MetaCategory, MetaOption, UploadBatch
+from apps.pages.fragments import bump_namespace, cached_fragment
+from apps.pages.ratelimit import hit
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands the counter buffer uses; keys never expire."""
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    def delete(self, *names):
+        return sum(self.data.pop(name, None) is not None for name in names)
+
+    def hincrby(self, name, key, amount=1):
+        fields = self.data.setdefault(name, {})
+        field = str(key).encode()
+        fields[field] = fields.get(field, 0) + amount
+        return fields[field]
+
+    def hmget(self, name, keys):
+        fields = self.data.get(name, {})
+        return [None if str(key).encode() not in fields else str(fields[str(key).encode()]).encode() for key in keys]
+
+    def hgetall(self, name):
+        return {field: str(value).encode() for field, value in self.data.get(name, {}).items()}
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.commands]
+
+
+def use_fake_redis(test_case):
+    """Run ``test_case`` with counter buffering backed by a fresh ``FakeRedis``."""
+    patcher = mock.patch("apps.pages.counterbuffer._redis", return_value=FakeRedis())
+    patcher.start()
+    test_case.addCleanup(patcher.stop)
+
+
+@override_settings(RATE_LIMITS={"test": (3, 60), "meme-like": (2, 60)}, RATE_LIMIT_REDIS_URL="")
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_sliding_window_weights_previous_window(self):
+        with mock.patch("apps.pages.ratelimit.time.time", return_value=6000.0):
+            self.assertEqual([hit("test", "ip") for _ in range(3)], [None, None, None])
+            self.assertEqual(hit("test", "ip"), 80)
+            self.assertIsNone(hit("test", "other-ip"))
+        # Half-way into the next window the old requests still count 1.5 of 3.
+        with mock.patch("apps.pages.ratelimit.time.time", return_value=6090.0):
+            self.assertIsNone(hit("test", "ip"))
+            self.assertEqual(hit("test", "ip"), 10)
+        self.assertIsNone(hit("unknown-policy", "ip"))
+
+    def test_like_endpoint_sends_retry_after(self):
+        responses = [self.client.post("/api/memes/999/like/") for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [404, 404, 429])
+        self.assertTrue(int(responses[-1]["Retry-After"]) >= 1)
+
+    @override_settings(RATE_LIMIT_TRUSTED_PROXIES=1)
+    def test_spoofed_forwarded_for_does_not_reset_budget(self):
+        # nginx appends the real peer after whatever the client sent.
+        statuses = [
+            self.client.post("/api/memes/999/like/", HTTP_X_FORWARDED_FOR=f"10.0.0.{index}, 203.0.113.7").status_code
+            for index in range(3)
+        ]
+        self.assertEqual(statuses, [404, 404, 429])
+        other = self.client.post("/api/memes/999/like/", HTTP_X_FORWARDED_FOR="203.0.113.8")
+        self.assertEqual(other.status_code, 404)
+        with self.settings(RATE_LIMIT_TRUSTED_PROXIES=0):
+            spoofed = self.client.post("/api/memes/999/like/", HTTP_X_FORWARDED_FOR="198.51.100.1")
+            self.assertEqual(spoofed.status_code, 404)
+            self.assertEqual(self.client.post("/api/memes/999/like/", HTTP_X_FORWARDED_FOR="198.51.100.2").status_code, 404)
+            self.assertEqual(self.client.post("/api/memes/999/like/").status_code, 429)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_fragment_renders_once_per_version(self):
+        get_context = mock.Mock(return_value={"category_results": []})
+        first = cached_fragment("test", "ranking/partials/results.html", get_context, vary=("a",))
+        self.assertEqual(cached_fragment("test", "ranking/partials/results.html", get_context, vary=("a",)), first)
+        cached_fragment("test", "ranking/partials/results.html", get_context, vary=("b",))
+        self.assertEqual(get_context.call_count, 2)
+        bump_namespace("test")
+        cached_fragment("test", "ranking/partials/results.html", get_context, vary=("a",))
+        self.assertEqual(get_context.call_count, 3)
+
+    def test_archive_page_is_served_from_cache_until_options_change(self):
+        year, _ = MetaCategory.objects.get_or_create(key="year", defaults={"label": "Jahr"})
+        option = MetaOption.objects.create(category=year, value_key="s2024", label="2024")
+        UploadBatch.objects.create(status=UploadBatch.Status.APPROVED, year_option=option)
+        self.client.get(reverse("pruefungen"), {"year": "s2024"})
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("pruefungen"), {"year": "s2024", "utm_source": "x"})
+        self.assertContains(response, "2024 (1)")
+        option.label = "Schuljahr 2024"
+        option.save()
+        self.assertContains(self.client.get(reverse("pruefungen"), {"year": "s2024"}), "Schuljahr 2024 (1)")
+
+    def test_free_form_archive_requests_are_not_cached(self):
+        self.client.get(reverse("pruefungen"))
+        keys = set(cache._cache)
+        for params in ({"q": "analysis"}, {"cursor": "abc"}, {"year": "s1900"}, {"teacher": "Niemand"}):
+            self.client.get(reverse("pruefungen"), params)
+        self.assertEqual(set(cache._cache), keys)
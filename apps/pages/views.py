@@ -1,8 +1,15 @@
+from urllib.parse import urlencode
+
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 
-from apps.exams.models import MetaCategory, MetaOption, UploadBatch
-from apps.ranking.models import Teacher
+from apps.exams.models import UploadFile
+from apps.exams.fulltext import search as fulltext_search
+from apps.exams.search import FACETS, SORTS, facet_counts, search_batches, search_ranked
+from apps.exams.vocabulary import get_vocabulary
+from apps.pages.fragments import cached_fragment
 
 from .models import *
 
@@ -20,57 +27,83 @@ def starter(request):
   return render(request, "pages/starter.html", context)
 
 
-def pruefungen(request):
+def _archive_context(filters, query, sort, cursor):
 
-  approved_batches = UploadBatch.objects.filter(status=UploadBatch.Status.APPROVED)
+  # A text query lists full-text hits by relevance; the sort order only applies without one.
+  hits = fulltext_search(query) if query else None
+  try:
+    if hits is None:
+      docs, next_cursor = search_batches(filters, sort, cursor)
+    else:
+      docs, next_cursor = search_ranked(filters, hits, cursor)
+  except ValueError:
+    docs, next_cursor = search_batches(filters, sort) if hits is None else search_ranked(filters, hits)
 
-  year = request.GET.get("year")
-  content_type = request.GET.get("type")
-  subject = request.GET.get("subject")
-  teacher = request.GET.get("teacher")
-  program = request.GET.get("program")
-  sort = request.GET.get("sort", "newest")
+  page_files = {}
+  for upload_file in UploadFile.objects.filter(batch_id__in=[doc.batch_id for doc in docs]).select_related("blob").order_by("pk"):
+    page_files.setdefault(upload_file.batch_id, []).append(upload_file)
+  for doc in docs:
+    doc.page_files = page_files.get(doc.batch_id, [])
 
-  batches = approved_batches
-  if year:
-    batches = batches.filter(year_option__value_key=year)
-  if content_type:
-    batches = batches.filter(type_option__value_key=content_type)
-  if subject:
-    batches = batches.filter(subject_option__value_key=subject)
-  if teacher:
-    batches = batches.filter(teacher__name=teacher)
-  if program:
-    batches = batches.filter(program_option__value_key=program)
-
-  sort_mapping = {
-    "newest": ("-created_at",),
-    "downloads": ("-download_count", "-created_at"),
+  # The vocabulary's instances are shared, so the counts go into per-request dicts.
+  vocabulary = get_vocabulary()
+  counts = facet_counts(filters, hits)
+  options = {
+    facet: [
+      {"value_key": option.value_key, "label": option.label, "facet_count": counts[facet].get(option.value_key, 0)}
+      for option in vocabulary.options.get(facet, ())
+    ]
+    for facet in ("year", "type", "subject", "program")
   }
-  ordering = sort_mapping.get(sort, sort_mapping["newest"])
-  batches = batches.order_by(*ordering)
+  options["teacher"] = [{"name": teacher.name, "facet_count": counts["teacher"].get(teacher.name, 0)} for teacher in vocabulary.teachers]
 
-  meta_labels = {category.key: category.label for category in MetaCategory.objects.filter(is_active=True).order_by("sort_order", "label")}
+  next_page_query = ""
+  if next_cursor:
+    params = {**{facet: value for facet, value in filters.items() if value}, "q": query, "sort": sort, "cursor": next_cursor}
+    next_page_query = urlencode({name: value for name, value in params.items() if value})
 
-  context = {
-    "batches": batches.select_related(
-      "type_option",
-      "year_option",
-      "subject_option",
-      "program_option",
-      "teacher",
-    ).prefetch_related("files"),
-    "year_options": MetaOption.objects.filter(category__key="year", category__is_active=True, is_active=True).order_by("sort_order", "label"),
-    "content_type_options": MetaOption.objects.filter(category__key="type", category__is_active=True, is_active=True).order_by("sort_order", "label"),
-    "subject_options": MetaOption.objects.filter(category__key="subject", category__is_active=True, is_active=True).order_by("sort_order", "label"),
-    "teacher_options": Teacher.objects.order_by("-active", "name"),
-    "program_options": MetaOption.objects.filter(category__key="program", category__is_active=True, is_active=True).order_by("sort_order", "label"),
-    "selected_year": year or "",
-    "selected_content_type": content_type or "",
-    "selected_subject": subject or "",
-    "selected_teacher": teacher or "",
-    "selected_program": program or "",
-    "selected_sort": sort if sort in sort_mapping else "newest",
-    "meta_labels": meta_labels,
+  return {
+    "batches": docs,
+    "next_page_query": next_page_query,
+    "year_options": options["year"],
+    "content_type_options": options["type"],
+    "subject_options": options["subject"],
+    "teacher_options": options["teacher"],
+    "program_options": options["program"],
+    "selected_year": filters["year"],
+    "selected_content_type": filters["type"],
+    "selected_subject": filters["subject"],
+    "selected_teacher": filters["teacher"],
+    "selected_program": filters["program"],
+    "selected_sort": sort,
+    "query": query,
+    "meta_labels": vocabulary.labels,
   }
-  return render(request, "pages/pruefungen.html", context)
+
+
+def _known_filters(filters):
+
+  # Filter values that name no current option or teacher match nothing and are not worth caching.
+  vocabulary = get_vocabulary()
+  return all(
+    not value or (vocabulary.teacher_ids(value) if facet == "teacher" else vocabulary.option(facet, value))
+    for facet, value in filters.items()
+  )
+
+def pruefungen(request):
+
+  filters = {facet: request.GET.get(facet, "") for facet in FACETS}
+  query = request.GET.get("q", "").strip()
+  sort = request.GET.get("sort", "newest")
+  if sort not in SORTS:
+    sort = "newest"
+  cursor = request.GET.get("cursor", "")
+
+  get_context = lambda: _archive_context(filters, query, sort, cursor)
+  # Only first pages of known filters are cached; text queries and cursors are free-form and would
+  # let any query string add an entry.
+  if query or cursor or not _known_filters(filters):
+    archive = mark_safe(render_to_string("pages/partials/pruefungen_archive.html", get_context()))
+  else:
+    archive = cached_fragment("archive", "pages/partials/pruefungen_archive.html", get_context, vary=(sorted(filters.items()), sort))
+  return render(request, "pages/pruefungen.html", {"archive": archive})
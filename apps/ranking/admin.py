@@ -1,5 +1,5 @@
 from django.contrib import admin
-from apps.ranking.models import RankingCategory, RankingVote, Teacher
+from apps.ranking.models import RankingCategory, RankingTally, RankingVote, Teacher
 
 
 @admin.register(Teacher)
@@ -22,3 +22,15 @@ class RankingVoteAdmin(admin.ModelAdmin):
     readonly_fields = ("category", "teacher", "token_hash", "created_at")
     list_select_related = ("category", "teacher")
     ordering = ("-created_at",)
+
+
+@admin.register(RankingTally)
+class RankingTallyAdmin(admin.ModelAdmin):
+    list_display = ("category", "teacher", "count")
+    list_filter = ("category",)
+    readonly_fields = ("category", "teacher", "count")
+    list_select_related = ("category", "teacher")
+    ordering = ("category__order", "-count")
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from apps.ranking.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = "Recount ranking tallies from the stored votes and report (or fix) differences."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report differences, do not rewrite the tallies.")
+
+    def handle(self, *args, **options):
+        mismatches = rebuild_tallies(dry_run=options["dry_run"])
+        for (category_id, teacher_id), (stored, actual) in sorted(mismatches.items()):
+            self.stdout.write(f"category {category_id}, teacher {teacher_id}: tally {stored}, votes {actual}")
+        if not mismatches:
+            self.stdout.write("Tallies match the votes.")
+        elif options["dry_run"]:
+            self.stdout.write(f"{len(mismatches)} tallies differ; run without --dry-run to rebuild.")
+        else:
+            self.stdout.write(f"Rebuilt tallies; {len(mismatches)} were off.")
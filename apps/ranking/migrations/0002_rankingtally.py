@@ -0,0 +1,35 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_tallies(apps, schema_editor):
+    RankingTally = apps.get_model("ranking", "RankingTally")
+    RankingVote = apps.get_model("ranking", "RankingVote")
+    RankingTally.objects.bulk_create(
+        RankingTally(category_id=row["category_id"], teacher_id=row["teacher_id"], count=row["total"])
+        for row in RankingVote.objects.values("category_id", "teacher_id").annotate(total=models.Count("id"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ranking", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RankingTally",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("category", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="tallies", to="ranking.rankingcategory")),
+                ("teacher", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="tallies", to="ranking.teacher")),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="rankingtally",
+            constraint=models.UniqueConstraint(fields=("category", "teacher"), name="unique_tally_per_category_teacher"),
+        ),
+        migrations.RunPython(build_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ranking", "0002_rankingtally"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="rankingvote",
+            index=models.Index(fields=["token_hash"], name="rankingvote_token_idx"),
+        ),
+    ]
@@ -26,5 +26,22 @@ class RankingVote(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["category", "token_hash"], name="unique_vote_per_category_per_token")
         ]
+        indexes = [
+            # Rebuilding a voter's progress looks votes up by token alone.
+            models.Index(fields=["token_hash"], name="rankingvote_token_idx"),
+        ]
     def __str__(self):
         return f"{self.category} - {self.teacher}"
+
+
+class RankingTally(models.Model):
+    """Vote count per category and teacher, kept in step with ``RankingVote`` by ``apps.ranking.tallies``."""
+    category = models.ForeignKey(RankingCategory, on_delete=models.CASCADE, related_name="tallies")
+    teacher = models.ForeignKey(Teacher, on_delete=models.CASCADE, related_name="tallies")
+    count = models.PositiveIntegerField(default=0)
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["category", "teacher"], name="unique_tally_per_category_teacher")
+        ]
+    def __str__(self):
+        return f"{self.category} - {self.teacher}: {self.count}"
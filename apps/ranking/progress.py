@@ -0,0 +1,59 @@
+from django.core.cache import cache
+
+from apps.ranking.models import RankingCategory, RankingVote
+
+_CATEGORIES_KEY = "ranking:categories"
+# Category changes clear the list in the changing process only; other workers see them after this long.
+CATEGORIES_TIMEOUT = 60
+# Voted sets are rebuilt from RankingVote when a voter comes back after this long.
+VOTED_SET_TIMEOUT = 24 * 60 * 60
+
+
+def _voted_key(token_hash):
+    return f"ranking:voted:{token_hash}"
+
+
+def ordered_categories():
+    """All categories in voting order, cached for ``CATEGORIES_TIMEOUT`` seconds."""
+    categories = cache.get(_CATEGORIES_KEY)
+    if categories is None:
+        categories = list(RankingCategory.objects.order_by("order", "title"))
+        cache.set(_CATEGORIES_KEY, categories, timeout=CATEGORIES_TIMEOUT)
+    return categories
+
+
+def forget_categories():
+    cache.delete(_CATEGORIES_KEY)
+
+
+def category_by_id(category_id):
+    """Category ``category_id`` from the cached list, else from the database (added since)."""
+    category = next((category for category in ordered_categories() if str(category.pk) == str(category_id)), None)
+    if category is None and str(category_id or "").isdigit():
+        category = RankingCategory.objects.filter(pk=category_id).first()
+    return category
+
+
+def voted_category_ids(token_hash) -> set:
+    key = _voted_key(token_hash)
+    voted = cache.get(key)
+    if voted is None:
+        voted = set(RankingVote.objects.filter(token_hash=token_hash).values_list("category_id", flat=True))
+        cache.set(key, voted, timeout=VOTED_SET_TIMEOUT)
+    return voted
+
+
+def mark_voted(token_hash, category_id):
+    voted = voted_category_ids(token_hash)
+    if category_id not in voted:
+        cache.set(_voted_key(token_hash), voted | {category_id}, timeout=VOTED_SET_TIMEOUT)
+
+
+def forget_votes(token_hash):
+    cache.delete(_voted_key(token_hash))
+
+
+def next_category(token_hash):
+    """First category in voting order the token has not voted in, or ``None``."""
+    voted = voted_category_ids(token_hash)
+    return next((category for category in ordered_categories() if category.pk not in voted), None)
@@ -0,0 +1,24 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.ranking.models import RankingCategory, RankingTally, RankingVote, Teacher
+from apps.ranking.progress import forget_categories, forget_votes
+from apps.ranking.tallies import invalidate_results
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+@receiver([post_save, post_delete], sender=RankingCategory)
+def refresh_results(sender, **kwargs):
+    # Names and order are part of the results snapshot and the voting order.
+    forget_categories()
+    invalidate_results()
+
+
+@receiver(post_delete, sender=RankingVote)
+def discount_vote(sender, instance, **kwargs):
+    RankingTally.objects.filter(
+        category_id=instance.category_id, teacher_id=instance.teacher_id, count__gt=0
+    ).update(count=F("count") - 1)
+    forget_votes(instance.token_hash)
+    invalidate_results()
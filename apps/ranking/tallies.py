@@ -0,0 +1,125 @@
+import logging
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from apps.pages.fragments import bump_namespace
+from apps.ranking.models import RankingCategory, RankingTally, RankingVote, Teacher
+from apps.ranking.progress import forget_categories, mark_voted
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = "ranking-results:version"
+# Snapshots are replaced through the version key; the timeout only bounds stale entries.
+SNAPSHOT_TIMEOUT = 60 * 60
+
+
+def _increment_tally(category, teacher):
+    if RankingTally.objects.filter(category=category, teacher=teacher).update(count=F("count") + 1):
+        return
+    try:
+        with transaction.atomic():
+            RankingTally.objects.create(category=category, teacher=teacher, count=1)
+    except IntegrityError:
+        # Another vote created the row first.
+        RankingTally.objects.filter(category=category, teacher=teacher).update(count=F("count") + 1)
+
+
+def record_vote(category, teacher, token_hash) -> bool:
+    """Store a vote and bump its tally in one transaction; ``False`` if the token already voted.
+
+    There is no check before the insert: the unique constraint decides.
+    Raises ``RankingCategory.DoesNotExist`` if the category was deleted
+    after it was cached.
+    """
+    try:
+        with transaction.atomic():
+            RankingVote.objects.create(category=category, teacher=teacher, token_hash=token_hash)
+            _increment_tally(category, teacher)
+    except IntegrityError:
+        if not RankingCategory.objects.filter(pk=category.pk).exists():
+            forget_categories()
+            raise RankingCategory.DoesNotExist(f"RankingCategory {category.pk} was deleted.")
+        # The unique constraint is the duplicate check; the cached progress was stale.
+        mark_voted(token_hash, category.pk)
+        return False
+    mark_voted(token_hash, category.pk)
+    transaction.on_commit(invalidate_results)
+    return True
+
+
+def invalidate_results():
+    try:
+        cache.incr(_VERSION_KEY)
+    except ValueError:
+        cache.set(_VERSION_KEY, 1, timeout=None)
+    bump_namespace("ranking")
+
+
+def _build_results():
+    categories = list(RankingCategory.objects.order_by("order", "title"))
+    teachers = list(Teacher.objects.order_by("name"))
+    if not categories or not teachers:
+        return []
+    counts = {
+        (category_id, teacher_id): count
+        for category_id, teacher_id, count in RankingTally.objects.values_list("category_id", "teacher_id", "count")
+    }
+    category_results = []
+    for category in categories:
+        rows = [{"teacher": {"name": teacher.name}, "count": counts.get((category.id, teacher.id), 0)} for teacher in teachers]
+        max_votes = max(row["count"] for row in rows)
+        for row in rows:
+            row["percent"] = (row["count"] / max_votes) * 100 if max_votes else 0
+        category_results.append(
+            {
+                "category": {"title": category.title, "description": category.description},
+                "rows": rows,
+                "total_votes": sum(row["count"] for row in rows),
+            }
+        )
+    return category_results
+
+
+def ranking_results():
+    """Results per category, from a cached snapshot keyed by the current results version."""
+    version = cache.get_or_set(_VERSION_KEY, 1, timeout=None)
+    key = f"ranking-results:{version}"
+    results = cache.get(key)
+    if results is None:
+        results = _build_results()
+        cache.set(key, results, timeout=SNAPSHOT_TIMEOUT)
+    return results
+
+
+def rebuild_tallies(dry_run=False):
+    """Recount every tally from ``RankingVote``; return ``{(category_id, teacher_id): (stored, actual)}`` of mismatches.
+
+    Votes cast while the rebuild runs may be missed on PostgreSQL, so run it
+    when the voting is quiet and re-run it to confirm.
+    """
+    with transaction.atomic():
+        actual = {
+            (row["category_id"], row["teacher_id"]): row["total"]
+            for row in RankingVote.objects.values("category_id", "teacher_id").annotate(total=Count("id"))
+        }
+        stored = {
+            (category_id, teacher_id): count
+            for category_id, teacher_id, count in RankingTally.objects.values_list("category_id", "teacher_id", "count")
+        }
+        mismatches = {
+            key: (stored.get(key, 0), actual.get(key, 0))
+            for key in stored.keys() | actual.keys()
+            if stored.get(key, 0) != actual.get(key, 0)
+        }
+        if mismatches and not dry_run:
+            RankingTally.objects.all().delete()
+            RankingTally.objects.bulk_create(
+                RankingTally(category_id=category_id, teacher_id=teacher_id, count=count)
+                for (category_id, teacher_id), count in actual.items()
+            )
+    if mismatches and not dry_run:
+        invalidate_results()
+        logger.warning("Rebuilt ranking tallies; %s counts were off.", len(mismatches))
+    return mismatches
@@ -0,0 +1,94 @@
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+
+from apps.ranking.models import RankingCategory, RankingTally, RankingVote, Teacher
+from apps.ranking.progress import ordered_categories
+from apps.ranking.tallies import rebuild_tallies
+
+
+class RankingTallyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.category = RankingCategory.objects.create(slug="best", title="Beste Lehrperson")
+        self.teacher = Teacher.objects.create(name="Frau Muster")
+        self.other = Teacher.objects.create(name="Herr Beispiel")
+
+    def _vote(self, teacher, client=None):
+        client = client or self.client_class()
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post("/ranking/vote/", {"category_id": self.category.id, "teacher_id": teacher.id})
+
+    def test_votes_update_tally_and_results_snapshot(self):
+        self._vote(self.teacher, client=self.client)
+        self._vote(self.teacher)
+        self._vote(self.other)
+        self.assertEqual(RankingTally.objects.get(teacher=self.teacher).count, 2)
+
+        response = self.client.get("/ranking/results/")
+        rows = response.context["category_results"][0]["rows"]
+        self.assertEqual([(row["teacher"]["name"], row["count"]) for row in rows], [("Frau Muster", 2), ("Herr Beispiel", 1)])
+        with self.assertNumQueries(0):
+            cached = self.client.get("/ranking/results/")
+        self.assertContains(cached, "Total Stimmen: 3")
+
+        repeat = self._vote(self.other, client=self.client)
+        self.assertEqual(repeat.status_code, 200)
+        self.assertTrue(repeat.context["already_voted"])
+        self._vote(self.other)
+        response = self.client.get("/ranking/results/")
+        self.assertEqual(response.context["category_results"][0]["total_votes"], 4)
+
+    def test_rebuild_reports_and_fixes_drift(self):
+        self._vote(self.teacher)
+        RankingTally.objects.update(count=5)
+        RankingVote.objects.create(category=self.category, teacher=self.other, token_hash="x")
+        self.assertEqual(len(rebuild_tallies(dry_run=True)), 2)
+        call_command("rebuild_ranking_tallies", stdout=io.StringIO())
+        self.assertEqual(rebuild_tallies(dry_run=True), {})
+        self.assertEqual(RankingTally.objects.get(teacher=self.other).count, 1)
+
+
+class VoterProgressTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.first = RankingCategory.objects.create(slug="first", title="Erste", order=1)
+        self.second = RankingCategory.objects.create(slug="second", title="Zweite", order=2)
+        self.teacher = Teacher.objects.create(name="Frau Muster")
+
+    def _vote(self, category):
+        return self.client.post("/ranking/vote/", {"category_id": category.id, "teacher_id": self.teacher.id})
+
+    def test_next_category_comes_from_cached_progress(self):
+        self.assertEqual(self.client.get("/ranking/").context["category"], self.first)
+        self.assertRedirects(self._vote(self.first), "/ranking/", fetch_redirect_response=False)
+        with self.assertNumQueries(1):  # the teacher list
+            self.assertEqual(self.client.get("/ranking/").context["category"], self.second)
+        self.assertRedirects(self._vote(self.second), "/ranking/results/", fetch_redirect_response=False)
+
+    def test_duplicate_vote_is_caught_by_the_constraint(self):
+        self._vote(self.first)
+        cache.clear()
+        cache.set(f"ranking:voted:{RankingVote.objects.get().token_hash}", set())
+        response = self._vote(self.first)
+        self.assertTrue(response.context["already_voted"])
+        self.assertEqual(response.context["next_category"], self.second)
+        self.assertEqual(RankingVote.objects.count(), 1)
+
+    def test_category_added_elsewhere_is_found_past_the_cached_list(self):
+        ordered_categories()
+        third = RankingCategory.objects.bulk_create([RankingCategory(slug="third", title="Dritte", order=3)])[0]
+        self.assertRedirects(self._vote(third), "/ranking/", fetch_redirect_response=False)
+
+    def test_vote_for_category_deleted_elsewhere_is_not_found(self):
+        stale = ordered_categories()
+        RankingCategory.objects.filter(pk=self.first.pk).delete()
+        cache.set("ranking:categories", stale)
+        # SQLite defers the foreign key check to the outer commit, which a TestCase never reaches.
+        with mock.patch.object(RankingVote.objects, "create", side_effect=IntegrityError("FOREIGN KEY constraint failed")):
+            self.assertEqual(self._vote(self.first).status_code, 404)
+        self.assertEqual(ordered_categories(), [self.second])
@@ -1,9 +1,13 @@
 import hashlib
 import secrets
 from django.conf import settings
-from django.db.models import Count
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
-from apps.ranking.models import RankingCategory, RankingVote, Teacher
+from apps.pages.fragments import cached_fragment
+from apps.pages.ratelimit import rate_limit
+from apps.ranking.models import RankingCategory, Teacher
+from apps.ranking.progress import category_by_id, next_category, ordered_categories
+from apps.ranking.tallies import ranking_results, record_vote
 
 TOKEN_COOKIE_NAME = "kvls_vote_token"
 TOKEN_MAX_AGE = 60 * 60 * 24 * 365
@@ -27,22 +31,14 @@ def _apply_token_cookie(response, token, created):
         )
     return response
 
-def _next_category_for_token(token_hash):
-    return (
-        RankingCategory.objects.exclude(rankingvote__token_hash=token_hash)
-        .order_by("order", "title")
-        .first()
-    )
-
 
 def start(request):
     token, created = _get_or_create_token(request)
     token_hash = _hash_token(token)
-    categories = RankingCategory.objects.order_by("order", "title")
-    if not categories.exists():
+    if not ordered_categories():
         response = render(request, "ranking/index.html")
         return _apply_token_cookie(response, token, created)
-    category = _next_category_for_token(token_hash)
+    category = next_category(token_hash)
     if not category:
         response = redirect("ranking:results")
         return _apply_token_cookie(response, token, created)
@@ -52,47 +48,30 @@ def start(request):
     )
     return _apply_token_cookie(response, token, created)
 
+@rate_limit("ranking-vote")
 def vote(request):
     if request.method != "POST":
         return redirect("ranking:start")
     token, created = _get_or_create_token(request)
     token_hash = _hash_token(token)
-    category = get_object_or_404(RankingCategory, id=request.POST.get("category_id"))
+    category = category_by_id(request.POST.get("category_id"))
+    if category is None:
+        raise Http404("No RankingCategory matches the given query.")
     teacher = get_object_or_404(Teacher, id=request.POST.get("teacher_id"), active=True)
-    if RankingVote.objects.filter(category=category, token_hash=token_hash).exists():
-        next_category = _next_category_for_token(token_hash)
+    try:
+        recorded = record_vote(category, teacher, token_hash)
+    except RankingCategory.DoesNotExist:
+        raise Http404("No RankingCategory matches the given query.")
+    if not recorded:
         response = render(
             request,
             "ranking/index.html",
-            {"category": category, "already_voted": True, "next_category": next_category},
+            {"category": category, "already_voted": True, "next_category": next_category(token_hash)},
         )
         return _apply_token_cookie(response, token, created)
-    RankingVote.objects.create(category=category, teacher=teacher, token_hash=token_hash)
-    response = redirect("ranking:start") if _next_category_for_token(token_hash) else redirect("ranking:results")
+    response = redirect("ranking:start") if next_category(token_hash) else redirect("ranking:results")
     return _apply_token_cookie(response, token, created)
 
 def results(request):
-    categories = list(RankingCategory.objects.order_by("order", "title"))
-    teachers = list(Teacher.objects.order_by("name"))
-    if not categories or not teachers:
-        return render(request, "ranking/results.html")
-    vote_counts = {
-        (row["category_id"], row["teacher_id"]): row["total"]
-        for row in RankingVote.objects.values("category_id", "teacher_id").annotate(
-            total=Count("id")
-        )
-    }
-    category_results = []
-    for category in categories:
-        rows = []
-        total_votes = 0
-        max_votes = 0
-        for teacher in teachers:
-            count = vote_counts.get((category.id, teacher.id), 0)
-            total_votes += count
-            max_votes = max(max_votes, count)
-            rows.append({"teacher": teacher, "count": count})
-        for row in rows:
-            row["percent"] = (row["count"] / max_votes) * 100 if max_votes else 0
-        category_results.append({"category": category, "rows": rows, "total_votes": total_votes})
-    return render(request, "ranking/results.html", {"category_results": category_results})
+    results = cached_fragment("ranking", "ranking/partials/results.html", lambda: {"category_results": ranking_results()})
+    return render(request, "ranking/results.html", {"results": results})
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+def mark_existing_present(apps, schema_editor):
+    # Assume stored files exist; the reconcile task fills in dimensions and corrects misses.
+    Profile = apps.get_model("users", "Profile")
+    Profile.objects.exclude(avatar="").exclude(avatar__isnull=True).update(avatar_present=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_height",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_present",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_size",
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="avatar_width",
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(mark_existing_present, migrations.RunPython.noop),
+    ]
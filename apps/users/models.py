@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from apps.pages.stored_images import track_image_field
+
 # Create your models here.
 
 
@@ -18,15 +20,20 @@ class Profile(models.Model):
     address   = models.CharField(max_length=255, null=True, blank=True)
     phone     = models.CharField(max_length=255, null=True, blank=True)
     avatar    = models.ImageField(upload_to='avatar', null=True, blank=True)
+    # Cached file state (see apps.pages.stored_images), so pages need no storage requests.
+    avatar_present = models.BooleanField(default=False, editable=False)
+    avatar_width   = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    avatar_height  = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    avatar_size    = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
 
     def __str__(self):
         return self.user.username
 
     @property
     def avatar_url(self) -> str:
-        if not self.avatar:
-            return ""
-        storage = self.avatar.storage
-        if not storage.exists(self.avatar.name):
+        if not self.avatar or not self.avatar_present:
             return ""
         return self.avatar.url
+
+
+track_image_field(Profile, "avatar")
@@ -1,3 +1,26 @@
-from django.test import TestCase
+import io
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class AvatarStateTests(TestCase):
+    def test_avatar_state_follows_upload_and_removal(self):
+        profile = User.objects.create_user("alice", password="pw").profile
+        content = io.BytesIO()
+        Image.new("RGB", (64, 32)).save(content, "PNG")
+        profile.avatar = SimpleUploadedFile("avatar.png", content.getvalue(), content_type="image/png")
+        profile.save()
+        profile.refresh_from_db()
+        self.assertTrue(profile.avatar_present)
+        self.assertEqual((profile.avatar_width, profile.avatar_height), (64, 32))
+        self.assertTrue(profile.avatar_url)
+
+        profile.avatar.delete()
+        profile.refresh_from_db()
+        self.assertFalse(profile.avatar_present)
+        self.assertEqual(profile.avatar_url, "")
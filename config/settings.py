@@ -192,8 +192,17 @@ default_media_root = (
 )
 MEDIA_ROOT = Path(os.environ.get("MEDIA_ROOT", str(default_media_root)))
 
+# Partial files of resumable uploads; must be shared by all workers.
+CHUNKED_UPLOAD_DIR = Path(os.environ.get("CHUNKED_UPLOAD_DIR", str(MEDIA_ROOT.parent / "chunked_uploads")))
+
 USE_S3_MEDIA = str2bool(os.environ.get("USE_S3_MEDIA", "false"))
 
+# Who sends local media bytes: "python" (Django streams them), "nginx" (X-Accel-Redirect)
+# or "apache" (X-Sendfile). Views still do access checks and download counting.
+SENDFILE_BACKEND = os.environ.get("SENDFILE_BACKEND", "python").lower()
+# Internal nginx location aliasing MEDIA_ROOT, see nginx/appseed-app.conf.
+SENDFILE_URL_PREFIX = os.environ.get("SENDFILE_URL_PREFIX", "/protected-media/")
+
 if USE_S3_MEDIA:
     INSTALLED_APPS += ["storages"]
 
@@ -224,6 +233,78 @@ if USE_S3_MEDIA:
     if media_domain:
         MEDIA_URL = f"{media_domain.rstrip('/')}/"
 
+# Probe the first chunk of each ZIP entry instead of choosing the method by file type.
+ZIP_COMPRESSION_PROBE = str2bool(os.environ.get("ZIP_COMPRESSION_PROBE", "false"))
+
+# Members read ahead in parallel while streaming multi-file ZIPs (0 = sequential).
+ZIP_PREFETCH_WORKERS = int(os.environ.get("ZIP_PREFETCH_WORKERS", 4))
+ZIP_PREFETCH_BUFFER_BYTES = int(os.environ.get("ZIP_PREFETCH_BUFFER_BYTES", 32 * 1024 * 1024))
+
+# New upload content is written to storage by this many threads per request (0 = sequential).
+UPLOAD_STORE_WORKERS = int(os.environ.get("UPLOAD_STORE_WORKERS", 4))
+
+# Filtered exports larger than this are split into numbered parts.
+ZIP_EXPORT_PART_MAX_BYTES = int(os.environ.get("ZIP_EXPORT_PART_MAX_BYTES", 250 * 1024 * 1024))
+ZIP_EXPORT_PART_MAX_FILES = int(os.environ.get("ZIP_EXPORT_PART_MAX_FILES", 200))
+
+# Run the full-content checks of uploads in Celery (false = inline after the request commits).
+# The worker must share the web process's database and MEDIA_ROOT, as in docker-compose.yml.
+UPLOAD_SCAN_IN_BACKGROUND = str2bool(os.environ.get("UPLOAD_SCAN_IN_BACKGROUND", "true"))
+
+# Render the resized WebP/JPEG copies of memes in Celery (false = inline after the request commits).
+MEME_RENDITIONS_IN_BACKGROUND = str2bool(os.environ.get("MEME_RENDITIONS_IN_BACKGROUND", "true"))
+
+# Download counters are buffered in Redis (COUNTER_REDIS_URL) and written at most this many seconds late
+# (0 = immediately); without Redis every download is written to the database right away.
+DOWNLOAD_COUNT_FLUSH_INTERVAL = int(os.environ.get("DOWNLOAD_COUNT_FLUSH_INTERVAL", 60))
+
+# Sliding-window request limits per endpoint policy: name -> (requests, window in seconds).
+# Policies missing here are not limited.
+RATE_LIMITS = {
+    "meme-like": (30, 60 * 60),
+    "meme-upload": (10, 60 * 60),
+    "exam-upload": (60, 10 * 60),
+    "ranking-vote": (60, 10 * 60),
+}
+
+# Redis URL for atomic rate limiting across workers (empty = the Django cache).
+RATE_LIMIT_REDIS_URL = os.environ.get("RATE_LIMIT_REDIS_URL", "")
+
+# Reverse proxies in front of the app that append to X-Forwarded-For (0 = key rate limits on REMOTE_ADDR).
+RATE_LIMIT_TRUSTED_PROXIES = int(os.environ.get("RATE_LIMIT_TRUSTED_PROXIES", 0))
+
+# Meme likes are buffered the same way; the stored like_count lags by at most this many seconds.
+LIKE_COUNT_FLUSH_INTERVAL = int(os.environ.get("LIKE_COUNT_FLUSH_INTERVAL", 10))
+
+# Shared cache for rate limits and page fragments: Redis if CACHE_REDIS_URL is set, else files
+# under CACHE_DIR, else memory of each process.
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL", "")
+CACHE_DIR = os.environ.get("CACHE_DIR", "")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+            "KEY_PREFIX": "kv",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache" if CACHE_DIR else "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": CACHE_DIR or "kv-default",
+            # The default of 300 entries is too few once page fragments are cached as well.
+            "OPTIONS": {"MAX_ENTRIES": int(os.environ.get("CACHE_MAX_ENTRIES", 10000))},
+        }
+    }
+
+# Redis holding the unflushed download and like counts (empty = write each one to the database).
+# Point it at a Redis database fragments never fill, so cache eviction cannot drop counts.
+COUNTER_REDIS_URL = os.environ.get("COUNTER_REDIS_URL", CACHE_REDIS_URL)
+
+# Rendered page fragments are kept at most this many seconds; model changes retire them sooner.
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get("FRAGMENT_CACHE_TIMEOUT", 600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -249,6 +330,23 @@ CELERY_RESULT_EXPIRES     = 60*60*24*30 # Results expire after 1 month
 CELERY_ACCEPT_CONTENT     = ["json"]
 CELERY_TASK_SERIALIZER    = 'json'
 CELERY_RESULT_SERIALIZER  = 'json'
+CELERY_BEAT_SCHEDULE      = {
+    "reconcile-stored-images": {
+        "task": "apps.pages.tasks.reconcile_stored_images",
+        "schedule": 24 * 60 * 60,
+    },
+}
+# Buffered counters are flushed on their interval; an interval of 0 writes every increment at once.
+if DOWNLOAD_COUNT_FLUSH_INTERVAL > 0:
+    CELERY_BEAT_SCHEDULE["flush-download-counts"] = {
+        "task": "apps.exams.tasks.flush_download_counts",
+        "schedule": DOWNLOAD_COUNT_FLUSH_INTERVAL,
+    }
+if LIKE_COUNT_FLUSH_INTERVAL > 0:
+    CELERY_BEAT_SCHEDULE["flush-like-counts"] = {
+        "task": "apps.memes.tasks.flush_like_counts",
+        "schedule": LIKE_COUNT_FLUSH_INTERVAL,
+    }
 ########################################
 
 
@@ -24,6 +24,9 @@ from apps.memes import views as meme_views
 from config.views import serve_media
 
 urlpatterns = [
+    # Before apps.dyn_api, whose api/<model_name>/ pattern would shadow these.
+    path("api/memes/", meme_views.api_memes, name="api_memes"),
+    path("api/memes/<int:meme_id>/like/", meme_views.api_like_meme, name="api_like_meme"),
     path("", include("apps.pages.urls")),
     path("", include("apps.dyn_dt.urls")),
     path("", include("apps.exams.urls")),
@@ -34,8 +37,6 @@ urlpatterns = [
     path("users/", include("apps.users.urls")),
     path("charts/", include("apps.charts.urls")),
     path("tasks/", include("apps.tasks.urls")),
-    path("api/memes/", meme_views.api_memes, name="api_memes"),
-    path("api/memes/<int:meme_id>/like/", meme_views.api_like_meme, name="api_like_meme"),
     path('api/docs/schema', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/'      , SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path("__debug__/", include("debug_toolbar.urls")),
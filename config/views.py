@@ -1,20 +1,52 @@
 import mimetypes
 import os
+from datetime import datetime, timezone
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.exceptions import SuspiciousFileOperation
-from django.http import FileResponse, Http404
+from django.http import Http404
 from django.utils._os import safe_join
 
+from apps.exams.async_io import AsyncFileReader
+from apps.exams.responses import async_file_response, conditional_file_response, file_etag
+from apps.exams.sendfile import sendfile_response
 
-def serve_media(request, path):
+
+def _local_file_stat(full_path):
+    if not os.path.isfile(full_path):
+        return None
+    stat = os.stat(full_path)
+    return stat.st_size, datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+
+
+async def serve_media(request, path):
     if settings.USE_S3_MEDIA:
         raise Http404("Media served via S3.")
     try:
         full_path = safe_join(str(settings.MEDIA_ROOT), path)
     except SuspiciousFileOperation:
         raise Http404("Invalid media path.")
-    if not os.path.exists(full_path) or not os.path.isfile(full_path):
+    stat = await sync_to_async(_local_file_stat, thread_sensitive=False)(full_path)
+    if stat is None:
         raise Http404("File not found.")
+    size, modified = stat
+    etag = file_etag(size, modified)
+    not_modified = conditional_file_response(request, etag, modified)
+    if not_modified is not None:
+        return not_modified
     content_type, _ = mimetypes.guess_type(full_path)
-    return FileResponse(open(full_path, "rb"), content_type=content_type)
+    sendfile = sendfile_response(full_path, os.path.basename(full_path), content_type, as_attachment=False)
+    if sendfile is not None:
+        return sendfile
+    reader = AsyncFileReader(lambda: open(full_path, "rb"))
+    return async_file_response(
+        request,
+        reader,
+        size,
+        os.path.basename(full_path),
+        content_type=content_type,
+        as_attachment=False,
+        etag=etag,
+        last_modified=modified,
+    )
@@ -5,6 +5,8 @@ Copyright (c) 2019 - present AppSeed.us
 
 bind = '0.0.0.0:5005'
 workers = 1
+# ASGI worker: downloads stream from async views, so slow clients no longer pin the worker.
+worker_class = 'uvicorn.workers.UvicornWorker'
 accesslog = '-'
 loglevel = 'debug'
 capture_output = True
@@ -1,26 +1,80 @@
 (() => {
   const grid = document.getElementById("meme-grid");
   if (!grid) return;
-  const modal = document.getElementById("meme-modal"), modalImage = document.getElementById("meme-modal-image"), modalTitle = document.getElementById("meme-modal-title"), modalLikeButton = document.getElementById("meme-modal-like"), modalCount = document.getElementById("meme-modal-count"), closeTriggers = modal ? modal.querySelectorAll("[data-modal-close]") : [], prevTrigger = modal ? modal.querySelector("[data-modal-prev]") : null, nextTrigger = modal ? modal.querySelector("[data-modal-next]") : null, state = { memes: [], selectedIndex: null };
+  const sentinel = document.getElementById("meme-grid-sentinel");
+  const modal = document.getElementById("meme-modal"), modalImage = document.getElementById("meme-modal-image"), modalTitle = document.getElementById("meme-modal-title"), modalLikeButton = document.getElementById("meme-modal-like"), modalCount = document.getElementById("meme-modal-count"), closeTriggers = modal ? modal.querySelectorAll("[data-modal-close]") : [], prevTrigger = modal ? modal.querySelector("[data-modal-prev]") : null, nextTrigger = modal ? modal.querySelector("[data-modal-next]") : null, state = { memes: [], selectedIndex: null, nextCursor: grid.dataset.nextCursor || "", loading: false };
   const likeLabel = (liked) => (liked ? "❤️ Geliked" : "🤍 Like");
   const setLikeButton = (button, meme) => { button.textContent = likeLabel(meme.liked); button.disabled = meme.liked; };
   const getCookie = (name) => document.cookie.split("; ").find((row) => row.startsWith(`${name}=`))?.split("=")[1] || "";
-  const collectMemes = () => {
-    state.memes = Array.from(grid.querySelectorAll("[data-meme-id]")).map((card) => {
-      const image = card.querySelector(".meme-card__image");
-      const imageUrl = card.dataset.memeImage || image?.getAttribute("src") || "";
-      if (image && imageUrl && image.getAttribute("src") !== imageUrl) {
-        image.setAttribute("src", imageUrl);
+  const readCard = (card) => {
+    const image = card.querySelector(".meme-card__image");
+    const imageUrl = card.dataset.memeImage || image?.getAttribute("src") || "";
+    return { id: Number(card.dataset.memeId), title: card.dataset.memeTitle || "", imageUrl, likeCount: Number(card.dataset.likeCount || 0), liked: card.dataset.liked === "true", card };
+  };
+  const collectMemes = () => { state.memes = Array.from(grid.querySelectorAll("[data-meme-id]")).map(readCard); };
+  const sizes = "(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw";
+  const buildCard = (item) => {
+    const card = document.createElement("article");
+    card.className = "meme-card";
+    Object.assign(card.dataset, { memeId: String(item.id), memeTitle: item.title || "", memeImage: item.display_url || item.image_url || "", likeCount: String(item.like_count), liked: item.liked_by_me ? "true" : "false" });
+    const open = document.createElement("button");
+    open.className = "meme-card__button";
+    open.type = "button";
+    open.dataset.memeOpen = "";
+    if (card.dataset.memeImage) {
+      const picture = document.createElement("picture");
+      if (item.srcset?.webp) {
+        const source = document.createElement("source");
+        Object.assign(source, { type: "image/webp", srcset: item.srcset.webp, sizes });
+        picture.append(source);
       }
-      return {
-        id: Number(card.dataset.memeId),
-        title: card.dataset.memeTitle || "",
-        imageUrl,
-        likeCount: Number(card.dataset.likeCount || 0),
-        liked: card.dataset.liked === "true",
-        card,
-      };
-    });
+      const image = document.createElement("img");
+      Object.assign(image, { className: "meme-card__image", src: card.dataset.memeImage, alt: item.title || "Meme", loading: "lazy", decoding: "async" });
+      if (item.srcset?.jpeg) Object.assign(image, { srcset: item.srcset.jpeg, sizes });
+      if (item.width) Object.assign(image, { width: item.width, height: item.height });
+      picture.append(image);
+      open.append(picture);
+    }
+    const body = document.createElement("div");
+    body.className = "meme-card__body";
+    const title = document.createElement("button");
+    Object.assign(title, { className: "meme-card__title-button", type: "button", textContent: item.title || `Meme #${item.id}` });
+    title.dataset.memeOpen = "";
+    const like = document.createElement("div");
+    like.className = "meme-like";
+    const likeButton = document.createElement("button");
+    Object.assign(likeButton, { className: "meme-like__button", type: "button" });
+    const likeCount = document.createElement("span");
+    likeCount.className = "meme-like__count";
+    like.append(likeButton, likeCount);
+    body.append(title, like);
+    card.append(open, body);
+    return card;
+  };
+  const loadMore = async () => {
+    if (state.loading || !state.nextCursor) return;
+    state.loading = true;
+    try {
+      const url = new URL(grid.dataset.apiUrl, window.location.origin);
+      url.searchParams.set("cursor", state.nextCursor);
+      const response = await fetch(url, { credentials: "same-origin" });
+      if (!response.ok) return;
+      const data = await response.json();
+      data.results.forEach((item) => {
+        const card = buildCard(item);
+        grid.append(card);
+        const meme = readCard(card);
+        state.memes.push(meme);
+        updateCard(meme);
+      });
+      state.nextCursor = data.next_cursor || "";
+    } catch (error) {
+      console.error(error);
+    } finally {
+      state.loading = false;
+      // Re-observing reports the sentinel again if the new page did not push it out of view.
+      if (state.nextCursor && state.observer) { state.observer.unobserve(sentinel); state.observer.observe(sentinel); }
+    }
   };
   const updateCard = (meme) => {
     const likeButton = meme.card.querySelector(".meme-like__button");
@@ -66,21 +120,21 @@
     }
   };
   collectMemes();
-  grid.querySelectorAll("[data-meme-open]").forEach((trigger) => {
-    trigger.addEventListener("click", () => {
-      const card = trigger.closest("[data-meme-id]");
-      const index = state.memes.findIndex((meme) => meme.card === card);
-      if (index !== -1) showModal(index);
-    });
-  });
-  grid.querySelectorAll(".meme-like__button").forEach((button) => {
-    button.addEventListener("click", (event) => {
+  grid.addEventListener("click", (event) => {
+    const card = event.target.closest("[data-meme-id]");
+    const meme = card && state.memes.find((item) => item.card === card);
+    if (!meme) return;
+    if (event.target.closest(".meme-like__button")) {
       event.stopPropagation();
-      const card = button.closest("[data-meme-id]");
-      const meme = state.memes.find((item) => item.card === card);
-      if (meme) handleLike(meme);
-    });
+      handleLike(meme);
+    } else if (event.target.closest("[data-meme-open]")) {
+      showModal(state.memes.indexOf(meme));
+    }
   });
+  if (sentinel && "IntersectionObserver" in window) {
+    state.observer = new IntersectionObserver((entries) => { if (entries.some((entry) => entry.isIntersecting)) loadMore(); }, { rootMargin: "600px 0px" });
+    state.observer.observe(sentinel);
+  }
   if (modalLikeButton) { modalLikeButton.addEventListener("click", () => { if (state.selectedIndex !== null) handleLike(state.memes[state.selectedIndex]); }); }
   if (prevTrigger) prevTrigger.addEventListener("click", () => shiftModal(-1));
   if (nextTrigger) nextTrigger.addEventListener("click", () => shiftModal(1));